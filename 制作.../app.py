@@ -1,18 +1,55 @@
-import os, uvicorn, csv, uvicorn
+import os, uvicorn, uvicorn, json, asyncio, time
+import numpy as np
 import pandas as pd
-from fastapi import FastAPI, Request, Query
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi import FastAPI, Request, Query, Form, HTTPException
+from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse, Response, RedirectResponse, PlainTextResponse
 from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 from starlette.middleware.sessions import SessionMiddleware
 from pydantic import BaseModel
 from typing import List, Optional
+from urllib.parse import quote
+from catalog import HospitalCatalog, CatalogWatcher, column_or_empty, to_records
+from departments import department_cells, canonical_department
+from prefectures import BlockedPrefectures, PREFECTURE_PATTERN, prefecture_from_path, prefecture_name
+from payload_cache import PayloadCache, etag_matches
+from render_cache import RenderCache
+from snapshot import load_slices, update_snapshot
+from records import MappedRecords
+from diagnostics import process_memory
+from worker_pool import BoundedExecutor
+from hospital_log import HospitalLog, LogEntry
+from csv_reader import read_header, resolve_columns
+from review_store import ReviewStore
+from geo import POSTAL_TABLE_PATH, load_postal_table
+from metrics import REGISTRY, span
 
 app = FastAPI()
 app.add_middleware(SessionMiddleware, secret_key="your_secret_key")
-app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_credentials=True, allow_methods=["*"], allow_headers=["*"])
+app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_credentials=True, allow_methods=["*"], allow_headers=["*"], expose_headers=["X-Total-Count", "X-Next-Offset", "X-Next-Cursor", "X-Catalog-Version"])
 templates = Jinja2Templates(directory="templates")
+
+# リクエストごとの所要時間（ルートのパターン単位。ストリーミングのレスポンスはヘッダーを返すまで）
+request_seconds = REGISTRY.histogram("hospital_http_request_duration_seconds", "リクエストの所要時間", ("method", "route", "status"))
+
+@app.middleware("http")
+async def record_request_duration(request: Request, call_next):
+    start_time = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        request_seconds.observe(
+            time.perf_counter() - start_time,
+            method=request.method,
+            route=getattr(route, "path", "unmatched"),
+            status=status,
+        )
+
 static_dir = os.path.join(os.path.dirname(__file__), "static")
 if not os.path.exists(static_dir):
     raise FileNotFoundError(f"Static directory not found: {static_dir}")
@@ -35,16 +72,84 @@ csv_paths = [
     os.path.join(base_dir, 'csv/aomori_dent.csv'),
 ]
 
-# ブロックする都道府県のリスト（設定可能）
-blocked_prefectures = set()
-
-dfs = []
-for path in csv_paths:
-    if os.path.exists(path):
-        dfs.append(pd.read_csv(path, header=0, skip_blank_lines=True, low_memory=False, dtype=str, on_bad_lines='skip'))
-    else:
-        print(f"ファイルが見つかりません: {path}")
-df = pd.concat(dfs, ignore_index=True)
+# ブロックする都道府県のリスト（設定可能、変更時だけ除外マスクを作り直す）
+blocked_prefectures = BlockedPrefectures()
+
+# フィルタなしの一覧レスポンス（シリアライズ・圧縮済み）のキャッシュ
+payload_cache = PayloadCache()
+
+# トップページのカード一覧（HTML断片）のキャッシュと、表示する枚数
+card_list_cache = RenderCache(maxsize=32)
+INDEX_CARD_LIMIT = 20
+
+# 病院の詳細ページ（口コミ付き）のキャッシュと、ページに載せる口コミの件数
+hospital_page_cache = RenderCache(maxsize=256)
+HOSPITAL_PAGE_REVIEW_LIMIT = 20
+
+# カタログ処理（シリアライズ・圧縮・CSV読み書き）を実行するスレッドプール
+# イベントループは振り分けだけを行い、実行中＋待機中が上限を超えたら503を返す
+catalog_pool = BoundedExecutor(max_workers=4, max_pending=64)
+
+# 起動時に構築する病院カタログ（全エンドポイントで共有、CSV更新時はホットリロード）
+catalog_watcher = CatalogWatcher(HospitalCatalog({}))
+
+# /add-hospital の追記ログ（書き込み後すぐカタログに反映し、定期的にCSVへ畳み込む）
+hospital_log = HospitalLog()
+
+# 口コミの保存先（病院ごとの口コミ数はカタログが持ち、投稿のたびに更新する）
+review_store = ReviewStore()
+REVIEW_MAX_LENGTH = 2000
+
+@app.on_event("startup")
+async def load_catalog():
+    """起動時に病院カタログを一度だけ構築し、CSVの監視を開始（新しいスナップショットがあればそれを使う）"""
+    global catalog_watcher
+    slices, from_snapshot = load_slices(csv_paths)
+    # 追記ログに残っている（まだCSVに書き込まれていない）病院も末尾に載せる
+    appended = [entry for entry in hospital_log.read_entries() if entry.path in slices]
+    review_counts = await asyncio.to_thread(review_store.load_counts)
+    catalog_watcher = CatalogWatcher(HospitalCatalog(slices, appended=appended, review_counts=review_counts), pending=hospital_log.pending_ids)
+    catalog_watcher.start()
+    hospital_log.on_commit = catalog_watcher.append
+    hospital_log.on_compact = refresh_snapshot
+    hospital_log.start()
+    review_store.start()
+    print(f"病院カタログを読み込みました: {len(catalog_watcher.catalog.cards):,}件（スナップショット {from_snapshot}/{len(slices)}ファイル、追記ログ {len(appended)}件）")
+    if len(load_postal_table()) == 0:
+        print(f"郵便番号の座標表が無いため /nearby は無効です（{POSTAL_TABLE_PATH} を python geo.py で作成してください）")
+
+@app.on_event("shutdown")
+async def stop_catalog_watcher():
+    await hospital_log.stop()
+    await review_store.stop()
+    await catalog_watcher.stop()
+    catalog_pool.shutdown()
+
+@REGISTRY.register
+def catalog_metrics():
+    """/metrics を読んだ時点のキャッシュのヒット率・カタログの件数・スレッドプールの状態"""
+    catalog = catalog_watcher.catalog
+    caches = {"payload": payload_cache, "card_list": card_list_cache, "hospital_page": hospital_page_cache}
+    rows = []
+    for kind in ("cards", "hospital_data"):
+        counts = np.bincount(catalog.prefecture_codes[kind], minlength=48)
+        rows.extend(({"kind": kind, "prefecture": prefecture_name(code) or "不明"}, int(count)) for code, count in enumerate(counts) if count)
+    return [
+        ("hospital_cache_requests_total", "counter", "キャッシュの参照回数（ヒット・ミス別）",
+         [({"cache": name, "result": "hit"}, cache.hits) for name, cache in caches.items()]
+         + [({"cache": name, "result": "miss"}, cache.misses) for name, cache in caches.items()]),
+        ("hospital_cache_hit_ratio", "gauge", "キャッシュのヒット率（起動してから）",
+         [({"cache": name}, cache.hits / (cache.hits + cache.misses)) for name, cache in caches.items() if cache.hits + cache.misses]),
+        ("hospital_catalog_rows", "gauge", "カタログの件数（都道府県別）", rows),
+        ("hospital_catalog_version", "gauge", "カタログのバージョン", [({}, catalog.version)]),
+        ("hospital_catalog_appended_rows", "gauge", "追記ログにあってまだCSVに書き込まれていない病院の数", [({}, len(catalog.appended))]),
+        ("hospital_pool_pending", "gauge", "スレッドプールで実行中・待機中の処理の数", [({}, catalog_pool.pending)]),
+        ("hospital_pool_rejected_total", "counter", "スレッドプールが満杯で503を返した回数", [({}, catalog_pool.rejected)]),
+    ]
+
+async def refresh_snapshot(paths):
+    """追記ログを畳み込んだCSVの断片だけ、スナップショットを書き直す"""
+    await asyncio.to_thread(update_snapshot, catalog_watcher.catalog.slices, paths)
 
 class Hospital(BaseModel):
     id: int
@@ -86,141 +191,242 @@ def filter_by_prefecture(data: List[dict], exclude_blocked: bool = True) -> List
     
     return filtered_data
 
-def load_hospital_cards(csv_paths, exclude_blocked: bool = True):
-    cards = []
-    for csv_path in csv_paths:
-        if not os.path.exists(csv_path):
-            print(f"ファイルが見つかりません: {csv_path}")
-            continue 
-        df = pd.read_csv(csv_path, dtype=str, on_bad_lines='skip') 
-
-        if list(df.columns)[0].startswith("col"):
-            df.columns = ["name", "address", "tel"]  
-
-        df.rename(columns={
-            "病院名": "name",
-            "住所": "address",
-            "診療科": "departments",
-            "都道府県": "prefecture",
-        }, inplace=True)
-
-        for _, row in df.iterrows():
-            if pd.notna(row.get("name")):
-                card = {
-                    "name": row.get("name", ""),
-                    "address": row.get("address", ""),
-                    "departments": row.get("established", ""),
-                    "prefecture": row.get("prefecture", "")
-                }
-                
-                # 都道府県ブロックチェック
-                if exclude_blocked and is_prefecture_blocked(card["address"], card["prefecture"]):
-                    continue
-                
-                cards.append(card)
-    return cards
+def visible_records(catalog, kind: str, exclude_blocked: bool = True):
+    """カタログのレコードからブロック対象を除外（事前計算したマスクを使う）"""
+    if not exclude_blocked:
+        return getattr(catalog, kind)
+    return blocked_prefectures.visible(catalog, kind)
+
+def iter_ndjson(records, batch_size: int = 500):
+    """レコードを1行1件のJSON（NDJSON）として少しずつ書き出す"""
+    batch = []
+    for record in records:
+        batch.append(json.dumps(record, ensure_ascii=False))
+        if len(batch) >= batch_size:
+            yield "\n".join(batch) + "\n"
+            batch = []
+    if batch:
+        yield "\n".join(batch) + "\n"
+
+def paged_response(records, catalog, offset: int = 0, limit: Optional[int] = None, fmt: str = "json"):
+    """
+    レコードの指定範囲だけを返す
+    - 件数・次ページの開始位置・カタログのバージョンはヘッダーで返す
+    - fmt="ndjson" ならシリアライズしながらストリーミング（全件を一度にメモリに載せない）
+    """
+    total = len(records)
+    end = total if limit is None else min(offset + limit, total)
+    headers = {"X-Total-Count": str(total), "X-Catalog-Version": str(catalog.version)}
+    if end < total:
+        headers["X-Next-Offset"] = str(end)
+    page = (catalog.review_counts.merged(records[i]) for i in range(offset, end))
+    if fmt == "ndjson":
+        return StreamingResponse(iter_ndjson(page), media_type="application/x-ndjson", headers=headers)
+    with span("paged_response.serialize"):
+        return JSONResponse(list(page), headers=headers)
+
+def cached_list_response(request: Request, catalog, kind: str, exclude_blocked: bool = True):
+    """
+    フィルタなしの一覧を事前にシリアライズ・圧縮したペイロードから返す
+    - カタログかブロックリスト（hospital_dataは投稿された口コミ数も）が変わるまでは同じバイト列を使い回す
+    - ETagはContent-Encodingごとに別の値で、If-None-Matchが返す表現のETagと一致すれば本体なしの304を返す
+    """
+    def collect_records():
+        with span("payload.collect_records"):
+            return [catalog.review_counts.merged(record) for record in visible_records(catalog, kind, exclude_blocked)]
+
+    # 口コミ数を載せるのはIDのあるhospital_dataだけなので、cardsは投稿があっても作り直さない
+    review_version = catalog.review_counts.version if kind == "hospital_data" else 0
+    payload = payload_cache.get((kind, exclude_blocked), catalog, (blocked_prefectures.version, review_version), collect_records)
+    body, encoding = payload.encode_for(request.headers.get("accept-encoding", ""))
+    headers = {
+        "ETag": payload.etag_for(encoding),
+        "Cache-Control": "no-cache",
+        "Vary": "Accept-Encoding",
+        "X-Total-Count": str(payload.count),
+        "X-Catalog-Version": str(catalog.version),
+    }
+    if etag_matches(request.headers.get("if-none-match", ""), headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(body, media_type="application/json", headers=headers)
+
+def list_response(request: Request, catalog, kind: str, exclude_blocked: bool, offset: int, limit: Optional[int], fmt: str):
+    """一覧エンドポイントの本体（フィルタなしはキャッシュ済みペイロード、それ以外は指定範囲だけ）"""
+    if offset == 0 and limit is None and fmt == "json":
+        return cached_list_response(request, catalog, kind, exclude_blocked)
+    return paged_response(visible_records(catalog, kind, exclude_blocked), catalog, offset, limit, fmt)
+
+def render_card_list(catalog, exclude_blocked: bool = True):
+    """トップページのカード一覧（HTML断片）をキャッシュから返す"""
+    def render():
+        with span("template.card_list"):
+            return templates.get_template("card_list.html").render(cards=visible_records(catalog, "cards", exclude_blocked)[:INDEX_CARD_LIMIT])
+
+    return card_list_cache.get_or_render((catalog.version, blocked_prefectures.version, exclude_blocked), render)
+
+def search_catalog(catalog, keyword: str, region: str, department: str, limit: int, offset: int, exclude_blocked: bool):
+    """インデックスで絞り込んだ検索結果のうち、指定ページ分だけを返す"""
+    row_ids = catalog.search_index.search(keyword.strip(), region, department)
+    if exclude_blocked and blocked_prefectures:
+        row_ids = row_ids[~blocked_prefectures.mask(catalog, "hospital_data")[row_ids]]
+    page = row_ids[offset:offset + limit]
+    return {
+        "total": len(row_ids),
+        "offset": offset,
+        "limit": limit,
+        "results": [catalog.review_counts.merged(catalog.hospital_data[i]) for i in page],
+    }
+
+def nearby_status(catalog):
+    """
+    /nearby が使えるか（郵便番号の座標表はリポジトリに含まれないので、python geo.py で作るまでは無効）
+    enabled が false の時は reason と、有効にする手順 how_to_enable を返す
+    """
+    postal_codes = len(load_postal_table())
+    located = catalog.geo_index.size
+    status = {"enabled": located > 0, "postal_codes": postal_codes, "located_hospitals": located, "table_path": os.path.relpath(POSTAL_TABLE_PATH, base_dir)}
+    if postal_codes == 0:
+        status["reason"] = "郵便番号の座標表がありません"
+        status["how_to_enable"] = "郵便番号・緯度・経度の3列のCSVを用意して python geo.py そのCSV を実行し、サーバーを再起動してください"
+    elif located == 0:
+        status["reason"] = "座標表にカタログの病院の郵便番号が1件もありません"
+        status["how_to_enable"] = "病院の住所の郵便番号を含む座標表で python geo.py を実行し直し、サーバーを再起動してください"
+    return status
+
+def nearby_hospitals(catalog, lat: float, lon: float, k: int, department: str, exclude_blocked: bool):
+    """(lat, lon) に近い順にk件（格子索引で近くのセルだけを見る）。座標表が無ければ理由と手順付きの503"""
+    geo_index = catalog.geo_index
+    if geo_index.size == 0:
+        raise HTTPException(status_code=503, detail=nearby_status(catalog))
+    allowed = None
+    if department:
+        allowed = np.zeros(len(catalog.hospital_data), dtype=bool)
+        allowed[catalog.search_index.candidates(department=department)] = True
+    if exclude_blocked and blocked_prefectures:
+        visible = ~blocked_prefectures.mask(catalog, "hospital_data")
+        allowed = visible if allowed is None else allowed & visible
+    row_ids, distances = geo_index.nearest(lat, lon, k, allowed)
+    return {
+        "total": len(row_ids),
+        "results": [
+            {
+                **catalog.review_counts.merged(catalog.hospital_data[row_id]),
+                "lat": float(geo_index.lat[row_id]),
+                "lon": float(geo_index.lon[row_id]),
+                "distance_km": round(float(distance), 3),
+            }
+            for row_id, distance in zip(row_ids, distances)
+        ],
+    }
+
+def facet_counts(catalog, keyword: str, region: str, department: str, facility_type: str, exclude_blocked: bool):
+    """検索条件に合う件数を、都道府県・診療科・施設種別の値ごとに数える（ビットマップのANDで数える）"""
+    facets = catalog.facet_index
+    base = None
+    keyword = keyword.strip()
+    if keyword:
+        base = facets.bitmap(catalog.search_index.text_index.search(keyword))
+    if exclude_blocked and blocked_prefectures:
+        visible = facets.bitmap(~blocked_prefectures.mask(catalog, "hospital_data"))
+        base = visible if base is None else base & visible
+    filters = {
+        "prefecture": region,
+        "department": canonical_department(department) if department else "",
+        "facility_type": facility_type,
+    }
+    total, counts = facets.counts(filters, base)
+    return {"total": total, "facets": counts}
 
 def extract_hospital_info(csv_path, exclude_blocked: bool = True):
     df = pd.read_csv(csv_path, header=0, skip_blank_lines=True, dtype=str)
-    hospital_info = []
-    for _, row in df.iterrows():
-        if pd.notna(row.get("name")):
-            hospital = {
-                "name": str(row.get("name", "")).strip(),
-                "address": str(row.get("address", "")).strip(),
-                "departments": [],
-                "prefecture": str(row.get("prefecture", "")).strip(),
-            }
-            
-            # 都道府県ブロックチェック
-            if exclude_blocked and is_prefecture_blocked(hospital["address"], hospital["prefecture"]):
-                continue
-            
-            for item in row:
-                if pd.notna(item) and any(k in str(item) for k in [
-                    "内", "外", "整", "小", "呼", "リハ", "精神", "糖尿病", "循環器", "消化器",
-                    "脳外", "心外", "皮", "ひ", "産婦", "眼", "耳い", "放", "麻", "歯", "形", "病理"
-]):
-                    hospital["departments"].append(str(item).strip())
-            hospital_info.append(hospital)
-    return hospital_info
+    df = df[column_or_empty(df, "name").notna()]
+    hospital_info = to_records({
+        "name": df["name"].str.strip(),
+        "address": column_or_empty(df, "address").fillna("").str.strip(),
+        "departments": department_cells(df),
+        "prefecture": column_or_empty(df, "prefecture").fillna("").str.strip(),
+    })
+
+    # 都道府県ブロックチェック
+    return filter_by_prefecture(hospital_info, exclude_blocked)
 
 def create_hospital_cards(csv_path, exclude_blocked: bool = True):
     df = pd.read_csv(csv_path, header=None)
-
-    cards = []
-    card_id = 1
-
-    for _, row in df.iterrows():
-        if pd.notna(row[2]):
-            current_card = {
-                "id": card_id,
-                "name": str(row[2]).strip(),
-                "address": str(row[3]).strip() if pd.notna(row[3]) else "",
-                "reviews": 0,
-                "departments": "",
-                "prefecture": str(row[4]).strip() if len(row) > 4 and pd.notna(row[4]) else "",
-            }
-            
-            # 都道府県ブロックチェック
-            if exclude_blocked and is_prefecture_blocked(current_card["address"], current_card["prefecture"]):
-                continue
-            
-            card_id += 1
-
-            for item in row:
-                if pd.notna(item) and any(k in str(item) for k in ["内", "外", "整", "小", "呼", "リハ", "精神", "糖尿病", "循環器", "消化器",
-        "脳外", "心外", "皮", "ひ", "産婦", "眼", "耳い", "放", "麻", "歯", "形", "病理"
-]):
-                    current_card["departments"] += " " + str(item).strip()
-
-            cards.append(current_card)
-
-    return cards
-
-def extract_hospital_data(csv_paths, exclude_blocked: bool = True):
-    hospital_data = []
-    for csv_path in csv_paths:
-        df = pd.read_csv(
-    csv_path, 
-    header=0, 
-    skip_blank_lines=True, 
-    low_memory=False, 
-    dtype=str, 
-    on_bad_lines='skip'
-)
-        df.rename(columns={
-            "病院名": "name",
-            "住所": "address",
-            "診療科": "established",
-            "レビューの数": "review",
-            "都道府県": "prefecture",
-        }, inplace=True)
-        
-        for _, row in df.iterrows():
-            if pd.isna(row.get("name")) or pd.isna(row.get("address")) or pd.isna(row.get("established")):
-                continue
-            
-            hospital = {
-                "name": str(row.get("name", "")).strip(),
-                "address": str(row.get("address", "")).strip(),
-                "departments": str(row.get("established", "")).split(",") if pd.notna(row.get("established")) else [],
-                "reviews": int(row.get("review", 0)) if pd.notna(row.get("review")) else 0,
-                "prefecture": str(row.get("prefecture", "")).strip(),
-            }
-            
-            # 都道府県ブロックチェック
-            if exclude_blocked and is_prefecture_blocked(hospital["address"], hospital["prefecture"]):
-                continue
-            
-            hospital_data.append(hospital)
-    return hospital_data
-
-def add_hospital_to_csv(csv_path, name, address, departments):
-    with open(csv_path, mode='a', newline='', encoding='utf-8') as file:
-        writer = csv.writer(file)
-        row = [None, None, name, address] + departments
-        writer.writerow(row)
+    df = df[df[2].notna()]
+    cards = to_records({
+        "name": df[2].astype(str).str.strip(),
+        "address": df[3].fillna("").astype(str).str.strip(),
+        "reviews": 0,
+        "departments": ["".join(" " + item for item in cells) for cells in department_cells(df)],
+        "prefecture": df[4].fillna("").astype(str).str.strip() if len(df.columns) > 4 else "",
+    })
+
+    # 都道府県ブロックチェック（IDはブロック後の並び順で振る）
+    cards = filter_by_prefecture(cards, exclude_blocked)
+    return [{"id": card_id, **card} for card_id, card in enumerate(cards, 1)]
+
+def new_hospital_entry(catalog, name: str, address: str, departments: List[str]):
+    """追加する病院の追記ログ1件を作る（住所の都道府県の病院CSVに入る。入れられなければ400）"""
+    match = PREFECTURE_PATTERN.search(address)
+    if not name.strip() or match is None or not any(department.strip() for department in departments):
+        raise HTTPException(status_code=400, detail="病院名・都道府県を含む住所・診療科を指定してください")
+    prefecture = match.group()
+    csv_path = next((path for path in catalog.slices if prefecture_from_path(path) == prefecture and path.endswith("_hos.csv")), None)
+    if csv_path is None:
+        raise HTTPException(status_code=400, detail=f"{prefecture}の病院CSVがありません")
+    if len(resolve_columns(read_header(csv_path), ("name", "address", "established"))) < 3:
+        raise HTTPException(status_code=400, detail=f"{os.path.basename(csv_path)}には病院名・住所・診療科の列がありません")
+    hospital_id = catalog.new_hospital_id(csv_path, name.strip(), address.strip())
+    return LogEntry.create(csv_path, name, address, departments, prefecture, hospital_id)
+
+def find_hospital(catalog, hospital_id: str):
+    """IDの病院の行番号（ハッシュ索引で1回引くだけ）。無い・ブロック中の都道府県なら404"""
+    row_id = catalog.row_of(hospital_id)
+    if row_id is None or (blocked_prefectures and blocked_prefectures.mask(catalog, "hospital_data")[row_id]):
+        raise HTTPException(status_code=404, detail="病院が見つかりません")
+    return row_id
+
+def render_hospital_page(catalog, hospital_id: str):
+    """
+    病院の詳細ページ（kutikomi.html）をキャッシュから返す
+    口コミ数が変わればキーも変わるので、投稿後は新しいページをレンダリングする
+    """
+    row_id = find_hospital(catalog, hospital_id)
+    posted = catalog.review_counts.get(hospital_id)
+
+    def render():
+        record = catalog.hospital_data[row_id]
+        with span("reviews.page"):
+            reviews, _ = review_store.page(hospital_id, limit=HOSPITAL_PAGE_REVIEW_LIMIT)
+        hospital = {
+            **record,
+            "department": "、".join(record["departments"]),
+            "reviews": record["reviews"] + posted,
+            "maps": "https://www.google.com/maps/search/?api=1&query=" + quote(record["address"]),
+        }
+        with span("template.hospital_page"):
+            return templates.get_template("kutikomi.html").render(hospital=hospital, reviews=[review["comment"] for review in reviews])
+
+    return hospital_page_cache.get_or_render((hospital_id, catalog.version, posted), render)
+
+def save_review(catalog, hospital_id: str, comment: str):
+    """口コミを保存して (口コミID, 口コミ数) を返す（病院が無ければ404、本文が空・長すぎれば400）"""
+    find_hospital(catalog, hospital_id)
+    comment = comment.strip()
+    if not comment or len(comment) > REVIEW_MAX_LENGTH:
+        raise HTTPException(status_code=400, detail=f"口コミは1〜{REVIEW_MAX_LENGTH}文字で入力してください")
+    return review_store.add(hospital_id, comment)
+
+def review_page(catalog, hospital_id: str, before: Optional[int], limit: int):
+    """口コミの1ページ分（件数はカタログの口コミ数、次ページはキーセットのカーソルをヘッダーで返す）"""
+    find_hospital(catalog, hospital_id)
+    reviews, next_cursor = review_store.page(hospital_id, before, limit)
+    headers = {"X-Total-Count": str(catalog.review_counts.get(hospital_id)), "X-Catalog-Version": str(catalog.version)}
+    if next_cursor is not None:
+        headers["X-Next-Cursor"] = str(next_cursor)
+    return JSONResponse(reviews, headers=headers)
 
 # 都道府県ブロック管理のエンドポイント
 @app.get("/blocked-prefectures", response_class=JSONResponse)
@@ -243,42 +449,150 @@ async def unblock_prefecture(prefecture: str):
 @app.post("/set-blocked-prefectures")
 async def set_blocked_prefectures(prefectures: List[str]):
     """ブロックする都道府県のリストを設定"""
-    global blocked_prefectures
-    blocked_prefectures = set(prefectures)
+    blocked_prefectures.replace(prefectures)
     return {"message": "ブロックする都道府県が設定されました", "blocked_prefectures": list(blocked_prefectures)}
 
 @app.get("/", response_class=HTMLResponse)
 async def index(request: Request, exclude_blocked: bool = Query(True, description="ブロックされた都道府県を除外するかどうか")):
-    cards = load_hospital_cards(csv_paths, exclude_blocked)
-    return templates.TemplateResponse("index.html", {"request": request, "cards": cards})
+    card_list_html = await catalog_pool.run(render_card_list, catalog_watcher.catalog, exclude_blocked)
+    return templates.TemplateResponse("index.html", {"request": request, "card_list_html": card_list_html})
 
 @app.get("/hospital_cards", response_class=JSONResponse)
-async def get_hospital_cards(exclude_blocked: bool = Query(True, description="ブロックされた都道府県を除外するかどうか")):
-    cards = load_hospital_cards(csv_paths, exclude_blocked)
-    return cards
+async def get_hospital_cards(
+    request: Request,
+    exclude_blocked: bool = Query(True, description="ブロックされた都道府県を除外するかどうか"),
+    offset: int = Query(0, ge=0),
+    limit: Optional[int] = Query(None, ge=1, description="省略時は全件"),
+    fmt: str = Query("json", alias="format", pattern="^(json|ndjson)$"),
+):
+    return await catalog_pool.run(list_response, request, catalog_watcher.catalog, "cards", exclude_blocked, offset, limit, fmt)
 
 @app.get("/hospital-info", response_class=JSONResponse)
 async def get_hospital_info(exclude_blocked: bool = Query(True, description="ブロックされた都道府県を除外するかどうか")):
     csv_path = [] 
-    hospital_info = extract_hospital_info(csv_path, exclude_blocked)
+    hospital_info = await catalog_pool.run(extract_hospital_info, csv_path, exclude_blocked)
     return hospital_info
 
 @app.get("/hospital-cards", response_class=JSONResponse)
 async def get_hospital_cards_alt(exclude_blocked: bool = Query(True, description="ブロックされた都道府県を除外するかどうか")):
     csv_path = []
-    hospital_cards = create_hospital_cards(csv_path, exclude_blocked)
+    hospital_cards = await catalog_pool.run(create_hospital_cards, csv_path, exclude_blocked)
     return hospital_cards
 
 @app.post("/add-hospital")
-async def add_hospital(name: str, address: str, departments: list):
-    csv_path = []
-    add_hospital_to_csv(csv_path, name, address, departments)
-    return {"message": "病院が追加されました", "name": name, "address": address, "departments": departments}
+async def add_hospital(name: str, address: str, departments: List[str]):
+    """追記ログに書き込んで（グループコミット）、カタログと検索インデックスにすぐ反映する"""
+    entry = await catalog_pool.run(new_hospital_entry, catalog_watcher.catalog, name, address, departments)
+    await hospital_log.append(entry)
+    return {"message": "病院が追加されました", "id": entry.id, "hospital_id": entry.hospital_id, "name": entry.name, "address": entry.address, "departments": departments}
 
 @app.get("/hospital-data", response_class=JSONResponse)
-async def get_hospital_data(exclude_blocked: bool = Query(True, description="ブロックされた都道府県を除外するかどうか")):
-    hospital_data = extract_hospital_data(csv_paths, exclude_blocked)
-    return hospital_data
+async def get_hospital_data(
+    request: Request,
+    exclude_blocked: bool = Query(True, description="ブロックされた都道府県を除外するかどうか"),
+    offset: int = Query(0, ge=0),
+    limit: Optional[int] = Query(None, ge=1, description="省略時は全件"),
+    fmt: str = Query("json", alias="format", pattern="^(json|ndjson)$"),
+):
+    return await catalog_pool.run(list_response, request, catalog_watcher.catalog, "hospital_data", exclude_blocked, offset, limit, fmt)
+
+@app.get("/search", response_class=JSONResponse)
+async def search_hospitals(
+    keyword: str = Query("", description="病院名・住所・法人名（部分一致）"),
+    region: str = Query("", description="都道府県名（例: 宮城県）"),
+    department: str = Query("", description="診療科名（例: 整形外科）"),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    exclude_blocked: bool = Query(True, description="ブロックされた都道府県を除外するかどうか"),
+):
+    """インデックスで絞り込んだ検索結果のうち、指定ページ分だけを返す"""
+    return await catalog_pool.run(search_catalog, catalog_watcher.catalog, keyword, region, department, limit, offset, exclude_blocked)
+
+@app.get("/hospital/{hospital_id}", response_class=HTMLResponse)
+async def hospital_page(hospital_id: str):
+    """病院の詳細ページ（口コミの投稿フォームと一覧）"""
+    return HTMLResponse(await catalog_pool.run(render_hospital_page, catalog_watcher.catalog, hospital_id))
+
+@app.post("/hospital/{hospital_id}")
+async def post_hospital_page_review(hospital_id: str, comment: str = Form(...)):
+    """詳細ページのフォームからの口コミ投稿（保存後に詳細ページへ戻す）"""
+    await catalog_pool.run(save_review, catalog_watcher.catalog, hospital_id, comment)
+    return RedirectResponse(f"/hospital/{quote(hospital_id)}", status_code=303)
+
+@app.get("/hospital/{hospital_id}/reviews", response_class=JSONResponse)
+async def get_reviews(
+    hospital_id: str,
+    before: Optional[int] = Query(None, ge=1, description="前のページのX-Next-Cursor（省略時は最新から）"),
+    limit: int = Query(20, ge=1, le=100),
+):
+    """病院の口コミを新しい順に返す（キーセット方式のページング）"""
+    return await catalog_pool.run(review_page, catalog_watcher.catalog, hospital_id, before, limit)
+
+@app.post("/hospital/{hospital_id}/reviews")
+async def post_review(hospital_id: str, comment: str = Form(...)):
+    """口コミを保存し、カタログの口コミ数を+1する"""
+    review_id, count = await catalog_pool.run(save_review, catalog_watcher.catalog, hospital_id, comment)
+    return {"message": "口コミが投稿されました", "id": review_id, "hospital_id": hospital_id, "reviews": count}
+
+@app.get("/facets", response_class=JSONResponse)
+async def facets(
+    keyword: str = Query("", description="病院名・住所・法人名（部分一致）"),
+    region: str = Query("", description="都道府県名（例: 宮城県）"),
+    department: str = Query("", description="診療科名（例: 整形外科）"),
+    facility_type: str = Query("", description="施設種別（病院・診療所・特定機能病院）"),
+    exclude_blocked: bool = Query(True, description="ブロックされた都道府県を除外するかどうか"),
+):
+    """
+    検索条件に合う件数と、都道府県・診療科・施設種別の選択肢ごとの件数
+    各ファセットの件数は、そのファセット自身の条件を外して数える
+    """
+    return await catalog_pool.run(facet_counts, catalog_watcher.catalog, keyword, region, department, facility_type, exclude_blocked)
+
+@app.get("/nearby", response_class=JSONResponse)
+async def nearby(
+    lat: float = Query(..., ge=-90, le=90, description="緯度"),
+    lon: float = Query(..., ge=-180, le=180, description="経度"),
+    k: int = Query(10, ge=1, le=100),
+    department: str = Query("", description="診療科名（例: 整形外科）"),
+    exclude_blocked: bool = Query(True, description="ブロックされた都道府県を除外するかどうか"),
+):
+    """
+    指定地点に近い病院をk件返す（位置は住所の郵便番号から）
+    郵便番号の座標表（python geo.py で作成）が無い間は無効で、503と {"detail": {"enabled": false, "reason": ..., "how_to_enable": ...}} を返す
+    """
+    return await catalog_pool.run(nearby_hospitals, catalog_watcher.catalog, lat, lon, k, department, exclude_blocked)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus形式の計測値（処理段階・リクエストごとの所要時間、キャッシュのヒット率、カタログの件数など）"""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/diagnostics", response_class=JSONResponse)
+async def diagnostics():
+    """
+    ワーカーごとのメモリ使用量とカタログの状態（複数ワーカー時はリクエストを受けたワーカーの値）
+    スナップショットから読んだ断片はメモリマップのまま共有されるので、rss_file_bytesに計上される
+    """
+    catalog = catalog_watcher.catalog
+    return {
+        "memory": process_memory(),
+        "catalog": {
+            "version": catalog.version,
+            "cards": len(catalog.cards),
+            "hospital_data": len(catalog.hospital_data),
+            "slices": len(catalog.slices),
+            "located": catalog.geo_index.size,
+            "nearby": nearby_status(catalog),
+            "mapped_slices": sum(isinstance(s.hospital_data, MappedRecords) for s in catalog.slices.values()),
+        },
+        "caches": {
+            "payload": {"hits": payload_cache.hits, "misses": payload_cache.misses},
+            "card_list": {"hits": card_list_cache.hits, "misses": card_list_cache.misses},
+            "hospital_page": {"hits": hospital_page_cache.hits, "misses": hospital_page_cache.misses},
+        },
+        "reviews": {"hospitals": len(catalog.review_counts), "total": catalog.review_counts.total()},
+        "pool": {"workers": catalog_pool.max_workers, "pending": catalog_pool.pending, "rejected": catalog_pool.rejected},
+    }
 
 if __name__ == "__main__":
     uvicorn.run("app:app", host="127.0.0.1", port=5001, reload=True)
\ No newline at end of file
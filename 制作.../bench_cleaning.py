@@ -0,0 +1,132 @@
+"""
+hyphen.py のクリーニングの計測用スクリプト
+- before: 以前の1セルずつの関数（Series.apply + 毎回コンパイルしない re.sub のループ）
+- after : cleaning_pipeline.py の形式統一版プリセット（列ごとにまとめてコンパイルした正規表現を Series.str.replace で一括適用）
+- どちらもクリーニング → addressとprefectureの入れ替え → code列の連番 まで（読み書きは含まない）
+- csv/miyagi_hos.csv を100回つなげた表で計測し、両方の結果が全セル一致することも確認する
+使い方: python bench_cleaning.py [つなげる回数]
+"""
+import os
+import re
+import sys
+import time
+import pandas as pd
+from cleaning_pipeline import UNIFY_FORMAT, clean_frame
+
+base_dir = os.path.dirname(__file__)
+csv_path = os.path.join(base_dir, 'csv/miyagi_hos.csv')
+
+# --- 以前の実装 ---
+
+patterns_to_remove = [
+    r'/ 常　勤:.*', r'/ 非常勤:.*', r'/ \(医.*?\)', r'/ \(歯.*?\)', r'/ \(薬.*?\)',
+    r'/ 新規.*', r'/ 交代.*', r'/ 組織変更.*', r'/ 令\d+\..*', r'/ 平\d+\..*', r'/ 昭\d+\..*',
+    r'/ 現存.*', r'/ 療養病床.*',
+]
+medical_dept_patterns = [
+    r'/ 内[　\s]', r'/ 外[　\s]', r'/ 精[　\s]', r'/ 小[　\s]', r'/ 産婦[　\s]', r'/ 眼[　\s]', r'/ 耳[　\s]',
+    r'/ 皮[　\s]', r'/ リハ[　\s]', r'/ 放[　\s]', r'/ 麻[　\s]', r'/ 整外[　\s]', r'/ 脳外[　\s]', r'/ 心外[　\s]',
+    r'/ 呼内[　\s]', r'/ 循環器', r'/ 消化器', r'/ 内科', r'/ 外科', r'/ 精神',
+]
+
+def legacy_clean_text(text):
+    if pd.isna(text) or text == '':
+        return text
+    text = str(text)
+    for pattern in patterns_to_remove:
+        text = re.sub(pattern, '', text, flags=re.IGNORECASE)
+    text = re.sub(r'/\s*$', '', text)
+    return text.strip()
+
+def legacy_subs(*patterns, repl=''):
+    """patternsを順にre.subしてstripする関数（name / address / director などの列用）"""
+    def clean(text):
+        if pd.isna(text) or text == '':
+            return text
+        text = str(text)
+        for pattern in patterns:
+            text = re.sub(pattern, repl, text)
+        return text.strip()
+    return clean
+
+def legacy_code(text):
+    if pd.isna(text) or text == '':
+        return text
+    text = str(text)
+    for pattern in (r'^(\d+)\s*/\s*\([^)]+\)$', r'^(\d+)\s*/\s*.*$'):
+        match = re.match(pattern, text)
+        if match:
+            return match.group(1)
+    if re.match(r'^\d+$', text):
+        return text
+    return legacy_clean_text(text)
+
+def legacy_tel(text):
+    if pd.isna(text) or text == '':
+        return text
+    cleaned = legacy_clean_text(text)
+    if re.match(r'^\d{2,4}-\d{2,4}-\d{4}$', cleaned):
+        return cleaned + ','
+    if cleaned.endswith(','):
+        return cleaned
+    if re.match(r'^[\d\-]+$', cleaned) and '-' in cleaned:
+        return cleaned + ','
+    return cleaned
+
+legacy_cleaners = {
+    'code': legacy_code,
+    'name': legacy_subs(r'/ \(医.*?\)', r'/ \(歯.*?\)', r'/ \(薬.*?\)', r'/ 常　勤:.*', r'/ 非常勤:.*'),
+    'address': legacy_subs(r'/ 常　勤:.*'),
+    'tel': legacy_tel,
+    'corporation': legacy_subs(*[pattern + r'.*' for pattern in medical_dept_patterns]),
+    'director': legacy_subs(r'/ 新規.*', r'/ 現存.*', r'/ 交代.*', r'/ 組織変更.*'),
+    'established': legacy_subs(r'(昭\d+\.\s*\d+\.\s*\d+|平\d+\.\s*\d+\.\s*\d+|令\d+\.\s*\d+\.\s*\d+)\s*/\s*.*', repl=r'\1'),
+    'bed_type_and_count': legacy_subs(r'/ 現存.*', r'/ 療養病床.*'),
+}
+
+def legacy_clean(df):
+    """以前の実装（1セルずつ apply）"""
+    df = df.copy()
+    for col in df.columns:
+        if col in legacy_cleaners:
+            df[col] = df[col].apply(legacy_cleaners[col])
+        else:
+            df[col] = df[col].apply(lambda x: legacy_clean_text(x) if isinstance(x, str) and any(pattern in x for pattern in ['常　勤:', '非常勤:', '新規', '現存']) else x)
+    df[['address', 'prefecture']] = df[['prefecture', 'address']].values
+    df['code'] = [str(1234 + i) for i in range(len(df))]
+    return df
+
+# --- 今の実装 ---
+
+def rule_clean(df):
+    """cleaning_pipeline の形式統一版（列単位の一括適用）"""
+    df = df.copy()
+    clean_frame(df, UNIFY_FORMAT, verbose=False)
+    return df
+
+
+def timeit(label, func, repeat=3):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    print(f"{label:<40} {best * 1000:9.1f} ms  ({len(result):,}行)")
+    return best, result
+
+if __name__ == "__main__":
+    copies = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    source = pd.read_csv(csv_path, dtype=str, encoding='utf-8-sig', on_bad_lines='skip')
+    df = pd.concat([source] * copies, ignore_index=True)
+    print(f"📁 {os.path.basename(csv_path)} ×{copies}: {len(df):,}行, {len(df.columns)}列")
+
+    before, legacy_result = timeit("before: 1セルずつ apply + re.sub", lambda: legacy_clean(df), repeat=1)
+    after, rule_result = timeit("after : まとめた正規表現 + str.replace", lambda: rule_clean(df))
+    print(f"⚡ {before / after:.1f}倍")
+    # 以前の実装は全て欠損の列がfloat型になるので、型をそろえて比べる（CSVに書き出すとどちらも空欄）
+    if legacy_result.astype(object).equals(rule_result.astype(object)):
+        print("✅ 結果は全セル一致")
+    else:
+        print("❌ 結果が一致しません")
+        sys.exit(1)
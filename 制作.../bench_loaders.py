@@ -0,0 +1,80 @@
+"""
+カタログ読み込みの計測用スクリプト
+- before: 以前のiterrowsによる1行ずつの変換
+- after : catalog.py の列単位（ベクトル化）変換
+使い方: python bench_loaders.py
+"""
+import os
+import time
+import pandas as pd
+from catalog import load_hospital_cards, extract_hospital_data
+
+base_dir = os.path.dirname(__file__)
+csv_paths = [
+    os.path.join(base_dir, 'csv/fukushima_hos.csv'),
+    os.path.join(base_dir, 'csv/hokkaidou_dent.csv'),
+    os.path.join(base_dir, 'csv/yamagata_hos.csv'),
+    os.path.join(base_dir, 'csv/yamagata_dent.csv'),
+    os.path.join(base_dir, 'csv/miyagi_hos.csv'),
+    os.path.join(base_dir, 'csv/miyagi_dent.csv'),
+    os.path.join(base_dir, 'csv/iwate_hos.csv'),
+    os.path.join(base_dir, 'csv/iwate_dent.csv'),
+    os.path.join(base_dir, 'csv/fukushima_dent.csv'),
+    os.path.join(base_dir, 'csv/aomori_hos.csv'),
+    os.path.join(base_dir, 'csv/aomori_dent.csv'),
+]
+
+def read_frames(csv_paths):
+    return [pd.read_csv(path, header=0, skip_blank_lines=True, low_memory=False, dtype=str, on_bad_lines='skip')
+            for path in csv_paths if os.path.exists(path)]
+
+def legacy_cards(frames):
+    """以前の実装（iterrows）"""
+    cards = []
+    for df in frames:
+        for _, row in df.iterrows():
+            if pd.notna(row.get("name")):
+                cards.append({
+                    "name": row.get("name", ""),
+                    "address": row.get("address", ""),
+                    "departments": row.get("established", ""),
+                    "prefecture": row.get("prefecture", "")
+                })
+    return cards
+
+def legacy_hospital_data(frames):
+    """以前の実装（iterrows）"""
+    hospital_data = []
+    for df in frames:
+        for _, row in df.iterrows():
+            if pd.isna(row.get("name")) or pd.isna(row.get("address")) or pd.isna(row.get("established")):
+                continue
+            hospital_data.append({
+                "name": str(row.get("name", "")).strip(),
+                "address": str(row.get("address", "")).strip(),
+                "departments": str(row.get("established", "")).split(","),
+                "reviews": int(row.get("review", 0)) if pd.notna(row.get("review")) else 0,
+                "prefecture": str(row.get("prefecture", "")).strip(),
+            })
+    return hospital_data
+
+def timeit(label, func, repeat=3):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    print(f"{label:<40} {best * 1000:9.1f} ms  ({len(result):,}件)")
+    return best
+
+if __name__ == "__main__":
+    frames = read_frames(csv_paths)
+    print(f"📁 {len(frames)}ファイル, {sum(len(df) for df in frames):,}行")
+
+    # どちらもCSVの読み込みから変換までを計測
+    timeit("before: iterrows (cards)", lambda: legacy_cards(read_frames(csv_paths)))
+    timeit("after : 列単位変換 (cards)", lambda: load_hospital_cards(csv_paths))
+    timeit("before: iterrows (hospital-data)", lambda: legacy_hospital_data(read_frames(csv_paths)))
+    timeit("after : 列単位変換 (hospital-data)", lambda: extract_hospital_data(csv_paths))
+    timeit("参考: CSV読み込みのみ", lambda: read_frames(csv_paths))
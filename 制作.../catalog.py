@@ -0,0 +1,376 @@
+import os, copy, time, asyncio
+from collections import ChainMap
+from functools import cached_property
+import pandas as pd
+from collections.abc import Sequence
+from dataclasses import dataclass
+from types import MappingProxyType
+import numpy as np
+from csv_reader import read_columns, read_header, fill_empty
+from records import ChainedRecords, MappedRecords
+from search_index import SearchIndex
+from review_store import ReviewCounts
+from hospital_ids import assign_ids, institution_codes, next_id
+from geo import GeoIndex, load_postal_table, resolve_postal_codes
+from facets import FACILITY_TYPES, FacetIndex, facility_types
+from departments import DEPARTMENT_CODES
+from metrics import REGISTRY, span
+from prefectures import PREFECTURES, prefecture_from_path, prefecture_name, resolve_prefecture_codes
+
+
+def column_or_empty(df, name):
+    """列があればその列を、無ければ全てNaNの列を返す（row.get(name)の列版）"""
+    if name in df.columns:
+        return df[name]
+    return pd.Series(index=df.index, dtype=object)
+
+def to_records(columns):
+    """列（Series）の辞書からレコードのリストをまとめて作る"""
+    return pd.DataFrame(columns).to_dict("records")
+
+def coerce_review_counts(reviews):
+    """レビュー数の列を整数に変換（欠損・数値以外は0）"""
+    return pd.to_numeric(reviews, errors="coerce").fillna(0).astype(int)
+
+# 各ローダーが使う論理列（これ以外の列はCSVからパースしない）
+CARD_COLUMNS = ("name", "address", "established", "prefecture")
+DATA_COLUMNS = ("id", "code", "name", "address", "established", "review", "prefecture", "corporation", "facility_type", "bed_type_and_count")
+
+def load_hospital_cards(csv_paths):
+    cards = []
+    for csv_path in csv_paths:
+        if not os.path.exists(csv_path):
+            print(f"ファイルが見つかりません: {csv_path}")
+            continue
+        with span("load_hospital_cards.csv_parse"):
+            if read_header(csv_path)[0].startswith("col"):
+                # ヘッダーの無い3列のCSV（名前・住所・電話番号）
+                df = pd.read_csv(csv_path, dtype=str, on_bad_lines='skip', usecols=[0, 1], names=["name", "address"], header=0)
+            else:
+                df = read_columns(csv_path, CARD_COLUMNS, on_bad_lines='skip')
+
+        # 行ごとのループではなく列単位で絞り込み・変換する
+        with span("load_hospital_cards.row_conversion"):
+            df = df[column_or_empty(df, "name").notna()]
+            cards.extend(to_records({
+                "name": df["name"],
+                "address": column_or_empty(df, "address").fillna(""),
+                "departments": column_or_empty(df, "established").fillna(""),
+                "prefecture": fill_empty(column_or_empty(df, "prefecture")),
+            }))
+    return cards
+
+def extract_hospital_data(csv_paths):
+    hospital_data = []
+    for csv_path in csv_paths:
+        with span("extract_hospital_data.csv_parse"):
+            df = read_columns(csv_path, DATA_COLUMNS, skip_blank_lines=True, low_memory=False, on_bad_lines='skip')
+
+        with span("extract_hospital_data.row_conversion"):
+            names = column_or_empty(df, "name")
+            addresses = column_or_empty(df, "address")
+            established = column_or_empty(df, "established")
+            mask = names.notna() & addresses.notna() & established.notna()
+            df = df[mask]
+            names = names[mask].str.strip()
+            addresses = addresses[mask].str.strip()
+
+            hospital_data.extend(to_records({
+                # 医療機関コード（無ければ名前と住所）から作る安定ID（コードは「code」列か、列のずれたCSVでは「id」列）
+                "id": assign_ids(csv_path, institution_codes({column: column_or_empty(df, column) for column in ("code", "id")}), names, addresses),
+                "name": names,
+                "address": addresses,
+                "departments": established[mask].str.split(","),
+                "reviews": coerce_review_counts(column_or_empty(df, "review")),
+                "prefecture": fill_empty(column_or_empty(df, "prefecture")).str.strip(),
+                "corporation": column_or_empty(df, "corporation").fillna("").str.strip(),
+                "facility_type": facility_types(fill_empty(column_or_empty(df, "facility_type")), column_or_empty(df, "bed_type_and_count")),
+            }))
+    return hospital_data
+
+
+@dataclass(frozen=True)
+class CatalogSlice:
+    """
+    1つのCSVファイル（都道府県×病院/歯科）から作ったカタログの断片
+    cards / hospital_data はCSVから読めばdictのタプル、スナップショットから読めばMappedRecords
+    search_texts: hospital_dataの各行のキーワード検索用の文字列（SearchIndex.text）
+    （CSVから読めばstrのタプル、スナップショットから読めばMappedStrings）
+    """
+    path: str
+    cards: Sequence
+    hospital_data: Sequence
+    search_texts: Sequence
+    card_prefecture_codes: np.ndarray
+    data_prefecture_codes: np.ndarray
+    data_postal_codes: np.ndarray
+
+    @property
+    def prefecture(self):
+        return prefecture_from_path(self.path)
+
+    @classmethod
+    def from_csv(cls, csv_path):
+        cards = tuple(load_hospital_cards([csv_path]))
+        hospital_data = tuple(extract_hospital_data([csv_path])) if os.path.exists(csv_path) else ()
+        prefecture = prefecture_from_path(csv_path)
+        with span("catalog_slice.resolve_codes"):
+            return cls(
+                path=csv_path,
+                cards=cards,
+                hospital_data=hospital_data,
+                search_texts=tuple(SearchIndex.text(record) for record in hospital_data),
+                card_prefecture_codes=resolve_prefecture_codes(cards, prefecture),
+                data_prefecture_codes=resolve_prefecture_codes(hospital_data, prefecture),
+                data_postal_codes=resolve_postal_codes(hospital_data),
+            )
+
+
+class HospitalCatalog:
+    """
+    起動時に一度だけ構築する読み取り専用の病院カタログ
+    - CSVファイルごとの断片（CatalogSlice）をまとめて保持
+    - 各エンドポイントはここからデータを返すだけで、リクエスト毎のCSV読み込みはしない
+    - レコード（dict）は共有されるので、呼び出し側で書き換えないこと
+    - cards / hospital_data は断片を連結したビュー（断片のレコードをコピーしない）
+    - appended: 追記ログにあってまだCSVに書き込まれていない病院（cards / hospital_dataの末尾に並ぶ）
+    - review_counts: 病院ID → 投稿された口コミ数（CSVに依存しないので、作り直したカタログにも同じものを引き継ぐ）
+    - rows_by_id: 病院ID → hospital_dataの行番号（詳細ページなどでIDから定数時間で引く）
+      （追記分の辞書 → 断片の辞書 の順に引くChainMap。断片の辞書は追記では作り直さない）
+    - geo_index: hospital_dataの郵便番号の位置から作る格子索引（最初に使われた時に作る）
+    - facet_index: 都道府県・診療科・施設種別の値ごとのビットマップ（最初に使われた時に作る）
+    """
+
+    def __init__(self, slices, version: int = 0, appended=(), review_counts=None):
+        self.slices = MappingProxyType(dict(slices))
+        self.version = version
+        self.review_counts = ReviewCounts() if review_counts is None else review_counts
+        self._assemble(appended)
+        with span("search_index.build"):
+            self.search_index = SearchIndex(
+                self.hospital_data,
+                [prefecture_name(code) for code in self.prefecture_codes["hospital_data"]],
+                self.search_texts,
+            )
+
+    def _assemble(self, appended):
+        """断片と追記分から、連結したレコードと都道府県コードを作る"""
+        slices = list(self.slices.values())
+        self.appended = ()
+        self.cards = ChainedRecords([s.cards for s in slices])
+        self.hospital_data = ChainedRecords([s.hospital_data for s in slices])
+        self.search_texts = ChainedRecords([s.search_texts for s in slices])
+        # 各行の都道府県コード（ブロック判定・地域検索用に読み込み時に一度だけ判定）
+        self.prefecture_codes = {
+            "cards": np.concatenate([s.card_prefecture_codes for s in slices] + [np.empty(0, dtype=np.int8)]),
+            "hospital_data": np.concatenate([s.data_prefecture_codes for s in slices] + [np.empty(0, dtype=np.int8)]),
+        }
+        # 各行の郵便番号（位置の検索用、見つからない行は0）
+        self.postal_codes = np.concatenate([s.data_postal_codes for s in slices] + [np.empty(0, dtype=np.uint32)])
+        ids = (hospital_id for s in slices for hospital_id in _column(s.hospital_data, "id"))
+        self.rows_by_id = ChainMap({}, {hospital_id: row_id for row_id, hospital_id in enumerate(ids)})
+        self._append(tuple(appended))
+
+    def _append(self, entries):
+        """
+        追記分entriesを末尾に足す（既存の行は読み直さない）
+        レコードは断片を1つ足すだけ、都道府県コード・郵便番号は追加分だけ判定して配列をつなぎ、
+        IDの辞書は追記分のものだけ作り直す（断片の辞書は共有する）
+        """
+        start = len(self.hospital_data)
+        self.appended = self.appended + entries
+        self.cards = ChainedRecords(self.cards.parts + [tuple(entry.card for entry in entries)])
+        self.hospital_data = ChainedRecords(self.hospital_data.parts + [tuple(entry.hospital_data for entry in entries)])
+        self.search_texts = ChainedRecords(self.search_texts.parts + [tuple(SearchIndex.text(entry.hospital_data) for entry in entries)])
+        self.prefecture_codes = {
+            "cards": np.concatenate([self.prefecture_codes["cards"], _appended_codes(entries, "card")]),
+            "hospital_data": np.concatenate([self.prefecture_codes["hospital_data"], _appended_codes(entries, "hospital_data")]),
+        }
+        self.postal_codes = np.concatenate([self.postal_codes, resolve_postal_codes([entry.hospital_data for entry in entries])])
+        appended_ids = dict(self.rows_by_id.maps[0])
+        appended_ids.update((entry.hospital_data["id"], row_id) for row_id, entry in enumerate(entries, start))
+        self.rows_by_id = ChainMap(appended_ids, self.rows_by_id.maps[1])
+
+    @classmethod
+    def from_csv(cls, csv_paths):
+        """csv_pathsから全断片を構築（同じパスの重複は1回だけ読み込む）"""
+        return cls({path: CatalogSlice.from_csv(path) for path in dict.fromkeys(csv_paths)})
+
+    def replace_slice(self, new_slice, appended=None):
+        """指定の断片だけを差し替えた新しいカタログを返す（自身は変更しない、appendedを省略すると追記分は引き継ぐ）"""
+        slices = dict(self.slices)
+        slices[new_slice.path] = new_slice
+        return HospitalCatalog(
+            slices,
+            version=self.version + 1,
+            appended=self.appended if appended is None else appended,
+            review_counts=self.review_counts,
+        )
+
+    def with_appended(self, entries):
+        """
+        追記ログの病院を末尾に足した新しいカタログを返す（自身は変更しない）
+        既存の行番号は変わらないので、レコード・ID・都道府県コード・郵便番号・検索インデックスは追加分だけを足す
+        """
+        entries = tuple(entries)
+        catalog = copy.copy(self)
+        # 最初に使われた時に作る索引（位置・ファセット）は、追加後の行で作り直す
+        catalog.__dict__.pop("geo_index", None)
+        catalog.__dict__.pop("facet_index", None)
+        catalog.version = self.version + 1
+        catalog._append(entries)
+        new_codes = catalog.prefecture_codes["hospital_data"][len(self.hospital_data):]
+        catalog.search_index = self.search_index.extended(
+            catalog.hospital_data,
+            [entry.hospital_data for entry in entries],
+            [prefecture_name(code) for code in new_codes],
+            catalog.search_texts,
+        )
+        return catalog
+
+    @cached_property
+    def geo_index(self):
+        """郵便番号の座標表（geo.py で作成）で各行の位置を決めた格子索引（表が無ければ空）"""
+        return GeoIndex(*load_postal_table().locate(self.postal_codes))
+
+    @cached_property
+    def facet_index(self):
+        """ファセットのビットマップ（都道府県・診療科は検索インデックスの行番号から作る）"""
+        empty = np.empty(0, dtype=np.int32)
+        by_department = self.search_index.by_department
+        types = np.array([value for s in self.slices.values() for value in _column(s.hospital_data, "facility_type")]
+                         + [entry.hospital_data["facility_type"] for entry in self.appended], dtype=object)
+        return FacetIndex(len(self.hospital_data), {
+            "prefecture": {name: self.search_index.by_prefecture.get(name, empty) for name in PREFECTURES},
+            "department": {name: by_department.get(name, empty) for name in dict.fromkeys(DEPARTMENT_CODES.values())},
+            "facility_type": {name: np.flatnonzero(types == name) for name in FACILITY_TYPES},
+        })
+
+    def row_of(self, hospital_id):
+        """IDの病院のhospital_dataの行番号（無ければNone）"""
+        return self.rows_by_id.get(hospital_id)
+
+    def new_hospital_id(self, csv_path, name, address):
+        """csv_pathに追加する病院のID（既存の病院と重ならない）"""
+        return next_id(csv_path, name, address, self.rows_by_id)
+
+    def __len__(self):
+        return len(self.hospital_data)
+
+
+def _column(records, name):
+    """各行のname列の値（メモリマップのレコードはdictを組み立てずにその列だけを読む）"""
+    if isinstance(records, MappedRecords):
+        column = records.columns[name]
+        return [column[row_id] for row_id in range(len(column))]
+    return [record[name] for record in records]
+
+def _appended_codes(entries, kind):
+    """追記分の都道府県コード（判定はCSVから読んだ場合と同じ、ファイル名の都道府県を既定値にする）"""
+    codes = [resolve_prefecture_codes([getattr(entry, kind)], prefecture_from_path(entry.path)) for entry in entries]
+    return np.concatenate(codes) if codes else np.empty(0, dtype=np.int8)
+
+
+# 断片のホットリロード（CSVの読み直しから差し替えまで）の所要時間
+reload_seconds = REGISTRY.histogram("hospital_catalog_reload_duration_seconds", "CSVの変更を検知してから断片を差し替えるまでの所要時間", ("csv",))
+
+def file_stat(path):
+    """変更検知用の (mtime, size)。ファイルが無ければNone"""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+class CatalogWatcher:
+    """
+    CSVファイルの更新を監視してカタログをホットリロードする
+    - mtime/サイズの変化を定期的にポーリング
+    - 書き込み途中のファイルを読まないよう、1周期変化が止まるまで待ってから再構築
+    - 再構築は変更されたファイルの断片だけをスレッドで行い、イベントループを止めない
+    - 完成したカタログを参照1つの代入で差し替えるので、リクエストが作りかけを見ることはない
+    - pending: 追記ログにまだ残っている病院のID集合を返す関数。断片を読み直す時、
+      CSVに書き込み済み（ログから消えた）追記分をカタログから外すのに使う
+    """
+
+    def __init__(self, catalog, interval: float = 2.0, pending=None):
+        self.catalog = catalog
+        self.interval = interval
+        self.pending = pending
+        self._stats = {path: file_stat(path) for path in catalog.slices}
+        self._pending = {}
+        self._task = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.check()
+            except Exception as e:
+                print(f"カタログ監視でエラーが発生しました: {e}")
+
+    async def check(self):
+        """変更が落ち着いたファイルの断片を再構築して差し替える"""
+        for path in list(self.catalog.slices):
+            stat = file_stat(path)
+            if stat == self._stats.get(path):
+                self._pending.pop(path, None)
+                continue
+            if self._pending.get(path) != stat:
+                # 変更を検知。次の周期でも同じなら書き込み完了とみなす
+                self._pending[path] = stat
+                continue
+
+            start_time = time.perf_counter()
+            try:
+                new_slice = await asyncio.to_thread(CatalogSlice.from_csv, path)
+            except Exception as e:
+                print(f"再読み込みに失敗しました（前のデータを使い続けます）: {path}: {e}")
+                continue
+            if file_stat(path) != stat:
+                # 読み込み中にさらに書き換えられた → 次の周期でやり直し
+                continue
+
+            await self._update(lambda catalog: catalog.replace_slice(new_slice, self._pending_appended(catalog)))
+            self._stats[path] = stat
+            self._pending.pop(path, None)
+            reload_seconds.observe(time.perf_counter() - start_time, csv=os.path.basename(path))
+            print(f"カタログを再読み込みしました: {path}（version {self.catalog.version}）")
+
+    def _pending_appended(self, catalog):
+        """カタログの追記分のうち、まだCSVに書き込まれていないもの"""
+        if self.pending is None:
+            return catalog.appended
+        pending_ids = self.pending()
+        return tuple(entry for entry in catalog.appended if entry.id in pending_ids)
+
+    async def append(self, entries):
+        """追記ログに書き込んだ病院をカタログに反映（インデックスは追加分だけ更新）"""
+        with span("catalog.append"):
+            await self._update(lambda catalog: catalog.with_appended(entries))
+
+    async def _update(self, build):
+        """
+        build(現在のカタログ) をスレッドで作って差し替える
+        作っている間に別の更新で差し替わっていたら、新しいカタログから作り直す
+        """
+        while True:
+            base = self.catalog
+            updated = await asyncio.to_thread(build, base)
+            if self.catalog is base:
+                self.catalog = updated
+                return updated
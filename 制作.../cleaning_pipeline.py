@@ -0,0 +1,553 @@
+"""
+医療データCSVのクリーニング（hyphen.py / slash_delete.py 共通の処理）
+- 1ファイルずつ 読み込み → 列ごとのクリーニング → addressとprefectureの入れ替え → code列の連番 → 書き出し の順に処理する
+- 列ごとに何をするかはプリセット（CleaningPreset）で決める
+  - UNIFY_FORMAT（hyphen.py）: 形式統一版。列ごとの専用ルール、addressとprefectureの入れ替え、code列の連番
+  - KEEP_ID_FORMAT（slash_delete.py）: ID形式保持版。「数値,コード / 文字列,数値,数値,」の部分は残す
+- 入れ替え・連番はクリーニング結果を書き込む列を変えるだけで、表全体の複製は作らない
+- ファイルは1回だけ先頭から読み（csv_reader.read_csv_chunks）、列数の多すぎる行は行番号付きで
+  <csv>.quarantine に退避する
+- CHUNK_ROWS行ずつクリーニングしては一時ファイルに書き足し、最後に元のファイルと置き換える
+  （メモリに載るのは1チャンク分（ID列か決まらない列がある間は最大SAMPLE_ROWS行）だけなので、
+  全国分の大きなCSVでも使うメモリは増えない）
+- --jobs N でファイルごと（大きなファイルは行範囲ごと）にN個のプロセスで並列に処理する
+"""
+import io
+import os
+import csv
+import time
+import shutil
+import argparse
+import contextlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from cleaning_rules import ColumnRule, truncate, remove, sub, STRIP
+from csv_reader import read_csv_chunks, BadRows
+
+
+# ID形式を含む列かどうかを、列の先頭から何件の値で判定するか
+ID_SAMPLES = 5
+
+# 判定に使う値がそろわない列のために、書き出さずに持っておく行数の上限（超えたらそこまでの値で決める）
+SAMPLE_ROWS = 5_000
+
+
+@dataclass(frozen=True)
+class CleaningPreset:
+    """
+    クリーニングの設定（列のルールは rules → id_rule → target_rules → default_rule の順に決める）
+    - rules: 列名 → ColumnRule（最優先）
+    - id_rule: rulesに無い列のうち、ID形式を含む列のルール（列名がid_namesにある、
+      または先頭5件の値がid_sample_patternを含む列）
+    - target_rules: ID形式を含まない列の、列名 → ColumnRule
+    - default_rule: それ以外の列のルール
+    - swap_columns: 列順はそのままで中身を入れ替える2列
+    - renumber_column: クリーニングの後、renumber_startからの連番で置き換える列
+    - example_columns: 処理前後の例を表示する列（Noneなら先頭の3列）
+    """
+    name: str
+    rules: dict
+    default_rule: ColumnRule
+    id_rule: ColumnRule = None
+    target_rules: dict = field(default_factory=dict)
+    id_names: tuple = ()
+    id_sample_pattern: str = None
+    swap_columns: tuple = ()
+    renumber_column: str = None
+    renumber_start: int = 1234
+    example_columns: tuple = None
+
+    def is_id_column(self, col, values):
+        """列がID形式を含む可能性が高いかを判定"""
+        samples = values.dropna().head(ID_SAMPLES)
+        if not col or len(samples) == 0:
+            return False
+        if col.lower() in self.id_names:
+            return True
+        return bool(samples.astype(str).str.contains(self.id_sample_pattern).any())
+
+    def rule_for(self, col, values):
+        rule = self.rules.get(col)
+        if rule is not None:
+            return rule
+        if self.id_rule is not None and self.is_id_column(col, values):
+            return self.id_rule
+        return self.target_rules.get(col, self.default_rule)
+
+
+# --- ルール ---
+
+# 常勤・非常勤の情報以降と、医師数などの情報（どちらのプリセットでも先頭で削除）
+STAFF_INFO = (
+    truncate(
+        r'/ 常　勤:',      # 常勤情報以降を削除
+        r'/ 非常勤:',      # 非常勤情報以降を削除
+    )
+    + remove(
+        r'/ \(医.*?\)',    # 医師数情報を削除
+        r'/ \(歯.*?\)',    # 歯科医師数情報を削除
+        r'/ \(薬.*?\)',    # 薬剤師数情報を削除
+    )
+)
+# 最後の「/」があれば削除してトリム
+TRAILING_SLASH = sub(r'/\s*$', '') + STRIP
+# 電話番号: 数字とハイフンだけの電話番号（0XX-XXX-XXXX など）にカンマを追加
+TEL_COMMA = sub(r'^([\d\-]*-[\d\-]*)$', r'\1,')
+
+UNIFY_CLEAN_TEXT = (
+    STAFF_INFO
+    + truncate(
+        r'/ 新規',         # 新規情報以降を削除
+        r'/ 交代',         # 交代情報以降を削除
+        r'/ 組織変更',     # 組織変更情報以降を削除
+        r'/ 令\d+\.',      # 令和年月日以降を削除
+        r'/ 平\d+\.',      # 平成年月日以降を削除
+        r'/ 昭\d+\.',      # 昭和年月日以降を削除
+        r'/ 現存',         # 現存情報以降を削除
+        r'/ 療養病床',     # 療養病床情報以降を削除
+    )
+    + TRAILING_SLASH
+)
+
+KEEP_ID_CLEAN_TEXT = (
+    STAFF_INFO
+    + truncate(r'/ 新規', r'/ 令\d+\.', r'/ 平\d+\.', r'/ 昭\d+\.', r'/ 現存')
+    + TRAILING_SLASH
+)
+
+# 診療科目情報の開始パターン（corporation列は長い診療科目リストが続くため、ここから削除）
+MEDICAL_DEPT_PATTERNS = (
+    r'/ 内[　\s]', r'/ 外[　\s]', r'/ 精[　\s]', r'/ 小[　\s]', r'/ 産婦[　\s]',
+    r'/ 眼[　\s]', r'/ 耳[　\s]', r'/ 皮[　\s]', r'/ リハ[　\s]', r'/ 放[　\s]',
+    r'/ 麻[　\s]', r'/ 整外[　\s]', r'/ 脳外[　\s]', r'/ 心外[　\s]', r'/ 呼内[　\s]',
+    r'/ 循環器', r'/ 消化器', r'/ 内科', r'/ 外科', r'/ 精神',
+)
+
+_DEDICATED = "🔧 {col}: 専用クリーニング実行"
+
+UNIFY_FORMAT = CleaningPreset(
+    name="形式統一版",
+    rules={
+        # code列: 「01 / (01 / 山医1,1001 / 3001,7 / 1)」「01 / 山医17,1017,3」→「01」（このあと連番で置き換えるが、クリーニング数には数える）
+        'code': ColumnRule(sub(r'^(\d+)\s*/\s*.*$', r'\1') + UNIFY_CLEAN_TEXT, note=_DEDICATED),
+        # name列: 医師数情報・常勤情報を削除
+        'name': ColumnRule(
+            remove(r'/ \(医.*?\)', r'/ \(歯.*?\)', r'/ \(薬.*?\)') + truncate(r'/ 常　勤:', r'/ 非常勤:') + STRIP,
+            note=_DEDICATED,
+        ),
+        # address列: 常勤情報以降を削除
+        'address': ColumnRule(truncate(r'/ 常　勤:') + STRIP, note=_DEDICATED),
+        'tel': ColumnRule(UNIFY_CLEAN_TEXT + TEL_COMMA, note=_DEDICATED),
+        'corporation': ColumnRule(truncate(*MEDICAL_DEPT_PATTERNS) + STRIP, note=_DEDICATED),
+        # director列: 新規、現存、交代などの情報を削除
+        'director': ColumnRule(truncate(r'/ 新規', r'/ 現存', r'/ 交代', r'/ 組織変更') + STRIP, note=_DEDICATED),
+        # established列: 年月日の後に続く診療科目情報を削除
+        'established': ColumnRule(
+            sub(r'(昭\d+\.\s*\d+\.\s*\d+|平\d+\.\s*\d+\.\s*\d+|令\d+\.\s*\d+\.\s*\d+)\s*/\s*.*', r'\1') + STRIP,
+            note=_DEDICATED,
+        ),
+        # bed_type_and_count列: 現存情報以降を削除
+        'bed_type_and_count': ColumnRule(truncate(r'/ 現存', r'/ 療養病床') + STRIP, note=_DEDICATED),
+    },
+    # その他の列は、常勤情報などを含むセルだけ軽くクリーニング
+    default_rule=ColumnRule(UNIFY_CLEAN_TEXT, trigger=r'常　勤:|非常勤:|新規|現存'),
+    swap_columns=('address', 'prefecture'),
+    renumber_column='code',
+    example_columns=('code', 'name', 'address', 'tel'),
+)
+
+_KEEP_ID_TEXT = ColumnRule(KEEP_ID_CLEAN_TEXT)
+
+KEEP_ID_FORMAT = CleaningPreset(
+    name="ID形式保持版",
+    # 電話番号列はカンマ付き（ID形式の判定より先）
+    rules={'tel': ColumnRule(KEEP_ID_CLEAN_TEXT + TEL_COMMA)},
+    # ID形式を含む列は、例: "4.0,01 / 山医17,1017,3," の部分を残して後ろだけをクリーニング
+    # （address・corporationなどの重要な列でも、ID形式を含むならこちら）
+    id_rule=ColumnRule(
+        KEEP_ID_CLEAN_TEXT,
+        prefix=r'^(\d+(?:\.\d+)?,\d+\s*/\s*[^,]+,\d+,\d+,?)(.*)$',
+        note="🔢 {col}: ID形式保持モードで処理",
+    ),
+    id_names=('id', 'code', 'name'),
+    id_sample_pattern=r'\d+(?:\.\d+)?,\d+\s*/\s*[^,]+,\d+,\d+',
+    # ID形式を含まない重要な列は確実にクリーニング
+    target_rules={col: _KEEP_ID_TEXT for col in ('address', 'corporation', 'director', 'established', 'bed_type_and_count', 'facility_type')},
+    # その他の列も常勤情報を含むセルだけ軽くクリーニング
+    default_rule=ColumnRule(KEEP_ID_CLEAN_TEXT, trigger=r'常　勤:|非常勤:'),
+)
+
+
+# --- パイプライン ---
+
+# 1回に読み込んで処理する行数（1,100列あるCSVで、使うメモリは1チャンクあたり300MB程度）
+CHUNK_ROWS = 5_000
+
+# --jobs で並列に処理する時、このサイズ以上のファイルは行範囲ごとに分けてプロセスに任せる
+SHARD_BYTES = 64 * 1024 * 1024
+
+def clean_columns(frame, rules):
+    """
+    frameの各列にrules[列名]を適用する（プロセスプールでも実行できるよう、状態を持たない関数）
+    戻り値: {列名: (処理後の値の配列 or None（変化なし）, 変わったセルの数)}
+    """
+    results = {}
+    for col, rule in rules.items():
+        values, changed = rule.apply(frame[col])
+        results[col] = (values.to_numpy() if changed > 0 else None, changed)
+    return results
+
+
+class ChunkCleaner:
+    """
+    チャンク（ファイルの一部の行）を先頭から順にクリーニングし、入れ替え・連番まで行う
+    - 列ごとのルールは、observeで先頭から集めた値で決めて以降も使う
+      ID列の判定に使う先頭5件の値がそろうまで（ID形式の値が見つかるまで）はその列のルールを決めず、
+      呼び出し側はその間のチャンクを書き出さずに持っておく（チャンクの行数によって結果が変わらないように）
+    - 値の無い列（詰め物の空列など）は値を集めず、ルールの決まるのも待たない
+    - 変わったセルの数は列ごとに足していくだけで、元の列の複製は持たない
+    - 連番は前のチャンクまでの行数から続ける
+    - 列の処理（clean_columns）は prepare / finish の間で別プロセスに任せられる（行範囲ごとの並列処理）
+    """
+
+    def __init__(self, preset):
+        self.preset = preset
+        self.columns = None
+        self.rules = {}
+        self.samples = {}
+        self.changed = {}
+        self.rows = 0
+
+    @property
+    def cleaned_count(self):
+        return sum(self.changed.values())
+
+    @property
+    def undecided(self):
+        """値はあるが、まだルールの決まっていない列があるか"""
+        return bool(self.samples)
+
+    def observe(self, df):
+        """
+        チャンクdfの値を、ルールの決まっていない列の先頭からID_SAMPLES件まで集め、決められる列のルールを決める
+        （rules・id_namesにある列、値がID_SAMPLES件そろった列、ID形式の値が見つかった列）
+        """
+        preset = self.preset
+        for col in df.columns:
+            if col in self.rules:
+                continue
+            values = df[col].dropna()
+            if values.empty:
+                continue
+            samples = self.samples.pop(col, values.iloc[:0])
+            samples = pd.concat([samples, values.head(ID_SAMPLES - len(samples))])
+            if (preset.id_rule is None or not col or col in preset.rules or col.lower() in preset.id_names
+                    or len(samples) >= ID_SAMPLES or preset.is_id_column(col, samples)):
+                self.rules[col] = preset.rule_for(col, samples)
+            else:
+                self.samples[col] = samples
+
+    def decide(self):
+        """ルールの決まっていない列を、ここまでに集めた値で決める（ファイルの終わり・持っておく行数の上限）"""
+        for col, samples in self.samples.items():
+            self.rules[col] = self.preset.rule_for(col, samples)
+        self.samples.clear()
+
+    def prepare(self, df):
+        """
+        チャンクのうちクリーニングする列（値のある列）と、その列のルールを決める
+        戻り値: (クリーニングする列だけのDataFrame, {列名: ColumnRule})（clean_columns に渡す）
+        """
+        if self.columns is None:
+            self.columns = list(df.columns)
+        rules = {}
+        for col in df.columns:
+            values = df[col]
+            # 値の無い列はどのルールでも変わらないので、ルールも決めずに飛ばす
+            if not values.notna().any():
+                continue
+            if col not in self.rules:
+                self.rules[col] = self.preset.rule_for(col, values)
+            rules[col] = self.rules[col]
+        return df[list(rules)], rules
+
+    def finish(self, df, results):
+        """clean_columns の結果をdfに書き込み、入れ替え・連番まで行う（dfを書き換えて返す）"""
+        preset = self.preset
+        swap = self.swap_columns
+        destination = dict(zip(swap, reversed(swap)))
+
+        # 各列の結果は、書き込み先の列（入れ替える列は相手の列）ごとにまとめておき最後に差し替える
+        updates = {}
+        for col, (values, changed) in results.items():
+            if changed > 0:
+                self.changed[col] = self.changed.get(col, 0) + changed
+                updates[destination.get(col, col)] = values
+        for col in swap:
+            if destination[col] not in updates:
+                # 差し替えで書き換わらないよう、元の値は複製して持つ（1つのブロックに入っている表では列が配列の一部）
+                updates[destination[col]] = df[col].to_numpy(copy=True)
+        for col, values in updates.items():
+            df[col] = values
+
+        if preset.renumber_column in df.columns:
+            df[preset.renumber_column] = (np.arange(len(df)) + preset.renumber_start + self.rows).astype(str)
+        self.rows += len(df)
+        return df
+
+    def clean(self, df):
+        """dfを書き換えて返す"""
+        return self.finish(df, clean_columns(*self.prepare(df)))
+
+    @property
+    def swap_columns(self):
+        columns = self.columns or []
+        return self.preset.swap_columns if all(col in columns for col in self.preset.swap_columns) else ()
+
+    def report(self):
+        """列ごとの処理内容と変わったセルの数を表示"""
+        empty = pd.Series([], dtype=object)
+        for col in self.columns or []:
+            rule = self.rules.get(col) or self.preset.rule_for(col, empty)
+            if rule.note:
+                print(f"   {rule.note.format(col=col)}")
+            if self.changed.get(col):
+                print(f"   ✅ {col}: {self.changed[col]:,}行をクリーニング")
+        swap = self.swap_columns
+        if swap:
+            print(f"🔄 『{swap[0]}』と『{swap[1]}』の中身を入れ替えました（列順はそのまま）")
+        if self.preset.renumber_column in (self.columns or []):
+            print(f"🔢 『{self.preset.renumber_column}』列に連番（{self.preset.renumber_start}〜）を挿入しました")
+
+
+def clean_frame(df, preset, verbose=True):
+    """
+    dfの全列をクリーニングし、入れ替え・連番まで行う（dfを書き換える）
+    戻り値: クリーニングで変わったセルの数
+    """
+    cleaner = ChunkCleaner(preset)
+    cleaner.clean(df)
+    if verbose:
+        cleaner.report()
+    return cleaner.cleaned_count
+
+def _print_examples(df, columns, title, limit=None):
+    print(f"\n📋 {title}:")
+    for col in columns:
+        if col in df.columns and len(df) > 0 and pd.notna(df[col].iloc[0]):
+            example = str(df[col].iloc[0])
+            print(f"   {col}: {example[:limit]}..." if limit else f"   {col}: {example}")
+
+def _write_cleaned(csv_path, tmp_path, preset, chunksize, bad_rows, executor=None, max_pending=0):
+    """
+    csv_pathをチャンクごとに読み・クリーニングしてtmp_pathに書き足す（列数の多すぎる行はbad_rowsへ）
+    executorを渡すと、各チャンクの列の処理をプールで実行し、読み込んだ順に書き込む
+    （実行中・書き込み待ちのチャンクはmax_pending個まで）
+    戻り値: (ChunkCleaner, 処理後の先頭行（例の表示用）)
+    """
+    cleaner = ChunkCleaner(preset)
+    first = None
+    pending = deque()
+    # ルールの決まっていない列があるうちは、読んだチャンクを書き出さずに持っておく
+    held = deque()
+    held_rows = 0
+
+    def write(chunk, results):
+        nonlocal first
+        cleaner.finish(chunk, results)
+        is_first = first is None
+        if is_first:
+            first = chunk.head(1)
+        chunk.to_csv(out, index=False, header=is_first, quoting=csv.QUOTE_MINIMAL)
+
+    def flush():
+        nonlocal held_rows
+        cleaner.decide()
+        while held:
+            chunk = held.popleft()
+            frame, rules = cleaner.prepare(chunk)
+            if executor is None:
+                write(chunk, clean_columns(frame, rules))
+                continue
+            pending.append((chunk, executor.submit(clean_columns, frame, rules)))
+            while len(pending) > max_pending:
+                chunk, future = pending.popleft()
+                write(chunk, future.result())
+        held_rows = 0
+
+    with open(tmp_path, 'w', encoding='utf-8-sig', newline='') as out:
+        try:
+            for chunk_idx, chunk in enumerate(read_csv_chunks(csv_path, chunksize, bad_rows)):
+                if chunk_idx == 0:
+                    # データクリーニング実行
+                    print(f"🔄 データクリーニング開始...")
+                    example_columns = preset.example_columns or chunk.columns[:3]
+                    _print_examples(chunk, example_columns, "処理前の例", limit=100)
+                cleaner.observe(chunk)
+                held.append(chunk)
+                held_rows += len(chunk)
+                if not cleaner.undecided or held_rows >= SAMPLE_ROWS:
+                    flush()
+            flush()
+            while pending:
+                chunk, future = pending.popleft()
+                write(chunk, future.result())
+        finally:
+            for _, future in pending:
+                future.cancel()
+    return cleaner, first
+
+def _keep_backup(csv_path):
+    """初回だけ元のファイルを .backup に残す（元のファイルはそのままの場所に残る）"""
+    backup_path = csv_path + '.backup'
+    if Path(backup_path).exists():
+        return
+    try:
+        os.link(csv_path, backup_path)
+    except OSError:
+        shutil.copy2(csv_path, backup_path)
+    print(f"💾 バックアップ作成: {backup_path}")
+
+def clean_file(csv_path, preset, chunksize=CHUNK_ROWS, executor=None, max_pending=0):
+    """
+    1ファイルをchunksize行ずつクリーニングして一時ファイルに書き、最後に元のファイルと置き換える
+    （途中で失敗しても元のファイルはそのまま。初回は .backup に元のファイルを残す）
+    列数がヘッダーより多い行は書き出さず、行番号付きで <csv>.quarantine に退避する
+    executor: 渡すとチャンク（行範囲）ごとの列の処理をこのプールで並列に実行する
+    戻り値: {"path", "rows", "bad_rows", "cleaned_count", "elapsed"}（読み込めなかったらNone）
+    """
+    start_time = time.time()
+
+    # ファイル存在確認
+    if not Path(csv_path).exists():
+        print(f"❌ ファイルが見つかりません: {csv_path}")
+        return None
+
+    tmp_path = csv_path + '.tmp'
+    bad_rows = BadRows(csv_path + '.quarantine')
+    try:
+        cleaner, first = _write_cleaned(csv_path, tmp_path, preset, chunksize, bad_rows, executor, max_pending)
+    except Exception as e:
+        Path(tmp_path).unlink(missing_ok=True)
+        print(f"❌ 読み込み失敗: {str(e)[:100]}...")
+        return None
+    finally:
+        bad_rows.close()
+    print(f"✅ 読み込み成功: {cleaner.rows:,}行, {len(cleaner.columns or []):,}列")
+    if bad_rows.count:
+        lines = ", ".join(str(line) for line in bad_rows.lines[:5]) + (" ..." if bad_rows.count > 5 else "")
+        print(f"⚠️  列数の多すぎる行: {bad_rows.count:,}行（{lines}行目）→ {bad_rows.path}")
+
+    cleaner.report()
+    if first is not None:
+        _print_examples(first, preset.example_columns or first.columns[:3], "処理後の例")
+
+    # バックアップ作成・ファイルの置き換え
+    _keep_backup(csv_path)
+    os.replace(tmp_path, csv_path)
+
+    # 処理時間計算
+    elapsed_time = time.time() - start_time
+
+    print(f"\n✅ 処理完了!")
+    print(f"   📊 総クリーニング数: {cleaner.cleaned_count:,}箇所")
+    if bad_rows.count:
+        print(f"   ⚠️  退避した行: {bad_rows.count:,}行")
+    print(f"   ⏱️  処理時間: {elapsed_time:.2f}秒")
+    print(f"   💾 保存完了: {csv_path}")
+    return {
+        "path": csv_path, "rows": cleaner.rows, "bad_rows": bad_rows.count,
+        "cleaned_count": cleaner.cleaned_count, "elapsed": elapsed_time,
+    }
+
+def _clean_file_safely(csv_path, preset, chunksize, executor=None, max_pending=0):
+    """clean_file（予期しないエラーは表示してNoneを返す）"""
+    try:
+        return clean_file(csv_path, preset, chunksize, executor, max_pending)
+    except Exception as e:
+        print(f"❌ 予期しないエラー: {csv_path}")
+        print(f"   エラー詳細: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return None
+
+def _clean_file_logged(csv_path, preset, chunksize):
+    """プロセスプールで1ファイルを処理する: (clean_fileの結果, ログ)（ログは親プロセスがファイルの順に表示する）"""
+    log = io.StringIO()
+    with contextlib.redirect_stdout(log), contextlib.redirect_stderr(log):
+        result = _clean_file_safely(csv_path, preset, chunksize)
+    return result, log.getvalue()
+
+def _is_huge(csv_path, shard_bytes):
+    try:
+        return os.path.getsize(csv_path) >= shard_bytes
+    except OSError:
+        return False
+
+def clean_medical_data(csv_paths, preset, chunksize=CHUNK_ROWS, jobs=1, shard_bytes=SHARD_BYTES):
+    """
+    医療データCSVから不要な情報を一括削除（presetの設定で、chunksize行ずつ）
+    jobs: 同時に処理するプロセス数（1なら1ファイルずつ順に、0なら全コア）
+      - shard_bytes未満のファイルは、1ファイルずつプールのプロセスで処理する
+      - shard_bytes以上のファイルは、このプロセスで読み書きし、チャンク（行範囲）ごとの処理をプールに任せる
+      どちらも書き出す内容は1プロセスで処理した時と同じ（ログもファイルの順に表示する）
+    戻り値: 処理できたファイルごとの clean_file の結果のリスト
+    """
+    total_files = len(csv_paths)
+    jobs = jobs or os.cpu_count() or 1
+    start_time = time.time()
+    results = []
+
+    def run(executor=None, futures=None):
+        for file_idx, csv_path in enumerate(csv_paths, 1):
+            print(f"\n{'='*60}")
+            print(f"処理中 ({file_idx}/{total_files}): {csv_path}")
+            print(f"{'='*60}")
+
+            if futures and futures[file_idx - 1] is not None:
+                result, log = futures[file_idx - 1].result()
+                print(log, end="")
+            else:
+                result = _clean_file_safely(csv_path, preset, chunksize, executor, max_pending=jobs * 2)
+            if result is not None:
+                results.append(result)
+
+    if jobs <= 1:
+        run()
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            futures = [
+                None if _is_huge(csv_path, shard_bytes) else executor.submit(_clean_file_logged, csv_path, preset, chunksize)
+                for csv_path in csv_paths
+            ]
+            run(executor, futures)
+
+    print(f"\n{'='*60}")
+    print(f"🎉 全体処理完了! ({total_files}ファイル)")
+    print(f"   📊 総クリーニング数: {sum(r['cleaned_count'] for r in results):,}箇所"
+          f"（{len(results)}ファイル, {sum(r['rows'] for r in results):,}行）")
+    bad_rows = sum(r['bad_rows'] for r in results)
+    if bad_rows:
+        print(f"   ⚠️  列数の多すぎる行: {bad_rows:,}行（各ファイルの .quarantine に退避）")
+    print(f"   ⏱️  処理時間: {time.time() - start_time:.2f}秒"
+          f"（ファイルごとの合計 {sum(r['elapsed'] for r in results):.2f}秒, {jobs}プロセス）")
+    print(f"{'='*60}")
+    return results
+
+def main(preset, default_paths):
+    """hyphen.py / slash_delete.py のコマンドライン"""
+    parser = argparse.ArgumentParser(description=f"医療データCSVのクリーニング（{preset.name}）")
+    parser.add_argument("csv_paths", nargs="*", default=default_paths, help="処理するCSV（省略時はスクリプトに書かれたファイル）")
+    parser.add_argument("--jobs", type=int, default=1, help="同時に処理するプロセス数（0で全コア）")
+    parser.add_argument("--chunksize", type=int, default=CHUNK_ROWS, help="1回に読み込んで処理する行数")
+    args = parser.parse_args()
+
+    print(f"🚀 大量データ CSV クリーニング開始（{preset.name}）")
+    print(f"📁 処理対象ファイル数: {len(args.csv_paths)}")
+    return clean_medical_data(args.csv_paths, preset, args.chunksize, args.jobs)
@@ -0,0 +1,128 @@
+"""
+CSVクリーニングの正規表現ルール
+- 列ごとのルールは「ここから行末まで削除」「この部分を削除」「置換」「前後の空白を削除」の手順の並び
+- 連続する「ここから行末まで削除」は1つの正規表現（(?:A|B|...).*）にまとめてコンパイルする
+  （どれかが見つかった最初の位置で切るので、1つずつ順に切るのと結果は同じ）
+- 連続する「この部分を削除」も A|B|... にまとめる
+- 列への適用は Series.str.replace でまとめて行い、空・欠損のセルは触らない
+  「/」を含む前提の手順は、元の値に「/」が無いセルには実行しない（削除・置換で「/」が増えることはない）
+"""
+import re
+from dataclasses import dataclass
+
+import pandas as pd
+
+
+@dataclass(frozen=True)
+class Step:
+    """
+    ルールの1手順
+    kind: "truncate"（patternから行末まで削除） / "remove"（patternの部分を削除）
+          / "sub"（patternをreplに置換） / "strip"（前後の空白を削除）
+    """
+    kind: str
+    pattern: str = ""
+    repl: str = ""
+
+    @property
+    def needs_slash(self):
+        return self.kind != "strip" and self.pattern.startswith("/")
+
+
+def truncate(*patterns):
+    """どれかのパターンが見つかった位置から行末までを削除"""
+    return [Step("truncate", pattern) for pattern in patterns]
+
+def remove(*patterns):
+    """パターンに一致した部分を削除"""
+    return [Step("remove", pattern) for pattern in patterns]
+
+def sub(pattern, repl):
+    return [Step("sub", pattern, repl)]
+
+STRIP = [Step("strip")]
+
+
+def _compile(steps):
+    """
+    手順を (正規表現 or None, 置換後の文字列, 「/」が要るか) の並びにする
+    連続する同じ種類の truncate / remove は1つの正規表現にまとめる
+    """
+    groups = []
+    for step in steps:
+        if groups and step.kind in ("truncate", "remove") and groups[-1][0].kind == step.kind:
+            groups[-1].append(step)
+        else:
+            groups.append([step])
+    compiled = []
+    for group in groups:
+        kind = group[0].kind
+        if kind == "strip":
+            compiled.append((None, "", False))
+            continue
+        pattern = "|".join(step.pattern for step in group)
+        if kind == "truncate":
+            pattern = f"(?:{pattern}).*"
+        repl = group[0].repl if kind == "sub" else ""
+        compiled.append((re.compile(pattern), repl, all(step.needs_slash for step in group)))
+    return compiled
+
+
+class ColumnRule:
+    """
+    1列分のクリーニングルール
+    - steps: 手順のリスト（truncate(...) + remove(...) + STRIP のように足してつなぐ）
+    - trigger: 指定すると、この正規表現を含むセルだけを処理する
+    - keep: 指定すると、先頭からこの正規表現に一致するセルはそのまま残す
+    - prefix: (残す部分)(残り) の2グループの正規表現。一致したセルは残す部分をそのままにして、残りだけを処理する
+    - note: この列を処理した時にログに出す文（{col} は列名になる）
+    """
+
+    def __init__(self, steps, trigger=None, keep=None, prefix=None, note=None):
+        self.steps = list(steps)
+        self.trigger = re.compile(trigger) if trigger else None
+        self.keep = re.compile(keep) if keep else None
+        self.prefix = re.compile(prefix) if prefix else None
+        self.note = note
+        self._compiled = _compile(self.steps)
+
+    def apply(self, values):
+        """列（文字列のSeries）を処理して (処理後の列, 変わったセルの数) を返す"""
+        target = values.notna() & (values != "")
+        if not target.any():
+            return values, 0
+        if self.trigger is not None:
+            target &= values.str.contains(self.trigger, na=False)
+        if self.keep is not None:
+            target &= ~values.str.match(self.keep, na=False)
+        if not target.any():
+            return values, 0
+
+        # CSVによっては行ラベルが重複するので、位置で取り出して処理する
+        target = target.to_numpy()
+        original = pd.Series(values.to_numpy()[target], dtype=object).astype(str)
+        cleaned, head = original, None
+        if self.prefix is not None:
+            parts = original.str.extract(self.prefix)
+            matched = parts[0].notna()
+            if matched.any():
+                head = parts[0].where(matched, "")
+                cleaned = parts[1].where(matched, original)
+        has_slash = cleaned.str.contains("/", regex=False)
+        for regex, repl, needs_slash in self._compiled:
+            if regex is None:
+                cleaned = cleaned.str.strip()
+            elif needs_slash:
+                if has_slash.any():
+                    cleaned = cleaned.where(~has_slash, cleaned[has_slash].str.replace(regex, repl, regex=True))
+            else:
+                cleaned = cleaned.str.replace(regex, repl, regex=True)
+        if head is not None:
+            cleaned = head + cleaned
+
+        changed = int((cleaned != original).sum())
+        if changed == 0:
+            return values, 0
+        result = values.to_numpy(dtype=object, copy=True)
+        result[target] = cleaned.to_numpy()
+        return pd.Series(result, index=values.index, name=values.name), changed
@@ -0,0 +1,244 @@
+"""
+病院CSVの共通読み込み
+- 各処理が使う論理列（name, address, established ...）だけをusecolsで読み、残りの詰め物列はパースしない
+- CSVによって列名が日本語（病院名・住所 ...）のこともあるので、論理列名 → 候補の列名で解決する
+- 都道府県・施設種別はcategory、レビュー数は欠損を許す整数（Int64）で持つ
+- read_csv_chunks: 全列を文字列で読むクリーニング用の読み込み（1回の読み込みで、列数の多すぎる行は
+  行番号付きで別ファイルに退避する）
+"""
+import io
+import os
+import csv
+import functools
+import numpy as np
+import pandas as pd
+
+# 論理列名 → CSV上の列名の候補（先に見つかったものを使う）
+COLUMN_ALIASES = {
+    "code": ("code",),
+    "name": ("name", "病院名"),
+    "address": ("address", "住所"),
+    "established": ("established", "診療科"),
+    "review": ("review", "レビューの数"),
+    "prefecture": ("prefecture", "都道府県"),
+    "corporation": ("corporation",),
+    "facility_type": ("facility_type",),
+}
+
+# 値の種類が少ない列（category）と、レビュー数（欠損ありの整数）
+CATEGORY_COLUMNS = frozenset({"prefecture", "facility_type"})
+INTEGER_COLUMNS = frozenset({"review"})
+
+# pandasのread_csvが欠損とみなす文字列（read_csv_chunksも同じ値を欠損にする）
+NA_VALUES = frozenset({
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND", "1.#QNAN",
+    "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null",
+})
+
+
+def read_header(csv_path):
+    """ヘッダー行の列名だけを読む（pandasを通すと本体まで先読みするのでcsvモジュールで1行だけ）"""
+    with open(csv_path, newline="", encoding="utf-8-sig") as f:
+        return next(csv.reader(f), [])
+
+def field_counts(csv_path):
+    """
+    ヘッダーを除く各データ行の列数（空行は数えない、読み取り専用の配列）
+    ファイルの (mtime, サイズ) ごとに1回だけ数え、同じファイルを読み直す時は数え直さない
+    （read_columnsでCSVをパースするのはpandasの1回だけで、これはバイト列を1回なめるだけ）
+    """
+    st = os.stat(csv_path)
+    return _field_counts(csv_path, st.st_mtime_ns, st.st_size)
+
+@functools.lru_cache(maxsize=64)
+def _field_counts(csv_path, mtime_ns, size):
+    """
+    区切り文字を数えるだけで、各列の文字列は作らない（csv.readerやpandasでのパースはしない）
+    引用符があれば、引用符の外にある「,」と改行だけを数える（値の中の改行は行の区切りにしない）
+    """
+    with open(csv_path, "rb") as f:
+        raw = f.read()
+    if b'"' in raw:
+        counts = _quoted_field_counts(np.frombuffer(raw, dtype=np.uint8))
+    else:
+        counts = np.array([line.count(b",") + 1 for line in raw.splitlines()[1:] if line], dtype=np.int64)
+    counts.setflags(write=False)
+    return counts
+
+def _quoted_field_counts(data):
+    """引用符を含むCSVのバイト列から、ヘッダーを除く各行の列数（csv.readerと同じく空行は数えない）"""
+    if not len(data):
+        return np.array([], dtype=np.int64)
+    # 引用符の外（それまでの「"」の数が偶数、値の中の「""」は2つで元に戻る）の「,」と改行
+    outside = np.cumsum(data == ord('"')) % 2 == 0
+    ends = np.flatnonzero((data == ord("\n")) & outside)
+    if len(data) and (not len(ends) or ends[-1] != len(data) - 1):
+        ends = np.append(ends, len(data))
+    starts = np.concatenate(([0], ends[:-1] + 1))
+    commas = np.concatenate(([0], np.cumsum((data == ord(",")) & outside)))
+    counts = commas[ends] - commas[starts] + 1
+    # 空行（改行だけの行）は数えない
+    lengths = ends - starts
+    carriage = (lengths > 0) & (data[np.maximum(ends - 1, 0)] == ord("\r"))
+    counts = counts[(lengths - carriage) > 0]
+    return counts[1:].astype(np.int64)
+
+def resolve_columns(header, columns):
+    """論理列ごとに、ヘッダーの何番目の列を読むかを決める（見つからない列は含めない）"""
+    positions = {}
+    for column in columns:
+        for alias in COLUMN_ALIASES.get(column, (column,)):
+            if alias in header:
+                positions[column] = header.index(alias)
+                break
+    return positions
+
+def read_columns(csv_path, columns, **read_csv_kwargs):
+    """
+    csv_pathから論理列columnsだけを読み、列名を論理列名にそろえたDataFrameを返す
+    - CSVに無い列は結果にも含まれない（column_or_emptyで空列として扱う）
+    - 文字列列はstr、CATEGORY_COLUMNSはcategory、INTEGER_COLUMNSはInt64（数値以外は欠損）
+    - 列数がヘッダーより多い行はon_bad_linesに従ってエラー・除外（全列を読む場合と同じ）
+    - データ行がヘッダーより1列多いCSVは、全列を読む場合のpandasと同じく先頭列を行ラベルとみなし、
+      ヘッダーの列名を1つ右の列に対応させる（usecolsを付けると行ラベルの推定が働かないため）
+    """
+    header = read_header(csv_path)
+    counts = field_counts(csv_path)
+    shift = 1 if len(counts) and counts[0] == len(header) + 1 else 0
+    width = len(header) + shift
+    positions = resolve_columns(header, columns)
+    by_position = sorted(((column, position + shift) for column, position in positions.items()), key=lambda item: item[1])
+    df = pd.read_csv(
+        csv_path,
+        header=0,
+        names=list(range(width)),
+        usecols=[position for _, position in by_position],
+        dtype={position: "category" if column in CATEGORY_COLUMNS else str for column, position in by_position},
+        **read_csv_kwargs,
+    )
+    df.columns = [column for column, _ in by_position]
+
+    # usecolsを付けると列数の多すぎる行もエラーにならないので、全列を読む場合と同じ行を除く
+    too_long = counts > width
+    if too_long.any():
+        if read_csv_kwargs.get("on_bad_lines", "error") != "skip":
+            row = int(np.flatnonzero(too_long)[0])
+            raise pd.errors.ParserError(f"Expected {width} fields in data row {row + 1}, saw {counts[row]}")
+        if len(counts) == len(df):
+            df = df[~too_long].reset_index(drop=True)
+        else:
+            print(f"行数が一致しないため、列数の多い行を除外できませんでした: {csv_path}")
+    for column in INTEGER_COLUMNS & set(df.columns):
+        numbers = pd.to_numeric(df[column], errors="coerce")
+        df[column] = np.trunc(numbers.where(np.isfinite(numbers))).astype("Int64")
+    return df
+
+def csv_row(csv_path, values):
+    """
+    {論理列: 値} から、csv_pathに追記する1行を作る（read_columnsと同じ列の対応で読み戻せる並び）
+    CSVに無い論理列の値は書かれない
+    """
+    header = read_header(csv_path)
+    counts = field_counts(csv_path)
+    shift = 1 if len(counts) and counts[0] == len(header) + 1 else 0
+    row = [""] * (len(header) + shift)
+    for column, position in resolve_columns(header, values).items():
+        row[position + shift] = values[column]
+    return row
+
+def fill_empty(series):
+    """欠損を空文字で埋める（category列は空文字をカテゴリに加えてから埋める）"""
+    if isinstance(series.dtype, pd.CategoricalDtype) and "" not in series.cat.categories:
+        series = series.cat.add_categories("")
+    return series.fillna("")
+
+
+class BadRows:
+    """
+    列数がヘッダーより多い行（read_csv_chunksが読み飛ばした行）
+    - 1件目が見つかった時にpathを作り、「行番号, 列数, 元の各列」を書き出す（無ければファイルは作らない）
+    - lines: 読み飛ばした行の行番号（ファイルの物理行、ヘッダーが1行目）
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lines = []
+        self._file = None
+        self._writer = None
+
+    @property
+    def count(self):
+        return len(self.lines)
+
+    def add(self, line, row, header):
+        if self._file is None:
+            self._file = open(self.path, "w", encoding="utf-8-sig", newline="")
+            self._writer = csv.writer(self._file)
+            self._writer.writerow(["line", "fields", *header])
+        self._writer.writerow([line, len(row), *row])
+        self.lines.append(line)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+def _column_names(header):
+    """ヘッダーの列名をpandasと同じにそろえる（重複は "x.1"、空欄は "Unnamed: 3" など）"""
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(header)
+    buffer.seek(0)
+    return list(pd.read_csv(buffer, nrows=0).columns)
+
+def _frame(rows, columns, shift):
+    df = pd.DataFrame(rows, dtype=object)
+    if shift:
+        df = df.iloc[:, shift:]
+    df.columns = columns
+    # 欠損の文字列（空欄など）はNaNにする（pandasでdtype=strを指定して読んだ時と同じ値になる）
+    df.mask(df.isin(NA_VALUES), inplace=True)
+    return df
+
+def read_csv_chunks(csv_path, chunksize=None, bad_rows=None):
+    """
+    csv_pathの全列を文字列で、chunksize行ずつのDataFrameにして返す（Noneならファイル全体を1つで返す）
+    - 1回だけ先頭から読む（pandasのread_csv(dtype=str, on_bad_lines="skip")と同じ値・同じ行になる）
+    - 列数がヘッダーより多い行は読み飛ばし、bad_rows（BadRows）に行番号と元の値を記録する
+    - 最初のデータ行がヘッダーより多いCSVは、pandasと同じく多い分の先頭列を行ラベルとみなして捨てる
+    - 列数が足りない行は、足りない列を欠損にする
+    """
+    with open(csv_path, newline="", encoding="utf-8-sig") as f:
+        reader = csv.reader(f)
+        header = next((row for row in reader if row), None)
+        if header is None:
+            raise pd.errors.EmptyDataError(f"ヘッダー行がありません: {csv_path}")
+        columns = _column_names(header)
+        shift = None
+        width = len(header)
+        rows = []
+        yielded = False
+        line = reader.line_num
+        for row in reader:
+            start, line = line + 1, reader.line_num
+            if not row:
+                continue
+            if shift is None:
+                shift = max(len(row) - len(header), 0)
+                width = len(header) + shift
+            if len(row) != width:
+                if len(row) > width:
+                    if bad_rows is not None:
+                        bad_rows.add(start, row, header)
+                    continue
+                row = row + [np.nan] * (width - len(row))
+            rows.append(row)
+            if chunksize and len(rows) >= chunksize:
+                # チャンクを処理している間は、読み込んだ行のリストを持たない
+                frame, rows = _frame(rows, columns, shift), []
+                yield frame
+                yielded = True
+        if rows:
+            frame, rows = _frame(rows, columns, shift), []
+            yield frame
+        elif not yielded:
+            yield pd.DataFrame(columns=columns, dtype=object)
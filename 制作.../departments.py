@@ -0,0 +1,87 @@
+import re
+import numpy as np
+import pandas as pd
+
+# 厚労省の医療機関一覧表で使われる診療科の略称 → 正式な診療科名
+# 先頭の22個が従来のキーワード。残りはそれらを含む複合略称で、
+# 「整外」を「整形外科」と「外科」に分けてしまわないための正規化用
+DEPARTMENT_CODES = {
+    "内": "内科",
+    "外": "外科",
+    "整": "整形外科",
+    "小": "小児科",
+    "呼": "呼吸器内科",
+    "リハ": "リハビリテーション科",
+    "精神": "精神科",
+    "糖尿病": "糖尿病内科",
+    "循環器": "循環器内科",
+    "消化器": "消化器内科",
+    "脳外": "脳神経外科",
+    "心外": "心臓血管外科",
+    "皮": "皮膚科",
+    "ひ": "泌尿器科",
+    "産婦": "産婦人科",
+    "眼": "眼科",
+    "耳い": "耳鼻咽喉科",
+    "放": "放射線科",
+    "麻": "麻酔科",
+    "歯": "歯科",
+    "形": "形成外科",
+    "病理": "病理診断科",
+    "整外": "整形外科",
+    "形外": "形成外科",
+    "呼内": "呼吸器内科",
+    "呼外": "呼吸器外科",
+    "神内": "脳神経内科",
+    "心内": "心療内科",
+    "小外": "小児外科",
+    "歯外": "歯科口腔外科",
+}
+
+# 全キーワードを1つの正規表現にまとめて一度だけコンパイル（長い略称を優先）
+DEPARTMENT_PATTERN = re.compile(
+    "|".join(re.escape(k) for k in sorted(DEPARTMENT_CODES, key=len, reverse=True))
+)
+
+def has_department(text):
+    """文字列に診療科のキーワードが含まれるか"""
+    return DEPARTMENT_PATTERN.search(str(text)) is not None
+
+def classify_departments(text):
+    """文字列に含まれる診療科を正式名のリストで返す（重複なし・出現順）"""
+    if pd.isna(text):
+        return []
+    return list(dict.fromkeys(DEPARTMENT_CODES[m] for m in DEPARTMENT_PATTERN.findall(str(text))))
+
+def department_codes(series):
+    """列全体の各セルを診療科の正式名リストに変換"""
+    return series.map(classify_departments)
+
+def department_mask(df):
+    """各セルが診療科のキーワードを含むかの真偽値表（numpy, 行×列）を列単位で作る"""
+    mask = np.zeros(df.shape, dtype=bool)
+    for i in range(df.shape[1]):
+        column = df.iloc[:, i]
+        present = column.notna()
+        if not present.any():
+            # 1000列以上あるCSVの大半は空の詰め物列なので丸ごと飛ばす
+            continue
+        mask[:, i] = present.to_numpy() & column.astype(str).str.contains(DEPARTMENT_PATTERN, na=False).to_numpy()
+    return mask
+
+def department_cells(df):
+    """各行から診療科らしいセルを列順に集める（ヒットしたセルだけを走査）"""
+    cells = [[] for _ in range(len(df))]
+    values = df.to_numpy()
+    rows, cols = np.nonzero(department_mask(df))
+    for row, col in zip(rows, cols):
+        cells[row].append(str(values[row, col]).strip())
+    return cells
+
+def canonical_department(name):
+    """画面の選択肢（例: 耳鼻咽喉科・頭頸部外科）を正式な診療科名1つに寄せる"""
+    for canonical in sorted(set(DEPARTMENT_CODES.values()), key=len, reverse=True):
+        if name.startswith(canonical):
+            return canonical
+    found = classify_departments(name)
+    return found[0] if found else name
@@ -0,0 +1,32 @@
+import os
+import resource
+
+# /proc/self/status の項目 → 返すキー（値はkB単位）
+_STATUS_FIELDS = {
+    "VmRSS": "rss_bytes",
+    "RssAnon": "rss_anon_bytes",
+    "RssFile": "rss_file_bytes",
+    "RssShmem": "rss_shmem_bytes",
+}
+
+
+def process_memory():
+    """
+    このプロセス（ワーカー）のメモリ使用量
+    - rss_anon_bytes: ワーカー固有のメモリ（dict・インデックスなど）
+    - rss_file_bytes: メモリマップしたファイルのページ（スナップショットなど、他のワーカーと共有される）
+    /proc が無い環境ではピークRSSだけを返す
+    """
+    memory = {"pid": os.getpid()}
+    try:
+        with open("/proc/self/status", encoding="ascii") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                if key in _STATUS_FIELDS:
+                    memory[_STATUS_FIELDS[key]] = int(value.split()[0]) * 1024
+    except OSError:
+        pass
+    # ru_maxrssはLinuxではkB、macOSではバイト
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    memory["max_rss_bytes"] = max_rss if os.uname().sysname == "Darwin" else max_rss * 1024
+    return memory
@@ -0,0 +1,89 @@
+"""
+ファセット（都道府県・診療科・施設種別）ごとの件数
+- 値ごとに「その値を持つ行」のビットマップ（1行1ビット、uint64の語に詰める）をカタログ構築後に作っておく
+- 件数は、検索条件のビットマップと値のビットマップのANDのビット数で数える（レコードは見ない）
+- 各ファセットの件数は、そのファセット自身の絞り込みを外して数える
+  （地域を選んでいても、ほかの地域を選んだら何件になるかを選択肢に出せる）
+"""
+import re
+import numpy as np
+import pandas as pd
+
+# 施設種別（施設種別の列・病床の列に書かれている区分を正規化したもの）
+FACILITY_TYPES = ("特定機能病院", "病院", "診療所")
+_FACILITY_PATTERN = re.compile("(特定機能|病院|診療所)")
+_FACILITY_NAMES = {"特定機能": "特定機能病院", "病院": "病院", "診療所": "診療所"}
+
+
+def facility_types(*columns):
+    """
+    各行の施設種別（FACILITY_TYPESのどれか、分からなければ空文字）
+    CSVによって区分が facility_type と bed_type_and_count のどちらに入っているかが違うので、
+    渡した列の順に最初に見つかったものを使う
+    """
+    result = pd.Series("", index=columns[0].index, dtype=object)
+    for column in reversed(columns):
+        found = column.fillna("").astype(str).str.extract(_FACILITY_PATTERN, expand=False).map(_FACILITY_NAMES)
+        result = found.where(found.notna(), result)
+    return result
+
+
+class FacetIndex:
+    """
+    ファセットの値ごとのビットマップ
+    - postings: {ファセット名: {値: 行番号の配列}}（値の並びがそのまま件数の並びになる）
+    - 各ファセットは 値×語 の2次元配列で持ち、件数は1回のANDとビット数の合計で出す
+    """
+
+    def __init__(self, size, postings):
+        self.size = size
+        self.words = (size + 63) // 64
+        self.values = {}
+        self.bitmaps = {}
+        for facet, groups in postings.items():
+            values = [value for value, row_ids in groups.items() if len(row_ids)]
+            matrix = np.zeros((len(values), self.words * 64), dtype=bool)
+            for i, value in enumerate(values):
+                matrix[i, groups[value]] = True
+            self.values[facet] = values
+            self.bitmaps[facet] = np.packbits(matrix, axis=1, bitorder="little").view(np.uint64)
+        self.all_rows = self.bitmap(np.ones(size, dtype=bool))
+
+    def bitmap(self, selection):
+        """行番号の配列、または行ごとの真偽値配列をビットマップにする"""
+        selection = np.asarray(selection)
+        if selection.dtype != bool:
+            mask = np.zeros(self.size, dtype=bool)
+            mask[selection] = True
+            selection = mask
+        padded = np.zeros(self.words * 64, dtype=bool)
+        padded[:self.size] = selection
+        return np.packbits(padded, bitorder="little").view(np.uint64)
+
+    def value_bitmap(self, facet, value):
+        """ファセットの値のビットマップ（その値の行が無ければ全て0）"""
+        try:
+            return self.bitmaps[facet][self.values[facet].index(value)]
+        except ValueError:
+            return np.zeros(self.words, dtype=np.uint64)
+
+    def counts(self, filters, base=None):
+        """
+        filters: {ファセット名: 選ばれている値}（空文字は絞り込みなし）
+        base: キーワード・ブロック除外などで絞った行のビットマップ（Noneなら全行）
+        戻り値: (全条件に合う件数, {ファセット名: {値: 件数}})
+        """
+        base = self.all_rows if base is None else base
+        selected = {facet: self.value_bitmap(facet, value) for facet, value in filters.items() if value}
+        total = base
+        for bits in selected.values():
+            total = total & bits
+        counts = {}
+        for facet, matrix in self.bitmaps.items():
+            query = base
+            for other, bits in selected.items():
+                if other != facet:
+                    query = query & bits
+            per_value = np.bitwise_count(matrix & query).sum(axis=1, dtype=np.int64)
+            counts[facet] = {value: int(count) for value, count in zip(self.values[facet], per_value)}
+        return int(np.bitwise_count(total).sum()), counts
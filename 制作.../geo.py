@@ -0,0 +1,186 @@
+"""
+郵便番号による病院の位置と、近い病院の検索
+- オフラインの手順で、郵便番号 → 緯度経度の表（CSV）を geo/postal_codes.npz に変換しておく
+  （郵便番号の昇順に並べた配列なので、カタログの行の位置は二分探索でまとめて引ける）
+- カタログの各行の郵便番号（住所などの「〒986－8522」）は読み込み時に一度だけ取り出しておき、
+  この表で緯度経度に変換して、格子（グリッド）の空間索引を作る
+- 近い順の検索は、問い合わせ地点の周りの正方形を広げながら候補を集めるので全件を見ない
+使い方: python geo.py 郵便番号の座標表.csv
+  （CSVは1行目がヘッダーで、郵便番号・緯度・経度の3列。郵便番号は "986-8522" でも "9868522" でもよい）
+"""
+import os
+import re
+import sys
+import math
+import unicodedata
+from functools import lru_cache
+import numpy as np
+import pandas as pd
+
+GEO_DIR = os.path.join(os.path.dirname(__file__), "geo")
+POSTAL_TABLE_PATH = os.path.join(GEO_DIR, "postal_codes.npz")
+
+# 「〒986－8522」など（全角の数字・ハイフンはNFKCで半角にそろえてから探す）
+POSTAL_PATTERN = re.compile(r"〒\s*(\d{3})-?(\d{4})")
+# 郵便番号を探す列（CSVによって郵便番号が病院名・都道府県・住所のどの列に入っているかが違う）
+POSTAL_FIELDS = ("address", "name", "prefecture")
+
+# 緯度1度あたりの距離（km）
+KM_PER_DEGREE = 111.2
+
+
+def postal_code(text):
+    """文字列中の最初の郵便番号を整数（例: 9868522）で返す。無ければ0"""
+    if not text or "〒" not in text:
+        return 0
+    match = POSTAL_PATTERN.search(unicodedata.normalize("NFKC", text))
+    return int(match.group(1) + match.group(2)) if match else 0
+
+def resolve_postal_codes(records):
+    """各レコードの郵便番号（読み込み時に一度だけ判定、見つからない行は0）"""
+    codes = np.zeros(len(records), dtype=np.uint32)
+    for row_id, record in enumerate(records):
+        for field in POSTAL_FIELDS:
+            code = postal_code(record.get(field))
+            if code:
+                codes[row_id] = code
+                break
+    return codes
+
+
+class PostalTable:
+    """郵便番号（昇順）→ 緯度経度の表"""
+
+    def __init__(self, codes, lat, lon):
+        self.codes = codes
+        self.lat = lat
+        self.lon = lon
+
+    def __len__(self):
+        return len(self.codes)
+
+    def locate(self, postal_codes):
+        """郵便番号の配列 → (緯度, 経度) の配列（表に無い・0の行はNaN）"""
+        postal_codes = np.asarray(postal_codes, dtype=np.uint32)
+        lat = np.full(len(postal_codes), np.nan)
+        lon = np.full(len(postal_codes), np.nan)
+        if len(self.codes) == 0:
+            return lat, lon
+        positions = np.minimum(np.searchsorted(self.codes, postal_codes), len(self.codes) - 1)
+        found = (self.codes[positions] == postal_codes) & (postal_codes != 0)
+        lat[found] = self.lat[positions[found]]
+        lon[found] = self.lon[positions[found]]
+        return lat, lon
+
+
+def compile_postal_table(source_csv, output_path=POSTAL_TABLE_PATH):
+    """郵便番号・緯度・経度のCSVを、郵便番号の昇順に並べた配列にしてoutput_pathに保存"""
+    df = pd.read_csv(source_csv, header=0, usecols=[0, 1, 2], names=["postal_code", "lat", "lon"], dtype=str)
+    codes = pd.to_numeric(df["postal_code"].str.replace(r"\D", "", regex=True), errors="coerce")
+    lat = pd.to_numeric(df["lat"], errors="coerce")
+    lon = pd.to_numeric(df["lon"], errors="coerce")
+    valid = codes.notna() & lat.notna() & lon.notna()
+    table = pd.DataFrame({"code": codes[valid].astype(np.uint32), "lat": lat[valid], "lon": lon[valid]})
+    # 同じ郵便番号が複数行ある表（町域ごとの表など）は平均の位置を使う
+    table = table.groupby("code", sort=True).mean()
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    tmp_path = output_path + ".tmp.npz"
+    np.savez(
+        tmp_path,
+        codes=table.index.to_numpy(dtype=np.uint32),
+        lat=table["lat"].to_numpy(dtype=np.float32),
+        lon=table["lon"].to_numpy(dtype=np.float32),
+    )
+    os.replace(tmp_path, output_path)
+    return len(table), int((~valid).sum())
+
+@lru_cache(maxsize=None)
+def load_postal_table(path=POSTAL_TABLE_PATH):
+    """変換済みの表を読む（無ければ空の表。作り直した表はプロセスの再起動後に使われる）"""
+    try:
+        with np.load(path) as arrays:
+            return PostalTable(arrays["codes"], arrays["lat"].astype(np.float64), arrays["lon"].astype(np.float64))
+    except FileNotFoundError:
+        return PostalTable(np.empty(0, dtype=np.uint32), np.empty(0), np.empty(0))
+
+
+class GeoIndex:
+    """
+    緯度経度の格子索引
+    - 位置の分かる行を cell_degrees 度四方のセルに振り分け、セル順に並べた行番号と各セルの開始位置を持つ
+      （同じ緯度の行のセルは連続するので、正方形の範囲は緯度の行ごとに1回の切り出しで集められる）
+    - nearest は正方形の半径を倍々に広げ、k番目の距離が正方形の内側に収まったところで止める
+    - 距離は問い合わせ地点の緯度で経度を縮めた平面近似（km）
+    """
+
+    def __init__(self, lat, lon, cell_degrees: float = 0.05):
+        self.cell_degrees = cell_degrees
+        self.lat = np.asarray(lat, dtype=np.float64)
+        self.lon = np.asarray(lon, dtype=np.float64)
+        located = np.flatnonzero(np.isfinite(self.lat) & np.isfinite(self.lon))
+        self.size = len(located)
+        if self.size == 0:
+            self._rows = located.astype(np.int32)
+            return
+        self._lat0 = self.lat[located].min()
+        self._lon0 = self.lon[located].min()
+        cell_y = ((self.lat[located] - self._lat0) // cell_degrees).astype(np.int64)
+        cell_x = ((self.lon[located] - self._lon0) // cell_degrees).astype(np.int64)
+        self._height = int(cell_y.max()) + 1
+        self._width = int(cell_x.max()) + 1
+        cells = cell_y * self._width + cell_x
+        order = np.argsort(cells, kind="stable")
+        self._rows = located[order].astype(np.int32)
+        self._offsets = np.zeros(self._height * self._width + 1, dtype=np.int64)
+        np.cumsum(np.bincount(cells, minlength=self._height * self._width), out=self._offsets[1:])
+
+    def _window(self, cy, cx, radius):
+        """セル(cy, cx)を中心とする一辺 2*radius+1 セルの正方形に入る行番号"""
+        y0, y1 = max(cy - radius, 0), min(cy + radius, self._height - 1)
+        x0, x1 = max(cx - radius, 0), min(cx + radius, self._width - 1)
+        if y0 > y1 or x0 > x1:
+            return self._rows[:0]
+        parts = [self._rows[self._offsets[y * self._width + x0]:self._offsets[y * self._width + x1 + 1]] for y in range(y0, y1 + 1)]
+        return np.concatenate(parts)
+
+    def nearest(self, lat: float, lon: float, k: int = 10, allowed=None):
+        """
+        (lat, lon) に近い順にk件の (行番号の配列, 距離kmの配列)
+        allowed: 行ごとの真偽値配列（診療科・ブロック中の都道府県での絞り込み）
+        """
+        if self.size == 0 or k <= 0:
+            return np.empty(0, dtype=np.int32), np.empty(0)
+        lon_scale = max(math.cos(math.radians(lat)), 1e-6)
+        cy = int((lat - self._lat0) // self.cell_degrees)
+        cx = int((lon - self._lon0) // self.cell_degrees)
+        radius = 1
+        limit = max(self._height, self._width) + abs(cy) + abs(cx)
+        while True:
+            row_ids = self._window(cy, cx, radius)
+            if allowed is not None:
+                row_ids = row_ids[allowed[row_ids]]
+            dy = self.lat[row_ids] - lat
+            dx = (self.lon[row_ids] - lon) * lon_scale
+            distances = np.hypot(dy, dx) * KM_PER_DEGREE
+            # 正方形の外の行は、緯度・経度のどちらかで少なくとも radius セル分は離れている
+            reach = radius * self.cell_degrees * lon_scale * KM_PER_DEGREE
+            if len(row_ids) >= k:
+                best = np.argpartition(distances, k - 1)[:k]
+                if distances[best].max() <= reach:
+                    break
+            if radius >= limit:
+                # 格子全体を見ても k 件に満たない・収まらない（絞り込みで候補が少ない）
+                best = np.arange(len(row_ids))
+                break
+            radius *= 2
+        best = best[np.argsort(distances[best], kind="stable")][:k]
+        return row_ids[best], distances[best]
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print(__doc__)
+        sys.exit(1)
+    count, skipped = compile_postal_table(sys.argv[1])
+    print(f"✅ 郵便番号の座標表を書き出しました: {POSTAL_TABLE_PATH}")
+    print(f"   📊 郵便番号{count:,}件（読めなかった行 {skipped:,}件）")
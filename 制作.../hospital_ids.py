@@ -0,0 +1,81 @@
+"""
+病院の安定ID
+- CSVの行の並びやブロックリストに左右されないよう、医療機関コードからIDを作る
+  例: aomori_dent.csv の "01-3107-0 / 青歯107" → "aomori_dent-01-3107-0"
+- コードの入っている論理列はCSVによって違う（データ行が1列多いCSVは列名が1つずれるので「id」列、
+  そうでないCSVは「code」列）。行の通し番号の列（1.0, 2.0 ... や hyphen.py の連番 1234, 1235 ...）は使わない
+- コードが無い・読めない・同じCSVの中で重複する行は、病院名と住所のハッシュを使う
+  例: "miyagi_hos-h5c1e0a9b3f27"（名前か住所が変わるとIDも変わる）
+- それでも重複する行（同じ名前・住所の行）は、出現順に "~2", "~3" ... を付ける
+"""
+import os
+import hashlib
+from collections import Counter
+import pandas as pd
+from hokkaidou_fixe import parse_code_column
+
+
+def slice_key(csv_path):
+    """IDの先頭に付けるCSVの名前（例: miyagi_hos）"""
+    return os.path.splitext(os.path.basename(csv_path))[0]
+
+def code_key(code):
+    """code列の値 → "01-3107-0" のようなキー（半角数字の部分が無ければ空文字）"""
+    parts = [part for part in parse_code_column(code) if part.isascii() and part.isdigit()]
+    return "-".join(parts)
+
+def is_row_number(values):
+    """1.0, 2.0, 3.0 ... や 1234, 1235 ... のような行の通し番号の列か（整数が狭い範囲に昇順で並ぶ）"""
+    numbers = pd.to_numeric(pd.Series(list(values), dtype=object), errors="coerce")
+    if len(numbers) == 0 or numbers.isna().any() or (numbers % 1 != 0).any():
+        return False
+    return bool(numbers.is_monotonic_increasing and numbers.is_unique and numbers.iloc[-1] - numbers.iloc[0] < 2 * len(numbers))
+
+def institution_codes(candidates):
+    """
+    候補の列（{論理列名: 行ごとの値}、先に書いた列を優先）のうち、医療機関コードの入っている列の値
+    行の通し番号の列と、コードの読める値が半分に満たない列は使わない（どれも使えなければNone）
+    """
+    for values in candidates.values():
+        values = list(values)
+        readable = sum(1 for value in values if code_key(value))
+        if values and readable * 2 >= len(values) and not is_row_number(values):
+            return values
+    return None
+
+def content_key(name, address):
+    """病院名と住所から作るキー（コードが使えない行用）"""
+    digest = hashlib.blake2b(f"{name}\n{address}".encode("utf-8"), digest_size=6).hexdigest()
+    return "h" + digest
+
+def assign_ids(csv_path, codes, names, addresses):
+    """
+    1つのCSVの各行のIDを返す（codes / names / addresses は行ごとの値、欠損はNaNでよい）
+    codesがNone（コードの列が無い）なら全ての行で病院名と住所のハッシュを使う
+    """
+    prefix = slice_key(csv_path)
+    codes = [""] * len(names) if codes is None else [code_key(code) for code in codes]
+    code_counts = Counter(codes)
+    keys = [
+        code if code and code_counts[code] == 1 else content_key(name, address)
+        for code, name, address in zip(codes, names, addresses)
+    ]
+    seen = Counter()
+    ids = []
+    for key in keys:
+        seen[key] += 1
+        ids.append(f"{prefix}-{key}" if seen[key] == 1 else f"{prefix}-{key}~{seen[key]}")
+    return ids
+
+def next_id(csv_path, name, address, taken):
+    """
+    csv_pathに追記する病院のID（takenにある既存のIDとは重ならない）
+    CSVに書き込んだ後に読み直しても、assign_idsは同じIDを振る（末尾の行なので出現順も同じ）
+    """
+    base = f"{slice_key(csv_path)}-{content_key(name, address)}"
+    if base not in taken:
+        return base
+    n = 2
+    while f"{base}~{n}" in taken:
+        n += 1
+    return f"{base}~{n}"
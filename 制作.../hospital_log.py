@@ -0,0 +1,286 @@
+"""
+/add-hospital の追記ログ（write-ahead log）
+- 追加された病院はまずログに追記・fsyncしてから応答し、同時にメモリ上のカタログにも反映する
+- 追記はまとめて書く（グループコミット）: flush_interval秒待つか max_batch件たまったら1回のwrite + fsync
+- ログとCSVへの書き込みはファイルロック（flock）で直列化するので、複数ワーカーでも行が混ざらない
+- compact() がログの内容を都道府県のCSVに書き込んでログを空にする
+  （途中で落ちた場合は、次のcompact()でCSVを書き込み前のサイズに戻してからやり直す）
+"""
+import io
+import os
+import csv
+import json
+import uuid
+import asyncio
+from contextlib import contextmanager
+from dataclasses import dataclass
+from functools import cached_property
+from csv_reader import csv_row
+from hospital_ids import next_id
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+LOG_DIR = os.path.join(os.path.dirname(__file__), "wal")
+
+
+@dataclass(frozen=True)
+class LogEntry:
+    """追記ログの1件（追加された病院1件）"""
+    id: str
+    path: str
+    name: str
+    address: str
+    departments: str
+    prefecture: str
+    hospital_id: str = ""
+
+    @classmethod
+    def create(cls, path, name, address, departments, prefecture, hospital_id=""):
+        # 診療科は既存データと同じく全角スペース区切りの1つの文字列として持つ
+        departments = "　".join(d.strip() for d in departments if d.strip())
+        return cls(uuid.uuid4().hex, path, name.strip(), address.strip(), departments, prefecture, hospital_id)
+
+    @cached_property
+    def card(self):
+        """load_hospital_cardsがCSVから作るのと同じ形のカード"""
+        return {"name": self.name, "address": self.address, "departments": self.departments, "prefecture": self.prefecture}
+
+    @cached_property
+    def hospital_data(self):
+        """extract_hospital_dataがCSVから作るのと同じ形の病院データ"""
+        return {
+            "id": self.hospital_id or next_id(self.path, self.name, self.address, ()),
+            "name": self.name,
+            "address": self.address,
+            "departments": self.departments.split(","),
+            "reviews": 0,
+            "prefecture": self.prefecture,
+            "corporation": "",
+            "facility_type": "",
+        }
+
+    def csv_values(self):
+        """CSVに書き込む {論理列: 値}"""
+        return {"name": self.name, "address": self.address, "established": self.departments, "prefecture": self.prefecture}
+
+
+class HospitalLog:
+    """
+    病院の追記ログ
+    - append(): グループコミットで書き込み、fsync後にon_commit(entries)を呼んでから戻る
+    - compact(): ログをCSVに畳み込む（start()で compact_interval 秒ごとに実行し、on_compact(paths)を呼ぶ）
+    """
+
+    def __init__(self, log_dir=LOG_DIR, flush_interval: float = 0.01, max_batch: int = 64, compact_interval: float = 30.0):
+        self.log_dir = log_dir
+        self.log_path = os.path.join(log_dir, "hospitals.log")
+        self.lock_path = os.path.join(log_dir, "hospitals.lock")
+        self.compacting_path = os.path.join(log_dir, "compacting.json")
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.compact_interval = compact_interval
+        self.on_commit = None
+        self.on_compact = None
+        self._queue = []
+        self._full = None
+        self._flusher = None
+        self._task = None
+
+    # --- ログファイル ---
+
+    def _source_key(self, path):
+        return os.path.relpath(os.path.abspath(path), os.path.dirname(os.path.abspath(self.log_dir)))
+
+    def _source_path(self, key):
+        return os.path.join(os.path.dirname(os.path.abspath(self.log_dir)), key)
+
+    @contextmanager
+    def _locked(self):
+        """ログとCSVの書き込みを、プロセスをまたいで直列化する"""
+        os.makedirs(self.log_dir, exist_ok=True)
+        with open(self.lock_path, "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _encode(self, entry):
+        record = {
+            "id": entry.id,
+            "path": self._source_key(entry.path),
+            "name": entry.name,
+            "address": entry.address,
+            "departments": entry.departments,
+            "prefecture": entry.prefecture,
+            "hospital_id": entry.hospital_id,
+        }
+        return json.dumps(record, ensure_ascii=False) + "\n"
+
+    def _read(self):
+        try:
+            with open(self.log_path, encoding="utf-8") as f:
+                lines = f.readlines()
+        except FileNotFoundError:
+            return []
+        entries = []
+        for line in lines:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # 書き込み途中で落ちた最後の行は、応答も返していないので捨てる
+                continue
+            record["path"] = self._source_path(record["path"])
+            entries.append(LogEntry(**record))
+        return entries
+
+    def _write(self, entries):
+        data = "".join(self._encode(entry) for entry in entries).encode("utf-8")
+        with self._locked():
+            with open(self.log_path, "ab") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+
+    def read_entries(self):
+        """ログに残っている（CSVにまだ書き込まれていない）病院"""
+        with self._locked():
+            self._recover()
+            return self._read()
+
+    def pending_ids(self):
+        """ログに残っている病院のID"""
+        return {entry.id for entry in self._read()}
+
+    # --- グループコミット ---
+
+    async def append(self, entry):
+        """entryをログに書き込み（fsync済み）、カタログに反映してから戻る"""
+        future = asyncio.get_running_loop().create_future()
+        self._queue.append((entry, future))
+        if self._flusher is None or self._flusher.done():
+            self._full = asyncio.Event()
+            self._flusher = asyncio.create_task(self._flush_loop())
+        elif len(self._queue) >= self.max_batch:
+            self._full.set()
+        await future
+        return entry
+
+    async def _flush_loop(self):
+        while self._queue:
+            if len(self._queue) < self.max_batch:
+                # 少し待って、同時に来た追加をまとめる
+                try:
+                    await asyncio.wait_for(self._full.wait(), timeout=self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+            self._full.clear()
+            batch, self._queue = self._queue[:self.max_batch], self._queue[self.max_batch:]
+            entries = [entry for entry, _ in batch]
+            try:
+                await asyncio.to_thread(self._write, entries)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            if self.on_commit is not None:
+                try:
+                    await self.on_commit(entries)
+                except Exception as e:
+                    # ログには書けているので、次の読み込み・畳み込みで反映される
+                    print(f"追記した病院をカタログに反映できませんでした: {e}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_result(None)
+
+    # --- 畳み込み ---
+
+    def _recover(self):
+        """前回の畳み込みが途中で止まっていたら、CSVを書き込み前の状態に戻す"""
+        try:
+            with open(self.compacting_path, encoding="utf-8") as f:
+                compacting = json.load(f)
+        except FileNotFoundError:
+            return
+        pending_ids = self.pending_ids()
+        if pending_ids & set(compacting["ids"]):
+            # ログを空にする前に止まった → CSVへの追記を取り消す（ログの内容は次の畳み込みで書き直す）
+            for key, size in compacting["sizes"].items():
+                with open(self._source_path(key), "r+b") as f:
+                    f.truncate(size)
+                    os.fsync(f.fileno())
+        os.remove(self.compacting_path)
+
+    def compact(self):
+        """ログの病院を都道府県のCSVに書き込み、ログを空にする。書き込んだCSVのパスを返す"""
+        with self._locked():
+            self._recover()
+            entries = self._read()
+            if not entries:
+                return []
+            by_path = {}
+            for entry in entries:
+                by_path.setdefault(entry.path, []).append(entry)
+
+            # 1. 書き込み前のCSVのサイズを記録（途中で落ちたらここまで戻す）
+            compacting = {
+                "ids": [entry.id for entry in entries],
+                "sizes": {self._source_key(path): os.path.getsize(path) for path in by_path},
+            }
+            with open(self.compacting_path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump(compacting, f, ensure_ascii=False)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(self.compacting_path + ".tmp", self.compacting_path)
+
+            # 2. CSVに追記
+            for path, path_entries in by_path.items():
+                buffer = io.StringIO()
+                writer = csv.writer(buffer, lineterminator="\n")
+                writer.writerows(csv_row(path, entry.csv_values()) for entry in path_entries)
+                lines = buffer.getvalue()
+                with open(path, "rb+") as f:
+                    f.seek(0, os.SEEK_END)
+                    if f.tell() > 0:
+                        f.seek(-1, os.SEEK_END)
+                        if f.read(1) != b"\n":
+                            lines = "\n" + lines
+                    f.write(lines.encode("utf-8"))
+                    f.flush()
+                    os.fsync(f.fileno())
+
+            # 3. ログを空にしてから記録を消す
+            with open(self.log_path, "wb") as f:
+                os.fsync(f.fileno())
+            os.remove(self.compacting_path)
+        print(f"追記ログをCSVに書き込みました: {len(entries)}件（{len(by_path)}ファイル）")
+        return list(by_path)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.compact_interval)
+            try:
+                paths = await asyncio.to_thread(self.compact)
+                if paths and self.on_compact is not None:
+                    await self.on_compact(paths)
+            except Exception as e:
+                print(f"追記ログの畳み込みでエラーが発生しました: {e}")
@@ -0,0 +1,90 @@
+"""
+一覧エンドポイントの負荷テスト（/hospital-data と / を同時に叩いてレイテンシの分布を測る）
+- 別のターミナルでサーバーを起動しておく: uvicorn app:app --port 5001
+- --invalidate-every を付けると、その間隔でブロックリストを切り替えてキャッシュを作り直させる
+  （シリアライズ・圧縮などの重い処理がほかのリクエストを止めていないかを見る）
+使い方: python load_test.py --concurrency 32 --duration 20 --invalidate-every 2
+"""
+import argparse
+import asyncio
+import time
+import numpy as np
+import httpx
+
+PATHS = ("/hospital-data", "/")
+# イベントループの応答性を見るための軽いエンドポイント（カタログに触れない）
+PROBE_PATH = "/blocked-prefectures"
+
+
+async def request_loop(client, path, deadline, latencies, errors):
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        try:
+            async with client.stream("GET", path) as response:
+                # 本文は展開せずに最後まで受け取るだけ（クライアント側のgzip展開を計測に含めない）
+                async for _ in response.aiter_raw():
+                    pass
+            if response.status_code >= 400:
+                errors[path] = errors.get(path, 0) + 1
+                continue
+        except httpx.HTTPError:
+            errors[path] = errors.get(path, 0) + 1
+            continue
+        latencies[path].append(time.perf_counter() - start)
+
+async def probe_loop(client, deadline, latencies, interval=0.05):
+    """軽いリクエストを一定間隔で送り、イベントループが止まっていないかを測る"""
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        await client.get(PROBE_PATH)
+        latencies[PROBE_PATH].append(time.perf_counter() - start)
+        await asyncio.sleep(interval)
+
+async def invalidate_loop(client, deadline, interval, prefecture="秋田県"):
+    """ブロックリストを交互に切り替えて、一覧のキャッシュを作り直させる"""
+    blocked = False
+    while time.perf_counter() + interval < deadline:
+        await asyncio.sleep(interval)
+        await client.post("/unblock-prefecture" if blocked else "/block-prefecture", params={"prefecture": prefecture})
+        blocked = not blocked
+
+async def run(url, concurrency, duration, invalidate_every):
+    latencies = {path: [] for path in PATHS + (PROBE_PATH,)}
+    errors = {}
+    limits = httpx.Limits(max_connections=concurrency + 1, max_keepalive_connections=concurrency + 1)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=60.0, headers={"Accept-Encoding": "gzip"}) as client:
+        # 最初のキャッシュ作成を計測に含めない
+        for path in PATHS:
+            await client.get(path)
+        deadline = time.perf_counter() + duration
+        tasks = [request_loop(client, PATHS[i % len(PATHS)], deadline, latencies, errors) for i in range(concurrency)]
+        tasks.append(probe_loop(client, deadline, latencies))
+        if invalidate_every:
+            tasks.append(invalidate_loop(client, deadline, invalidate_every))
+        await asyncio.gather(*tasks)
+    return latencies, errors
+
+def main():
+    parser = argparse.ArgumentParser(description="/hospital-data と / の同時アクセス時のレイテンシを測る")
+    parser.add_argument("--url", default="http://127.0.0.1:5001")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument("--invalidate-every", type=float, default=0.0, help="ブロックリストを切り替える間隔（秒、0なら切り替えない）")
+    args = parser.parse_args()
+
+    latencies, errors = asyncio.run(run(args.url, args.concurrency, args.duration, args.invalidate_every))
+    print(f"📊 同時接続 {args.concurrency}, {args.duration:.0f}秒, キャッシュ作り直し間隔 {args.invalidate_every or '-'}")
+    for path in PATHS + (PROBE_PATH,):
+        samples = np.array(latencies[path]) * 1000
+        if len(samples) == 0:
+            print(f"   {path:22s} 成功0件 エラー{errors.get(path, 0)}件")
+            continue
+        p50, p95, p99 = np.percentile(samples, [50, 95, 99])
+        print(
+            f"   {path:22s} {len(samples) / args.duration:7.1f} req/s  "
+            f"p50 {p50:7.1f} ms  p95 {p95:7.1f} ms  p99 {p99:7.1f} ms  max {samples.max():7.1f} ms  "
+            f"エラー{errors.get(path, 0)}件"
+        )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+import gzip
+import json
+import hashlib
+import threading
+from dataclasses import dataclass
+from metrics import span
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def dumps(obj) -> bytes:
+    """JSONをバイト列に変換（orjsonがあれば高速版を使う）"""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+@dataclass(frozen=True)
+class Payload:
+    """シリアライズ・圧縮済みのレスポンス本体"""
+    body: bytes
+    gzip: bytes
+    br: bytes
+    etag: str
+    count: int
+
+    @classmethod
+    def build(cls, records):
+        with span("payload.serialize"):
+            body = dumps(records)
+        with span("payload.compress"):
+            compressed_gzip = gzip.compress(body, compresslevel=6)
+            compressed_br = brotli.compress(body) if brotli is not None else b""
+        return cls(
+            body=body,
+            gzip=compressed_gzip,
+            br=compressed_br,
+            # 中身から作る強いETag（再起動してもデータが同じなら同じ値、圧縮した表現はetag_forで別の値）
+            etag='"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"',
+            count=len(records),
+        )
+
+    def etag_for(self, encoding):
+        """
+        Content-Encodingごとの強いETag（"<ハッシュ>" / "<ハッシュ>-gzip" / "<ハッシュ>-br"）
+        バイト列の違う表現に同じ強いETagを付けると、304の時にキャッシュが別の表現を使ってしまう
+        """
+        return self.etag if encoding is None else f'{self.etag[:-1]}-{encoding}"'
+
+    def encode_for(self, accept_encoding: str):
+        """Accept-Encodingに合わせて (本体, Content-Encoding) を選ぶ"""
+        accepted = {token.split(";")[0].strip() for token in accept_encoding.lower().split(",")}
+        if self.br and "br" in accepted:
+            return self.br, "br"
+        if "gzip" in accepted:
+            return self.gzip, "gzip"
+        return self.body, None
+
+
+class PayloadCache:
+    """
+    フィルタなしの一覧レスポンスを事前にシリアライズ・圧縮して保持
+    - キーごとに最新の1件だけを持ち、カタログか version（ブロックリスト・口コミ数のバージョンなど）が変わったら作り直す
+    - ワーカースレッドから呼ばれるので、作り直しはキーごとのロックの中で1回だけ行う
+      （同じキーの同時のミスは完成を待つ。別のキーの作り直しは待たせない）
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._build_locks = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _fresh(self, key, catalog, version):
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] is catalog and entry[1] == catalog.version and entry[2] == version:
+            return entry[3]
+        return None
+
+    def get(self, key, catalog, version, build):
+        with self._lock:
+            payload = self._fresh(key, catalog, version)
+            if payload is not None:
+                self.hits += 1
+                return payload
+            build_lock = self._build_locks.setdefault(key, threading.Lock())
+        with build_lock:
+            with self._lock:
+                # 待っている間にほかのスレッドが作り直していればそれを使う
+                payload = self._fresh(key, catalog, version)
+                if payload is not None:
+                    self.hits += 1
+                    return payload
+                self.misses += 1
+            payload = Payload.build(build())
+            with self._lock:
+                self._entries[key] = (catalog, catalog.version, version, payload)
+            return payload
+
+
+def etag_matches(if_none_match: str, etag: str):
+    """If-None-Matchのどれかがetagと一致するか（弱い比較なので W/ は外して比べる）"""
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
@@ -0,0 +1,143 @@
+import os
+import re
+import threading
+import numpy as np
+import pandas as pd
+from records import SelectedRecords
+
+# 都道府県（JISコード順、コード = 添字 + 1、0は不明）
+PREFECTURES = [
+    "北海道", "青森県", "岩手県", "宮城県", "秋田県", "山形県", "福島県",
+    "茨城県", "栃木県", "群馬県", "埼玉県", "千葉県", "東京都", "神奈川県",
+    "新潟県", "富山県", "石川県", "福井県", "山梨県", "長野県", "岐阜県",
+    "静岡県", "愛知県", "三重県", "滋賀県", "京都府", "大阪府", "兵庫県",
+    "奈良県", "和歌山県", "鳥取県", "島根県", "岡山県", "広島県", "山口県",
+    "徳島県", "香川県", "愛媛県", "高知県", "福岡県", "佐賀県", "長崎県",
+    "熊本県", "大分県", "宮崎県", "鹿児島県", "沖縄県",
+]
+PREFECTURE_CODES = {name: code for code, name in enumerate(PREFECTURES, 1)}
+PREFECTURE_PATTERN = re.compile("|".join(PREFECTURES))
+
+# CSVファイル名の先頭（都道府県のローマ字）→ 都道府県名
+PREFECTURE_NAMES = {
+    "hokkaidou": "北海道",
+    "aomori": "青森県",
+    "iwate": "岩手県",
+    "miyagi": "宮城県",
+    "akita": "秋田県",
+    "yamagata": "山形県",
+    "fukushima": "福島県",
+}
+
+def prefecture_from_path(csv_path):
+    """ファイル名（例: miyagi_hos.csv）から都道府県名を返す"""
+    return PREFECTURE_NAMES.get(os.path.basename(csv_path).split("_")[0], "")
+
+def prefecture_name(code):
+    """都道府県コード → 都道府県名（不明なら空文字）"""
+    return PREFECTURES[code - 1] if code else ""
+
+def resolve_prefecture_codes(records, default: str = ""):
+    """
+    各レコードの都道府県コードを読み込み時に一度だけ判定
+    prefecture列 → 住所 → ファイル名（default）の順で最初に見つかったものを使う
+    """
+    codes = np.full(len(records), PREFECTURE_CODES.get(default, 0), dtype=np.int8)
+    for row_id, record in enumerate(records):
+        match = PREFECTURE_PATTERN.search(record.get("prefecture") or "") or PREFECTURE_PATTERN.search(record.get("address") or "")
+        if match:
+            codes[row_id] = PREFECTURE_CODES[match.group()]
+    return codes
+
+
+class BlockedPrefectures:
+    """
+    ブロック中の都道府県と、カタログに対する除外マスク
+    - マスクはブロックリストかカタログが変わった時だけ作り直す
+    - リクエスト時はキャッシュ済みのマスク・絞り込み済みレコード（行番号のビュー）を返すだけ
+    - マスクはワーカースレッドで作られるので、作成中にブロックリストが変わったら結果を保存しない
+    - ブロックリストの変更とキャッシュの消去は、マスクの保存と同じロックの中で行う
+      （変更の前に作ったマスクが新しいバージョンのものとして残らないように）
+    """
+
+    def __init__(self, prefectures=()):
+        self.names = frozenset(prefectures)
+        self.version = 0
+        self._catalog = None
+        self._masks = {}
+        self._visible = {}
+        self._lock = threading.Lock()
+
+    def __contains__(self, prefecture):
+        return prefecture in self.names
+
+    def __iter__(self):
+        return iter(self.names)
+
+    def __len__(self):
+        return len(self.names)
+
+    def _set(self, update):
+        """update(今のブロックリスト) を新しいブロックリストにする（同時の変更を取りこぼさないようロックの中で）"""
+        with self._lock:
+            names = frozenset(update(self.names))
+            if names != self.names:
+                self.names = names
+                self.version += 1
+                self._masks.clear()
+                self._visible.clear()
+
+    def add(self, prefecture):
+        self._set(lambda names: names | {prefecture})
+
+    def discard(self, prefecture):
+        self._set(lambda names: names - {prefecture})
+
+    def replace(self, prefectures):
+        self._set(lambda names: prefectures)
+
+    def mask(self, catalog, kind):
+        """catalogの kind（"cards" / "hospital_data"）の各行がブロック対象かの真偽値配列"""
+        with self._lock:
+            if catalog is not self._catalog:
+                self._catalog = catalog
+                self._masks.clear()
+                self._visible.clear()
+            mask = self._masks.get(kind)
+            if mask is None:
+                version = self.version
+                mask = self._build_mask(getattr(catalog, kind), catalog.prefecture_codes[kind])
+                if version == self.version:
+                    self._masks[kind] = mask
+            return mask
+
+    def visible(self, catalog, kind):
+        """ブロック対象を除いたレコード（同じ状態なら前回の結果を再利用）"""
+        version = self.version
+        mask = self.mask(catalog, kind)
+        with self._lock:
+            visible = self._visible.get(kind) if catalog is self._catalog else None
+            if visible is None:
+                records = getattr(catalog, kind)
+                visible = records if not mask.any() else SelectedRecords(records, np.flatnonzero(~mask))
+                if version == self.version and catalog is self._catalog:
+                    self._visible[kind] = visible
+            return visible
+
+    def _build_mask(self, records, codes):
+        names = self.names
+        mask = np.zeros(len(records), dtype=bool)
+        if not names:
+            return mask
+        # 判定済みの都道府県コードで一括判定
+        blocked_codes = [PREFECTURE_CODES[name] for name in names if name in PREFECTURE_CODES]
+        if blocked_codes:
+            mask |= np.isin(codes, blocked_codes)
+        # 従来どおり、prefecture列の一致・住所の部分一致（市区町村名などでのブロック）も反映
+        pattern = "|".join(re.escape(name) for name in names if name)
+        prefectures = pd.Series([record.get("prefecture") or "" for record in records], dtype=object)
+        addresses = pd.Series([record.get("address") or "" for record in records], dtype=object)
+        mask |= prefectures.isin(names).to_numpy()
+        if pattern:
+            mask |= addresses.str.contains(pattern, regex=True).to_numpy()
+        return mask
@@ -1,33 +1,22 @@
 import pandas as pd
 import csv
+from departments import has_department
+from csv_reader import read_columns
+
+HOSPITAL_COLUMNS = ("name", "address", "established", "review")
 
 def extract_hospital_data(csv_paths):
     hospital_data = []
-    valid_departments = ["内", "外", "整", "小", "呼", "リハ", "精神", "糖尿病", "循環器", "消化器",
-                         "脳外", "心外", "皮", "ひ", "産婦", "眼", "耳い", "放", "麻", "歯", "形", "病理"]
-
     for csv_path in csv_paths:
-        df = pd.read_csv(
-    csv_path,
-    header=0,
-    skip_blank_lines=True,
-    low_memory=False,
-    dtype=str,
-    on_bad_lines='skip'
-)
-        df.rename(columns={
-            "病院名": "name",
-            "住所": "address",
-            "診療科": "established",
-            "レビューの数": "review"
-        }, inplace=True)
+        # 使う列だけを読む（レビュー数は欠損を許す整数で読まれる）
+        df = read_columns(csv_path, HOSPITAL_COLUMNS, skip_blank_lines=True, low_memory=False, on_bad_lines='skip')
 
         for _, row in df.iterrows():
             if pd.isna(row.get("name")) or pd.isna(row.get("address")) or pd.isna(row.get("established")):
                 continue
 
             departments = row.get("established", "").split(",")
-            filtered_departments = [dept.strip() for dept in departments if any(keyword in dept for keyword in valid_departments)]
+            filtered_departments = [dept.strip() for dept in departments if has_department(dept)]
 
             hospital = {
                 "name": str(row.get("name", "")).strip(),
@@ -0,0 +1,106 @@
+"""
+カタログのレコード列（読み取り専用のシーケンス）
+- MappedRecords: メモリマップした配列から、アクセスされた行だけdictを組み立てる
+  （文字列はUTF-8のヒープ上にあり、各ワーカーはページキャッシュ上の同じ物理ページを共有する）
+- ChainedRecords: 複数の断片を連結した1本のシーケンス（コピーしない）
+- SelectedRecords: 行番号で選んだ部分シーケンス（ブロック除外後の一覧など、コピーしない）
+"""
+import bisect
+import operator
+from collections.abc import Sequence
+import numpy as np
+
+
+class _RecordSequence(Sequence):
+    """行番号・スライスの両方で引けるシーケンスの共通部分（スライスはlistで返す）"""
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.row(i) for i in range(*index.indices(len(self)))]
+        index = operator.index(index)
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("record index out of range")
+        return self.row(index)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self.row(i)
+
+
+class MappedStrings:
+    """辞書化した文字列列（codes, heap, offsets）を、必要な要素だけデコードして返す"""
+
+    def __init__(self, codes, heap, offsets):
+        self.codes = np.asarray(codes)
+        self.heap = memoryview(np.asarray(heap))
+        self.offsets = np.asarray(offsets)
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self, row_id):
+        code = self.codes[row_id]
+        return str(self.heap[self.offsets[code]:self.offsets[code + 1]], "utf-8")
+
+
+class MappedRecords(_RecordSequence):
+    """
+    列ごとの配列（文字列はMappedStrings、数値はndarray）から行をdictとして組み立てる
+    - 組み立てたdictは保持しないので、プロセスごとのメモリはほとんど増えない
+    - converters: {列名: 関数} 保存形式からの変換（例: 診療科のカンマ区切り → リスト）
+    """
+
+    def __init__(self, columns, converters=None):
+        self.columns = columns
+        self.converters = converters or {}
+        self._length = len(next(iter(columns.values()))) if columns else 0
+
+    def __len__(self):
+        return self._length
+
+    def row(self, row_id):
+        record = {}
+        for name, column in self.columns.items():
+            value = column[row_id]
+            if isinstance(value, np.generic):
+                value = value.item()
+            convert = self.converters.get(name)
+            record[name] = convert(value) if convert is not None else value
+        return record
+
+
+class ChainedRecords(_RecordSequence):
+    """断片ごとのレコード列を連結して1本に見せる"""
+
+    def __init__(self, parts):
+        self.parts = [part for part in parts if len(part)]
+        self._starts = [0]
+        for part in self.parts:
+            self._starts.append(self._starts[-1] + len(part))
+
+    def __len__(self):
+        return self._starts[-1]
+
+    def row(self, row_id):
+        part_idx = bisect.bisect_right(self._starts, row_id) - 1
+        return self.parts[part_idx][row_id - self._starts[part_idx]]
+
+    def __iter__(self):
+        for part in self.parts:
+            yield from part
+
+
+class SelectedRecords(_RecordSequence):
+    """recordsのうちrow_idsの行だけを見せる"""
+
+    def __init__(self, records, row_ids):
+        self.records = records
+        self.row_ids = row_ids
+
+    def __len__(self):
+        return len(self.row_ids)
+
+    def row(self, index):
+        return self.records[self.row_ids[index]]
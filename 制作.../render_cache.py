@@ -0,0 +1,59 @@
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+
+class RenderCache:
+    """
+    レンダリング済みHTML断片のLRUキャッシュ
+    - キーは (カタログのバージョン, ブロックリストのバージョン, exclude_blocked) など
+    - 上限を超えたら最も古く使われた断片から捨てる
+    - ワーカースレッドから呼ばれるので、LRUの参照・追加はロックで守る
+    - レンダリングはロックの外で行い、同じキーのレンダリング中に来た呼び出しはその完成を待つ
+      （同じ断片を同時に2回レンダリングしない。別のキーのレンダリングは待たせない）
+    """
+
+    def __init__(self, maxsize: int = 32):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._rendering = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_render(self, key, render):
+        waiting = False
+        with self._lock:
+            html = self._entries.get(key)
+            if html is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return html
+            future = self._rendering.get(key)
+            if future is None:
+                self.misses += 1
+                future = self._rendering[key] = Future()
+            else:
+                # ほかのスレッドがレンダリング中
+                self.hits += 1
+                waiting = True
+        if waiting:
+            return future.result()
+
+        try:
+            html = render()
+        except BaseException as e:
+            with self._lock:
+                del self._rendering[key]
+            future.set_exception(e)
+            raise
+        with self._lock:
+            del self._rendering[key]
+            self._entries[key] = html
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        future.set_result(html)
+        return html
+
+    def __len__(self):
+        return len(self._entries)
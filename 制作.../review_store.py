@@ -0,0 +1,220 @@
+"""
+口コミの保存先（SQLite、WALモード）
+- 口コミは病院IDごとに保存し、一覧は (病院ID, 口コミID) の索引をたどるキーセット方式でページングする
+  （OFFSETのように読み飛ばす行を数えないので、口コミが10万件ある病院でも1ページの取得時間は変わらない）
+- 病院ごとの口コミ数は集計表（review_counts）に投稿と同じトランザクションで+1して持ち、COUNT(*)で数え直さない
+- 接続はプールして使い回す（同じSQL文はsqlite3が接続ごとにprepare済みの文をキャッシュする）
+"""
+import os
+import time
+import queue
+import sqlite3
+import asyncio
+import threading
+from contextlib import contextmanager
+
+DB_PATH = os.path.join(os.path.dirname(__file__), "db", "reviews.sqlite3")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS reviews (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    hospital_id TEXT NOT NULL,
+    comment TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS reviews_by_hospital ON reviews (hospital_id, id);
+CREATE TABLE IF NOT EXISTS review_counts (
+    hospital_id TEXT PRIMARY KEY,
+    count INTEGER NOT NULL,
+    last_review_id INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS review_counts_by_last_review ON review_counts (last_review_id);
+"""
+
+_INSERT_REVIEW = "INSERT INTO reviews (hospital_id, comment, created_at) VALUES (?, ?, ?)"
+_INCREMENT_COUNT = """
+INSERT INTO review_counts (hospital_id, count, last_review_id) VALUES (?, 1, ?)
+ON CONFLICT (hospital_id) DO UPDATE SET count = count + 1, last_review_id = excluded.last_review_id
+RETURNING count
+"""
+_SELECT_PAGE = "SELECT id, comment, created_at FROM reviews WHERE hospital_id = ? AND id < ? ORDER BY id DESC LIMIT ?"
+_SELECT_COUNT = "SELECT count FROM review_counts WHERE hospital_id = ?"
+_SELECT_COUNTS_SINCE = "SELECT hospital_id, count, last_review_id FROM review_counts WHERE last_review_id > ?"
+
+# キーセットの開始位置（これより小さいIDから新しい順に返す）
+_FIRST_CURSOR = 2 ** 63 - 1
+
+
+class ReviewCounts:
+    """
+    病院ID → 投稿された口コミ数（カタログが持ち、カタログを作り直しても同じものを引き継ぐ）
+    - 起動時に集計表から読み、以降は投稿のたびに更新する（数え直さない）
+    - ほかのワーカーの投稿は、集計表で last_review_id が進んだ病院の行だけを読んで取り込む（sync）
+    - version: 件数が変わるたびに+1（口コミ数を載せた一覧のキャッシュを作り直す目印）
+    """
+
+    def __init__(self, counts=None, last_review_id: int = 0):
+        self._counts = dict(counts or {})
+        self.last_review_id = last_review_id
+        self.version = 0
+        self._lock = threading.Lock()
+
+    def get(self, hospital_id):
+        return self._counts.get(hospital_id, 0)
+
+    def merged(self, record):
+        """
+        recordの口コミ数（CSVのreview列）に投稿された口コミ数を足したレコード
+        投稿の無い病院・IDの無いレコード（cards）はrecordをそのまま返す（カタログのレコードは書き換えない）
+        """
+        posted = self._counts.get(record.get("id"), 0)
+        if not posted:
+            return record
+        return {**record, "reviews": record.get("reviews", 0) + posted}
+
+    def set(self, hospital_id, count: int):
+        # 自分の投稿で last_review_id を進めると、間にあるほかのワーカーの投稿を取り込み損ねるので
+        # last_review_id は sync でだけ進める
+        with self._lock:
+            if self._counts.get(hospital_id) != count:
+                self._counts[hospital_id] = count
+                self.version += 1
+
+    def sync(self, store):
+        """集計表のうち、前回より新しい口コミがあった病院の件数だけを読み直す"""
+        rows = store.counts_since(self.last_review_id)
+        with self._lock:
+            for hospital_id, count, last_review_id in rows:
+                if self._counts.get(hospital_id) != count:
+                    self._counts[hospital_id] = count
+                    self.version += 1
+                self.last_review_id = max(self.last_review_id, last_review_id)
+        return len(rows)
+
+    def __len__(self):
+        return len(self._counts)
+
+    def total(self):
+        return sum(self._counts.values())
+
+
+class ReviewStore:
+    """
+    口コミの保存・一覧
+    - 接続はpool_size本までプールし、スレッドプールの各ワーカーが取り出して使う
+    - 書き込みは BEGIN IMMEDIATE で始め、口コミの追加と件数の更新を1トランザクションで行う
+    - start() で sync_interval 秒ごとに件数（ReviewCounts）をほかのワーカーの投稿に追いつかせる
+    """
+
+    def __init__(self, db_path=DB_PATH, pool_size: int = 4, sync_interval: float = 2.0):
+        self.db_path = db_path
+        self.pool_size = pool_size
+        self.sync_interval = sync_interval
+        self.counts = None
+        self._pool = queue.LifoQueue()
+        self._schema_lock = threading.Lock()
+        self._schema_ready = False
+        self._task = None
+
+    # --- 接続プール ---
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, isolation_level=None, check_same_thread=False, cached_statements=64)
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        conn.execute("PRAGMA busy_timeout = 5000")
+        with self._schema_lock:
+            if not self._schema_ready:
+                conn.executescript(_SCHEMA)
+                self._schema_ready = True
+        return conn
+
+    @contextmanager
+    def _connection(self):
+        try:
+            conn = self._pool.get_nowait()
+        except queue.Empty:
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+            conn = self._connect()
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            if self._pool.qsize() < self.pool_size:
+                self._pool.put(conn)
+            else:
+                conn.close()
+
+    def close(self):
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                return
+
+    # --- 口コミ ---
+
+    def add(self, hospital_id, comment: str):
+        """口コミを1件保存し、(口コミID, その病院の口コミ数) を返す"""
+        with self._connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            review_id = conn.execute(_INSERT_REVIEW, (hospital_id, comment, time.time())).lastrowid
+            (count,) = conn.execute(_INCREMENT_COUNT, (hospital_id, review_id)).fetchone()
+            conn.execute("COMMIT")
+        if self.counts is not None:
+            self.counts.set(hospital_id, count)
+        return review_id, count
+
+    def page(self, hospital_id, before=None, limit: int = 20):
+        """
+        口コミを新しい順にlimit件返す: (口コミのリスト, 次のページのカーソル or None)
+        before: 前のページが返したカーソル（その口コミIDより古いものから続ける）
+        """
+        with self._connection() as conn:
+            rows = conn.execute(_SELECT_PAGE, (hospital_id, _FIRST_CURSOR if before is None else before, limit + 1)).fetchall()
+        reviews = [{"id": review_id, "comment": comment, "created_at": created_at} for review_id, comment, created_at in rows[:limit]]
+        next_cursor = reviews[-1]["id"] if len(rows) > limit else None
+        return reviews, next_cursor
+
+    def count(self, hospital_id):
+        """集計表の口コミ数（主キーで1行引くだけ）"""
+        with self._connection() as conn:
+            row = conn.execute(_SELECT_COUNT, (hospital_id,)).fetchone()
+        return row[0] if row else 0
+
+    def counts_since(self, last_review_id: int):
+        """last_review_idより新しい口コミがあった病院の (病院ID, 口コミ数, 最新の口コミID)"""
+        with self._connection() as conn:
+            return conn.execute(_SELECT_COUNTS_SINCE, (last_review_id,)).fetchall()
+
+    def load_counts(self):
+        """集計表からReviewCountsを作る（起動時に1回）"""
+        self.counts = ReviewCounts()
+        self.counts.sync(self)
+        return self.counts
+
+    # --- ほかのワーカーの投稿に追いつく ---
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.close()
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.sync_interval)
+            try:
+                if self.counts is not None:
+                    await asyncio.to_thread(self.counts.sync, self)
+            except Exception as e:
+                print(f"口コミ数の同期でエラーが発生しました: {e}")
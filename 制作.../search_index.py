@@ -0,0 +1,173 @@
+import copy
+import numpy as np
+from collections import defaultdict
+from departments import classify_departments, canonical_department
+
+
+def _to_postings(groups):
+    """{キー: [行番号,...]} をソート済みのint32配列に変換"""
+    return {key: np.array(row_ids, dtype=np.int32) for key, row_ids in groups.items()}
+
+def _merge_postings(postings, groups):
+    """既存のポスティングの末尾にgroupsの行番号を足した新しい辞書（変わらないキーは配列を共有）"""
+    merged = dict(postings)
+    for key, row_ids in _to_postings(groups).items():
+        merged[key] = np.concatenate([postings[key], row_ids]) if key in postings else row_ids
+    return merged
+
+
+class NgramIndex:
+    """
+    日本語の部分一致検索用の文字N-gram転置インデックス
+    - 空白で単語に区切れない病院名・住所のため、1文字（unigram）と2文字（bigram）で索引
+    - ポスティングは全件を1本のint32配列に詰め、gramごとの開始・終了位置だけを持つ
+    - 検索は各bigramのポスティングを短い順に積集合し、残った候補だけ実際の文字列で確認
+    - lookupを渡すと文字列を保持せず、確認時にlookup(行番号)で取り出す
+    - extendedで末尾に行を足した新しい索引を作れる（既存の行は作り直さない）
+    """
+
+    def __init__(self, texts, lookup=None):
+        self.lookup = lookup if lookup is not None else texts.__getitem__
+        self.size = 0
+        self._gram_ids = {}
+        self._rows = np.empty(0, dtype=np.int32)
+        self._offsets = np.zeros(1, dtype=np.int64)
+        self._add(texts)
+
+    def extended(self, texts, lookup):
+        """texts（行番号は既存の続き）を追加した新しい索引を返す（自身は変更しない）"""
+        index = copy.copy(self)
+        index.lookup = lookup
+        index._gram_ids = dict(self._gram_ids)
+        index._add(texts)
+        return index
+
+    def _add(self, texts):
+        gram_ids = self._gram_ids
+        old_grams = len(gram_ids)
+        pair_grams = []
+        pair_rows = []
+        for row_id, text in enumerate(texts, self.size):
+            grams = set(text) | {text[i:i + 2] for i in range(len(text) - 1)}
+            for gram in grams:
+                pair_grams.append(gram_ids.setdefault(gram, len(gram_ids)))
+            pair_rows.extend([row_id] * len(grams))
+
+        pair_grams = np.array(pair_grams, dtype=np.int32)
+        order = np.argsort(pair_grams, kind="stable")
+        pair_grams = pair_grams[order]
+        # 追加する行番号は既存より大きいので、各gramの区間の末尾（新しいgramは配列の末尾）に差し込めば並びが保たれる
+        positions = np.full(len(pair_grams), len(self._rows), dtype=np.int64)
+        known = pair_grams < old_grams
+        positions[known] = self._offsets[pair_grams[known] + 1]
+        self._rows = np.insert(self._rows, positions, np.array(pair_rows, dtype=np.int32)[order])
+        counts = np.bincount(pair_grams, minlength=len(gram_ids))
+        counts[:old_grams] += np.diff(self._offsets)
+        self._offsets = np.zeros(len(gram_ids) + 1, dtype=np.int64)
+        np.cumsum(counts, out=self._offsets[1:])
+        self.size += len(texts)
+
+    def postings(self, gram):
+        """gramを含む行番号（ソート済み、コピーなしのビュー）"""
+        gram_id = self._gram_ids.get(gram)
+        if gram_id is None:
+            return np.empty(0, dtype=np.int32)
+        return self._rows[self._offsets[gram_id]:self._offsets[gram_id + 1]]
+
+    def candidates(self, keyword):
+        """keywordのN-gramを全て含む行番号（部分一致の候補）"""
+        if len(keyword) == 1:
+            return self.postings(keyword)
+        grams = {keyword[i:i + 2] for i in range(len(keyword) - 1)}
+        lists = sorted((self.postings(gram) for gram in grams), key=len)
+        row_ids = lists[0]
+        for postings in lists[1:]:
+            if len(row_ids) == 0:
+                break
+            row_ids = np.intersect1d(row_ids, postings, assume_unique=True)
+        return row_ids
+
+    def search(self, keyword, within=None):
+        """keywordを部分文字列として含む行番号。withinを渡すとその中だけに絞る"""
+        row_ids = self.candidates(keyword)
+        if within is not None:
+            row_ids = np.intersect1d(row_ids, within, assume_unique=True)
+        if len(keyword) <= 2:
+            # 1〜2文字ならポスティングがそのまま部分一致の結果
+            return row_ids
+        return np.array([row_id for row_id in row_ids if keyword in self.lookup(row_id)], dtype=np.int32)
+
+
+class SearchIndex:
+    """
+    カタログ検索用のインデックス
+    - 都道府県 → 行番号、診療科（正式名） → 行番号 をカタログ構築時に作っておく
+    - キーワードは病院名・住所・法人名のN-gramインデックスで部分一致検索
+      候補の確認はtexts（text()の文字列を行ごとに並べた列）の1要素を読むだけで、レコードは組み立てない
+    - 検索は行番号配列の積集合で候補を絞るので、全件を走査しない
+    """
+
+    # キーワード検索の対象列
+    text_fields = ("name", "address", "corporation")
+
+    def __init__(self, records, prefectures, texts=None):
+        """texts: 各行のtext()（省略するとrecordsから作ってメモリに持つ）"""
+        self.records = records
+        by_prefecture, by_department = self._group_rows(records, prefectures)
+        self.by_prefecture = _to_postings(by_prefecture)
+        self.by_department = _to_postings(by_department)
+        self.all_rows = np.arange(len(records), dtype=np.int32)
+        # 列の境目をまたいだ一致を防ぐため、区切りに改行を挟んで1つの文字列として索引
+        # （スナップショットから読んだ場合、textsはメモリマップ上の文字列列）
+        if texts is None:
+            texts = [self.text(record) for record in records]
+        self.text_index = NgramIndex(texts)
+
+    @staticmethod
+    def _group_rows(records, prefectures, start=0):
+        """都道府県・診療科（正式名）ごとの行番号リスト"""
+        by_prefecture = defaultdict(list)
+        by_department = defaultdict(list)
+        for row_id, (record, prefecture) in enumerate(zip(records, prefectures), start):
+            by_prefecture[prefecture].append(row_id)
+            for department in classify_departments(" ".join(record["departments"])):
+                by_department[department].append(row_id)
+        return by_prefecture, by_department
+
+    def extended(self, records, new_records, new_prefectures, texts):
+        """
+        recordsの末尾にnew_recordsが追加された後のインデックスを返す（自身は変更しない）
+        既存の行番号は変わらないので、追加分のポスティングとN-gramだけを足す
+        texts: 追加後の全行のtext()
+        """
+        index = copy.copy(self)
+        index.records = records
+        by_prefecture, by_department = self._group_rows(new_records, new_prefectures, len(self.all_rows))
+        index.by_prefecture = _merge_postings(self.by_prefecture, by_prefecture)
+        index.by_department = _merge_postings(self.by_department, by_department)
+        index.all_rows = np.arange(len(records), dtype=np.int32)
+        index.text_index = self.text_index.extended([self.text(record) for record in new_records], lookup=texts.__getitem__)
+        return index
+
+    @classmethod
+    def text(cls, record):
+        return "\n".join(record.get(field, "") for field in cls.text_fields)
+
+    def candidates(self, region: str = "", department: str = ""):
+        """都道府県・診療科で絞り込んだ行番号（ソート済み）"""
+        empty = np.empty(0, dtype=np.int32)
+        row_ids = self.all_rows
+        if region:
+            row_ids = self.by_prefecture.get(region, empty)
+        if department:
+            postings = self.by_department.get(canonical_department(department), empty)
+            row_ids = postings if not region else np.intersect1d(row_ids, postings, assume_unique=True)
+        return row_ids
+
+    def search(self, keyword: str = "", region: str = "", department: str = ""):
+        """条件に合う行番号を返す（キーワードは病院名・住所・法人名の部分一致）"""
+        row_ids = self.candidates(region, department)
+        if keyword:
+            within = None if row_ids is self.all_rows else row_ids
+            row_ids = self.text_index.search(keyword, within)
+        return row_ids
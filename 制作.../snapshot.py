@@ -0,0 +1,197 @@
+"""
+病院カタログの列指向スナップショット
+- 起動のたびにCSV（1000列超の詰め物列を含む）をパースしないよう、整形済みのカタログを
+  NumPyの.npyファイル群に書き出しておく（オフラインの「コンパイル」手順）
+- 文字列は列ごとに辞書化（重複を1つにまとめ、UTF-8のバイト列 + 開始位置配列 + 各行のコード）
+- 起動時は各.npyをメモリマップで開き、元CSVのmtime/サイズが一致する断片だけ使う
+  （スナップショットが無い・古い断片はCSVから読み込む）
+- レコードはdictに展開せずメモリマップのまま参照するので、uvicornの複数ワーカーが
+  同じスナップショットを開けば物理メモリ上のコピーは1つで済む
+使い方: python snapshot.py
+"""
+import os
+import json
+import shutil
+import time
+import numpy as np
+from catalog import CatalogSlice, file_stat
+from records import MappedRecords, MappedStrings
+from metrics import span
+
+SNAPSHOT_FORMAT = 6
+SNAPSHOT_DIR = os.path.join(os.path.dirname(__file__), "snapshot")
+
+# スナップショットに保存する列（文字列列と数値列）
+CARD_COLUMNS = ("name", "address", "departments", "prefecture")
+DATA_COLUMNS = ("id", "name", "address", "departments", "prefecture", "corporation", "facility_type")
+
+
+def encode_strings(values):
+    """文字列の列を辞書化して (codes, heap, offsets) に変換"""
+    dictionary = {}
+    codes = np.fromiter((dictionary.setdefault(v, len(dictionary)) for v in values), dtype=np.int32, count=len(values))
+    encoded = [v.encode("utf-8") for v in dictionary]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    heap = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+    return codes, heap, offsets
+
+def _slice_arrays(catalog_slice):
+    """断片を {配列名: ndarray} に変換"""
+    arrays = {}
+    for kind, columns in (("cards", CARD_COLUMNS), ("hospital_data", DATA_COLUMNS)):
+        records = getattr(catalog_slice, kind)
+        for column in columns:
+            if kind == "hospital_data" and column == "departments":
+                values = [",".join(r["departments"]) for r in records]
+            else:
+                values = [r.get(column) or "" for r in records]
+            codes, heap, offsets = encode_strings(values)
+            arrays[f"{kind}.{column}.codes"] = codes
+            arrays[f"{kind}.{column}.heap"] = heap
+            arrays[f"{kind}.{column}.offsets"] = offsets
+    # キーワード検索の候補の確認用（病院名・住所・法人名をつないだ文字列）
+    codes, heap, offsets = encode_strings(list(catalog_slice.search_texts))
+    arrays["hospital_data.search_text.codes"] = codes
+    arrays["hospital_data.search_text.heap"] = heap
+    arrays["hospital_data.search_text.offsets"] = offsets
+    arrays["hospital_data.reviews"] = np.array([r["reviews"] for r in catalog_slice.hospital_data], dtype=np.int64)
+    arrays["cards.prefecture_codes"] = catalog_slice.card_prefecture_codes
+    arrays["hospital_data.prefecture_codes"] = catalog_slice.data_prefecture_codes
+    arrays["hospital_data.postal_codes"] = catalog_slice.data_postal_codes
+    return arrays
+
+def _split_departments(departments):
+    return departments.split(",")
+
+def _slice_from_arrays(path, arrays):
+    """
+    _slice_arraysの逆変換
+    レコードはメモリマップした配列のまま持ち、アクセスされた行だけdictにする
+    （複数のワーカーが同じスナップショットを開けば、文字列ヒープはページキャッシュで共有される）
+    """
+    def strings(kind, column):
+        return MappedStrings(arrays[f"{kind}.{column}.codes"], arrays[f"{kind}.{column}.heap"], arrays[f"{kind}.{column}.offsets"])
+
+    data_columns = {column: strings("hospital_data", column) for column in DATA_COLUMNS}
+    data_columns["reviews"] = np.asarray(arrays["hospital_data.reviews"])
+    # CSVから読んだ場合と同じキー順にそろえる
+    data_columns = {name: data_columns[name] for name in ("id", "name", "address", "departments", "reviews", "prefecture", "corporation", "facility_type")}
+    return CatalogSlice(
+        path=path,
+        cards=MappedRecords({column: strings("cards", column) for column in CARD_COLUMNS}),
+        hospital_data=MappedRecords(data_columns, converters={"departments": _split_departments}),
+        search_texts=strings("hospital_data", "search_text"),
+        card_prefecture_codes=np.asarray(arrays["cards.prefecture_codes"]),
+        data_prefecture_codes=np.asarray(arrays["hospital_data.prefecture_codes"]),
+        data_postal_codes=np.asarray(arrays["hospital_data.postal_codes"]),
+    )
+
+
+def _source_key(path, snapshot_dir):
+    """スナップショットの場所を基準にした元CSVの相対パス（ディレクトリごと移動しても使える）"""
+    return os.path.relpath(os.path.abspath(path), os.path.dirname(os.path.abspath(snapshot_dir)))
+
+def write_snapshot(slices, snapshot_dir=SNAPSHOT_DIR):
+    """
+    カタログの断片（{パス: CatalogSlice}）をスナップショットに書き出す
+    世代ごとのサブディレクトリに配列を書き、最後にmanifest.jsonを差し替えるので、
+    読み込み中のプロセスが書きかけを見ることはない
+    """
+    generation = str(time.time_ns())
+    generation_dir = os.path.join(snapshot_dir, generation)
+    os.makedirs(generation_dir)
+
+    manifest_slices = []
+    for slice_idx, (path, catalog_slice) in enumerate(slices.items()):
+        prefix = f"s{slice_idx}"
+        for name, array in _slice_arrays(catalog_slice).items():
+            np.save(os.path.join(generation_dir, f"{prefix}.{name}.npy"), array)
+        manifest_slices.append({
+            "source": _source_key(path, snapshot_dir),
+            "stat": file_stat(path),
+            "prefix": prefix,
+        })
+
+    manifest_path = os.path.join(snapshot_dir, "manifest.json")
+    with open(manifest_path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump({"format": SNAPSHOT_FORMAT, "generation": generation, "slices": manifest_slices}, f, ensure_ascii=False)
+    os.replace(manifest_path + ".tmp", manifest_path)
+
+    # 古い世代を削除
+    for entry in os.listdir(snapshot_dir):
+        old_dir = os.path.join(snapshot_dir, entry)
+        if entry != generation and os.path.isdir(old_dir):
+            shutil.rmtree(old_dir, ignore_errors=True)
+    return generation_dir
+
+def update_snapshot(slices, changed_paths, snapshot_dir=SNAPSHOT_DIR):
+    """
+    changed_pathsの断片だけCSVから読み直してスナップショットを書き直す（追記ログの畳み込み後など）
+    スナップショットを使っていない（manifest.jsonが無い）場合は何もしない
+    """
+    if read_manifest(snapshot_dir) is None:
+        return None
+    slices = dict(slices)
+    for path in changed_paths:
+        slices[path] = CatalogSlice.from_csv(path)
+    return write_snapshot(slices, snapshot_dir)
+
+def read_manifest(snapshot_dir=SNAPSHOT_DIR):
+    """manifest.jsonを読む（無い・形式違いならNone）"""
+    try:
+        with open(os.path.join(snapshot_dir, "manifest.json"), encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    if manifest.get("format") != SNAPSHOT_FORMAT:
+        return None
+    return manifest
+
+def load_slices(csv_paths, snapshot_dir=SNAPSHOT_DIR):
+    """
+    csv_pathsの各断片を、新しいスナップショットがあればそこから、無ければCSVから読み込む
+    戻り値: ({パス: CatalogSlice}, スナップショットから読んだ断片数)
+    """
+    manifest = read_manifest(snapshot_dir)
+    entries = {}
+    if manifest is not None:
+        generation_dir = os.path.join(snapshot_dir, manifest["generation"])
+        entries = {entry["source"]: entry for entry in manifest["slices"]}
+
+    slices = {}
+    from_snapshot = 0
+    for path in dict.fromkeys(csv_paths):
+        entry = entries.get(_source_key(path, snapshot_dir))
+        stat = file_stat(path)
+        if entry is not None and stat is not None and list(stat) == entry["stat"]:
+            try:
+                with span("snapshot.open"):
+                    arrays = _open_arrays(generation_dir, entry["prefix"])
+                    slices[path] = _slice_from_arrays(path, arrays)
+                from_snapshot += 1
+                continue
+            except (OSError, KeyError, ValueError) as e:
+                print(f"スナップショットを読めませんでした（CSVから読み込みます）: {path}: {e}")
+        slices[path] = CatalogSlice.from_csv(path)
+    return slices, from_snapshot
+
+def _open_arrays(generation_dir, prefix):
+    """断片の全配列をメモリマップで開く"""
+    arrays = {}
+    for filename in os.listdir(generation_dir):
+        if filename.startswith(prefix + ".") and filename.endswith(".npy"):
+            arrays[filename[len(prefix) + 1:-len(".npy")]] = np.load(os.path.join(generation_dir, filename), mmap_mode="r")
+    return arrays
+
+
+if __name__ == "__main__":
+    from app import csv_paths
+    from catalog import HospitalCatalog
+
+    start_time = time.time()
+    catalog = HospitalCatalog.from_csv(csv_paths)
+    generation_dir = write_snapshot(catalog.slices)
+    print(f"✅ スナップショットを書き出しました: {generation_dir}")
+    print(f"   📊 {len(catalog.slices)}ファイル, カード{len(catalog.cards):,}件, 病院データ{len(catalog.hospital_data):,}件")
+    print(f"   ⏱️  処理時間: {time.time() - start_time:.2f}秒")
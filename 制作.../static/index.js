@@ -78,7 +78,7 @@ document.addEventListener("DOMContentLoaded", () => {
 
   function renderResults(data) {
     results.innerHTML = "";
-    if (data.length === 5) {
+    if (data.length === 0) {
       results.innerHTML = "<p>該当する病院が見つかりませんでした。</p>";
       return;
     }
@@ -105,18 +105,18 @@ document.addEventListener("DOMContentLoaded", () => {
   }
 
   form.addEventListener("submit", (e) => {
-    e.skjfkujahdibjerkfeventDefault();
-    const keyword = input.value.trim();
-    const selectedRegion = document.getElementById("region-select").value;
-    const selectedDepartment = document.getElementById("department-select").value;
-
-    filtered = hospitals.filter(h =>
-      h.name.includes(keyword) &&
-      (selectedRegion === "" || h.address.includes(selectedRegion)) &&
-      (selectedDepartment === "" || h.department === selectedDepartment)
-    );
-
-    renderResults(filtered);
+    e.preventDefault();
+    const params = new URLSearchParams({
+      keyword: input.value.trim(),
+      region: document.getElementById("region-select").value,
+      department: document.getElementById("department-select").value,
+    });
+
+    // 絞り込みはサーバー側（/search）で行い、該当ページ分だけ受け取る
+    fetch(`/search?${params}`)
+      .then(response => response.json())
+      .then(data => renderResults(data.results))
+      .catch(error => console.error('Error searching hospitals:', error));
   });
 
   function getRandomHospitals(arr, max) {
@@ -138,7 +138,7 @@ function closeCommentModal() {
   document.getElementById("comment-modal").style.display = "none";
 }
 
-fetch('/hospital-data')
+fetch('/search?limit=20')
   .then(response => {
     if (!response.ok) {
       throw new Error(`HTTP error! status: ${response.status}`);
@@ -147,7 +147,7 @@ fetch('/hospital-data')
   })
   .then(data => {
     console.log(data); // デバッグ用
-    renderHospitalCards(data); // データをレンダリング
+    renderHospitalCards(data.results); // データをレンダリング
   })
   .catch(error => {
     console.error('Error fetching hospital data:', error);
@@ -0,0 +1,380 @@
+"""
+app.py のエンドポイントのテスト
+- /search の結果が、全件を1件ずつ調べた結果と同じになること（ページングも）
+- 入力の誤り・存在しない病院などに、決まったステータスコードを返すこと
+- フィルタなしの一覧（キャッシュ済みペイロード）が、Accept-Encodingに合った表現・ETag・304を返すこと
+- 口コミのページングが、カーソルをたどると新しい順に重複・抜けなく全件を返すこと
+- /facets の件数が、全件を1件ずつ数えた結果と同じになること
+- /nearby が、座標表が無ければ理由付きの503、あれば全件の距離を比べた結果と同じ近い順のk件を返すこと
+使い方: python -m pytest test_app.py
+（起動時の処理は走らせず、リポジトリのCSVから作ったカタログと一時ディレクトリの口コミDBを使う）
+"""
+import math
+from pathlib import Path
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+import app as appmod
+import catalog as catalog_module
+import payload_cache
+from catalog import CatalogSlice, CatalogWatcher, HospitalCatalog
+from departments import DEPARTMENT_CODES, canonical_department, classify_departments
+from facets import FACILITY_TYPES
+from geo import KM_PER_DEGREE, compile_postal_table, load_postal_table
+from payload_cache import Payload, PayloadCache
+from prefectures import PREFECTURES, BlockedPrefectures, prefecture_name
+from render_cache import RenderCache
+from review_store import ReviewStore
+
+CSV_DIR = Path(__file__).parent / 'csv'
+CSV_PATHS = [str(CSV_DIR / name) for name in ('miyagi_hos.csv', 'miyagi_dent.csv', 'akita_hos.csv')]
+
+
+@pytest.fixture(scope='module')
+def slices():
+    return {path: CatalogSlice.from_csv(path) for path in CSV_PATHS}
+
+@pytest.fixture
+def catalog(slices, tmp_path, monkeypatch):
+    """CSVから作ったカタログと、空の口コミDB・キャッシュ・ブロックリストでappを動かす"""
+    store = ReviewStore(str(tmp_path / 'reviews.sqlite3'))
+    catalog = HospitalCatalog(slices, review_counts=store.load_counts())
+    monkeypatch.setattr(appmod, 'catalog_watcher', CatalogWatcher(catalog))
+    monkeypatch.setattr(appmod, 'review_store', store)
+    monkeypatch.setattr(appmod, 'blocked_prefectures', BlockedPrefectures())
+    monkeypatch.setattr(appmod, 'payload_cache', PayloadCache())
+    monkeypatch.setattr(appmod, 'card_list_cache', RenderCache())
+    monkeypatch.setattr(appmod, 'hospital_page_cache', RenderCache())
+    yield catalog
+    store.close()
+
+@pytest.fixture
+def client(catalog):
+    return TestClient(appmod.app)
+
+
+def brute_force_search(catalog, keyword='', region='', department=''):
+    """全件を1件ずつ調べた検索結果の行番号"""
+    codes = catalog.prefecture_codes['hospital_data']
+    department = canonical_department(department) if department else ''
+    rows = []
+    for row_id, record in enumerate(catalog.hospital_data):
+        if keyword and not any(keyword in record.get(field, '') for field in ('name', 'address', 'corporation')):
+            continue
+        if region and prefecture_name(codes[row_id]) != region:
+            continue
+        if department and department not in classify_departments(' '.join(record['departments'])):
+            continue
+        rows.append(row_id)
+    return rows
+
+
+# --- /search ---
+
+@pytest.mark.parametrize('params', [
+    {'keyword': '仙台市'},
+    {'keyword': '石巻市'},
+    {'keyword': '常　勤'},
+    {'keyword': '青葉区', 'department': '内科'},
+    {'region': '秋田県'},
+    {'region': '宮城県', 'department': '小児科'},
+    {'keyword': '市', 'region': '秋田県'},
+    {'keyword': '存在しない病院名'},
+])
+def test_search_matches_brute_force(client, catalog, params):
+    expected = brute_force_search(catalog, **params)
+    ids = []
+    offset = 0
+    while True:
+        body = client.get('/search', params={**params, 'limit': 100, 'offset': offset}).json()
+        assert body['total'] == len(expected)
+        ids.extend(result['id'] for result in body['results'])
+        offset += 100
+        if offset >= body['total']:
+            break
+    assert ids == [catalog.hospital_data[row_id]['id'] for row_id in expected]
+
+def test_search_excludes_blocked_prefectures(client, catalog):
+    appmod.blocked_prefectures.add('秋田県')
+    body = client.get('/search', params={'keyword': '市', 'limit': 100}).json()
+    assert body['total'] == len(brute_force_search(catalog, keyword='市', region='宮城県'))
+    assert client.get('/search', params={'keyword': '市', 'exclude_blocked': False}).json()['total'] == len(brute_force_search(catalog, keyword='市'))
+
+
+# --- ステータスコード ---
+
+@pytest.mark.parametrize('path, params', [
+    ('/search', {'limit': 0}),
+    ('/search', {'limit': 101}),
+    ('/search', {'offset': -1}),
+    ('/hospital-data', {'format': 'xml'}),
+    ('/hospital_cards', {'limit': 0}),
+    ('/nearby', {'lat': 91, 'lon': 140}),
+    ('/nearby', {'lat': 38}),
+])
+def test_invalid_query_is_422(client, path, params):
+    assert client.get(path, params=params).status_code == 422
+
+def test_unknown_hospital_is_404(client):
+    assert client.get('/hospital/no-such-id').status_code == 404
+    assert client.get('/hospital/no-such-id/reviews').status_code == 404
+    assert client.post('/hospital/no-such-id/reviews', data={'comment': 'よかった'}).status_code == 404
+
+def test_blocked_hospital_is_404(client, catalog):
+    hospital_id = catalog.hospital_data[0]['id']
+    assert client.get(f'/hospital/{hospital_id}').status_code == 200
+    appmod.blocked_prefectures.add('宮城県')
+    assert client.get(f'/hospital/{hospital_id}').status_code == 404
+
+@pytest.mark.parametrize('comment', ['', '   ', 'あ' * (appmod.REVIEW_MAX_LENGTH + 1)])
+def test_invalid_review_is_400(client, catalog, comment):
+    hospital_id = catalog.hospital_data[0]['id']
+    assert client.post(f'/hospital/{hospital_id}/reviews', data={'comment': comment}).status_code == 400
+
+@pytest.mark.parametrize('name, address, departments', [
+    ('新病院', '住所に都道府県がない', ['内科']),
+    ('新病院', '東京都千代田区1-1', ['内科']),
+    ('', '宮城県仙台市1-1', ['内科']),
+    ('新病院', '宮城県仙台市1-1', ['  ']),
+])
+def test_invalid_new_hospital_is_400(client, name, address, departments):
+    response = client.post('/add-hospital', params={'name': name, 'address': address}, json=departments)
+    assert response.status_code == 400
+
+
+# --- 一覧のキャッシュ済みペイロード（ETag・圧縮・304） ---
+
+def test_payload_matches_paged_response(client):
+    for path in ('/hospital-data', '/hospital_cards'):
+        cached = client.get(path, headers={'Accept-Encoding': 'identity'})
+        assert cached.status_code == 200 and 'Content-Encoding' not in cached.headers
+        paged = client.get(path, params={'limit': 100_000})
+        assert cached.json() == paged.json()
+        assert cached.headers['X-Total-Count'] == paged.headers['X-Total-Count'] == str(len(cached.json()))
+
+def test_payload_encoding_and_etag(client):
+    plain = client.get('/hospital-data', headers={'Accept-Encoding': 'identity'})
+    gzipped = client.get('/hospital-data', headers={'Accept-Encoding': 'gzip, deflate'})
+    assert gzipped.headers['Content-Encoding'] == 'gzip'
+    assert gzipped.json() == plain.json()
+    assert gzipped.headers['Vary'] == 'Accept-Encoding'
+    # 表現ごとに別の強いETag
+    assert plain.headers['ETag'] != gzipped.headers['ETag']
+    assert gzipped.headers['ETag'] == plain.headers['ETag'][:-1] + '-gzip"'
+    assert appmod.payload_cache.misses == 1
+
+def test_payload_not_modified(client):
+    etag = client.get('/hospital-data', headers={'Accept-Encoding': 'gzip'}).headers['ETag']
+    not_modified = client.get('/hospital-data', headers={'Accept-Encoding': 'gzip', 'If-None-Match': etag})
+    assert not_modified.status_code == 304 and not_modified.content == b''
+    assert not_modified.headers['ETag'] == etag
+    assert client.get('/hospital-data', headers={'Accept-Encoding': 'gzip', 'If-None-Match': f'W/{etag}'}).status_code == 304
+    assert client.get('/hospital-data', headers={'Accept-Encoding': 'gzip', 'If-None-Match': '*'}).status_code == 304
+    # gzipのETagでは、圧縮しない表現に304を返さない
+    assert client.get('/hospital-data', headers={'Accept-Encoding': 'identity', 'If-None-Match': etag}).status_code == 200
+
+def test_payload_rebuilt_on_block_and_review(client, catalog):
+    etags = lambda: [client.get(path, headers={'Accept-Encoding': 'identity'}).headers['ETag'] for path in ('/hospital-data', '/hospital_cards')]
+    data_etag, cards_etag = etags()
+    appmod.blocked_prefectures.add('秋田県')
+    blocked_data_etag, blocked_cards_etag = etags()
+    assert blocked_data_etag != data_etag and blocked_cards_etag != cards_etag
+    # 口コミ数を載せるのはhospital_dataだけ
+    hospital_id = catalog.hospital_data[0]['id']
+    assert client.post(f'/hospital/{hospital_id}/reviews', data={'comment': 'よかった'}).status_code == 200
+    reviewed_data_etag, reviewed_cards_etag = etags()
+    assert reviewed_data_etag != blocked_data_etag and reviewed_cards_etag == blocked_cards_etag
+    record = next(r for r in client.get('/hospital-data').json() if r['id'] == hospital_id)
+    assert record['reviews'] == catalog.hospital_data[0]['reviews'] + 1
+
+def test_payload_prefers_brotli(monkeypatch):
+    class FakeBrotli:
+        @staticmethod
+        def compress(body):
+            return b'br:' + body
+
+    records = [{'id': 'a', 'name': '病院'}]
+    monkeypatch.setattr(payload_cache, 'brotli', None)
+    payload = Payload.build(records)
+    assert payload.encode_for('br, gzip')[1] == 'gzip'
+
+    monkeypatch.setattr(payload_cache, 'brotli', FakeBrotli)
+    payload = Payload.build(records)
+    assert payload.encode_for('gzip, br;q=1.0') == (b'br:' + payload.body, 'br')
+    assert payload.encode_for('GZIP') == (payload.gzip, 'gzip')
+    assert payload.encode_for('') == (payload.body, None)
+    assert len({payload.etag_for(None), payload.etag_for('gzip'), payload.etag_for('br')}) == 3
+
+
+# --- 口コミ（キーセット方式のページング・件数） ---
+
+def post_reviews(client, hospital_id, comments):
+    return [client.post(f'/hospital/{hospital_id}/reviews', data={'comment': comment}).json()['id'] for comment in comments]
+
+def review_pages(client, hospital_id, limit):
+    """X-Next-Cursorをたどって全ページを読む: [(口コミIDのリスト, レスポンスのヘッダー), ...]"""
+    pages = []
+    params = {'limit': limit}
+    while True:
+        response = client.get(f'/hospital/{hospital_id}/reviews', params=params)
+        assert response.status_code == 200
+        pages.append(([review['id'] for review in response.json()], response.headers))
+        if 'X-Next-Cursor' not in response.headers:
+            return pages
+        params['before'] = response.headers['X-Next-Cursor']
+
+def test_review_pages_follow_cursor(client, catalog):
+    hospital_id, other_id = catalog.hospital_data[0]['id'], catalog.hospital_data[1]['id']
+    review_ids = post_reviews(client, hospital_id, [f'口コミ{i}' for i in range(7)])
+    post_reviews(client, other_id, ['別の病院'])
+
+    pages = review_pages(client, hospital_id, limit=3)
+    assert [ids for ids, _ in pages] == [review_ids[:3:-1], review_ids[3:0:-1], review_ids[:1]]
+    assert all(headers['X-Total-Count'] == '7' for _, headers in pages)
+    assert pages[0][1]['X-Next-Cursor'] == str(review_ids[4])
+
+    # ちょうど割り切れる件数なら、最後のページの後にカーソルは返らない
+    assert [ids for ids, _ in review_pages(client, other_id, limit=1)] == [[review_ids[-1] + 1]]
+
+def test_review_cursor_is_stable_across_new_posts(client, catalog):
+    hospital_id = catalog.hospital_data[0]['id']
+    review_ids = post_reviews(client, hospital_id, [f'口コミ{i}' for i in range(5)])
+    first = client.get(f'/hospital/{hospital_id}/reviews', params={'limit': 2})
+    # 1ページ目を読んだ後の投稿で、2ページ目がずれたり重複したりしない
+    post_reviews(client, hospital_id, ['新しい口コミ'])
+    second = client.get(f'/hospital/{hospital_id}/reviews', params={'limit': 2, 'before': first.headers['X-Next-Cursor']})
+    assert [review['id'] for review in first.json() + second.json()] == review_ids[:0:-1]
+    assert second.headers['X-Total-Count'] == '6'
+
+def test_review_counts_follow_posts(client, catalog):
+    record = catalog.hospital_data[0]
+    response = client.post(f"/hospital/{record['id']}/reviews", data={'comment': '  よかった  '})
+    assert response.json()['reviews'] == 1
+    assert client.get(f"/hospital/{record['id']}/reviews").json()[0]['comment'] == 'よかった'
+    result = client.get('/search', params={'keyword': record['name'], 'limit': 100}).json()['results']
+    assert next(r for r in result if r['id'] == record['id'])['reviews'] == record['reviews'] + 1
+    # フォームからの投稿は詳細ページへ戻す
+    response = client.post(f"/hospital/{record['id']}", data={'comment': '2件目'}, follow_redirects=False)
+    assert response.status_code == 303
+    assert '2件目' in client.get(response.headers['location']).text
+
+def test_review_counts_sync_posts_from_other_workers(catalog, tmp_path):
+    hospital_id = catalog.hospital_data[0]['id']
+    other_worker = ReviewStore(str(tmp_path / 'reviews.sqlite3'))
+    other_worker.add(hospital_id, 'ほかのワーカーから')
+    other_worker.close()
+    assert catalog.review_counts.get(hospital_id) == 0
+    version = catalog.review_counts.version
+    assert catalog.review_counts.sync(appmod.review_store) == 1
+    assert catalog.review_counts.get(hospital_id) == 1 and catalog.review_counts.version == version + 1
+    assert catalog.review_counts.sync(appmod.review_store) == 0
+
+
+# --- /facets ---
+
+def brute_force_facets(catalog, keyword='', region='', department='', facility_type='', blocked=()):
+    """各ファセットの値ごとの件数を、全件を1件ずつ調べて数える（そのファセット自身の絞り込みは外す）"""
+    codes = catalog.prefecture_codes['hospital_data']
+    keyword_rows = set(brute_force_search(catalog, keyword=keyword.strip()))
+    known = {'prefecture': set(PREFECTURES), 'department': set(DEPARTMENT_CODES.values()), 'facility_type': set(FACILITY_TYPES)}
+    # 選択肢はカタログに1件でもある値（条件に合う行が無ければ0件）
+    values = {facet: set() for facet in known}
+    rows = []
+    for row_id, record in enumerate(catalog.hospital_data):
+        row = {
+            'prefecture': {prefecture_name(codes[row_id])},
+            'department': set(classify_departments(' '.join(record['departments']))),
+            'facility_type': {record['facility_type']},
+        }
+        for facet in known:
+            values[facet] |= row[facet] & known[facet]
+        if row_id in keyword_rows and not row['prefecture'] & set(blocked):
+            rows.append(row)
+    filters = {'prefecture': region, 'department': canonical_department(department) if department else '', 'facility_type': facility_type}
+    matches = lambda row, skip: all(not value or value in row[facet] for facet, value in filters.items() if facet != skip)
+    return {
+        'total': sum(1 for row in rows if matches(row, None)),
+        'facets': {
+            facet: {value: sum(1 for row in rows if value in row[facet] and matches(row, facet)) for value in values[facet]}
+            for facet in filters
+        },
+    }
+
+@pytest.mark.parametrize('params, blocked', [
+    ({}, ()),
+    ({'region': '宮城県'}, ()),
+    ({'department': '内科', 'facility_type': '病院'}, ()),
+    ({'keyword': '仙台市', 'department': '小児科'}, ()),
+    ({'region': '秋田県', 'department': '外科', 'facility_type': '診療所'}, ()),
+    ({'keyword': '市'}, ('秋田県',)),
+])
+def test_facets_match_brute_force(client, catalog, params, blocked):
+    for prefecture in blocked:
+        appmod.blocked_prefectures.add(prefecture)
+    assert client.get('/facets', params=params).json() == brute_force_facets(catalog, blocked=blocked, **params)
+
+
+# --- /nearby ---
+
+@pytest.fixture
+def postal_table(catalog, tmp_path, monkeypatch):
+    """カタログの病院の郵便番号に、仙台付近の架空の座標を振った座標表を使う"""
+    codes = sorted(set(int(code) for code in catalog.postal_codes if code))
+    source = tmp_path / 'postal.csv'
+    source.write_text('postal_code,lat,lon\n' + ''.join(
+        f'{code // 10000:03d}-{code % 10000:04d},{38.0 + (i % 40) * 0.013},{140.6 + (i // 40) * 0.017}\n' for i, code in enumerate(codes)
+    ), encoding='utf-8')
+    compile_postal_table(str(source), str(tmp_path / 'postal.npz'))
+    use_postal_table(monkeypatch, str(tmp_path / 'postal.npz'))
+    return codes
+
+def use_postal_table(monkeypatch, path):
+    for module in (appmod, catalog_module):
+        monkeypatch.setattr(module, 'load_postal_table', lambda: load_postal_table(path))
+
+def test_nearby_disabled_without_postal_table(client, tmp_path, monkeypatch):
+    use_postal_table(monkeypatch, str(tmp_path / 'missing.npz'))
+    response = client.get('/nearby', params={'lat': 38.26, 'lon': 140.87})
+    assert response.status_code == 503
+    detail = response.json()['detail']
+    assert detail['enabled'] is False and detail['postal_codes'] == 0
+    assert detail['reason'] and detail['how_to_enable']
+
+@pytest.mark.parametrize('params, blocked', [
+    ({'lat': 38.2, 'lon': 140.8, 'k': 10}, ()),
+    ({'lat': 38.0, 'lon': 140.6, 'k': 25, 'department': '小児科'}, ()),
+    ({'lat': 38.4, 'lon': 141.2, 'k': 100}, ('秋田県',)),
+    ({'lat': 35.0, 'lon': 135.0, 'k': 3}, ()),
+])
+def test_nearby_matches_brute_force(client, catalog, postal_table, params, blocked):
+    for prefecture in blocked:
+        appmod.blocked_prefectures.add(prefecture)
+    geo_index = catalog.geo_index
+    assert geo_index.size > 0
+    codes = catalog.prefecture_codes['hospital_data']
+    department = params.get('department', '')
+    expected = []
+    for row_id, record in enumerate(catalog.hospital_data):
+        if np.isnan(geo_index.lat[row_id]) or prefecture_name(codes[row_id]) in blocked:
+            continue
+        if department and department not in classify_departments(' '.join(record['departments'])):
+            continue
+        dy = geo_index.lat[row_id] - params['lat']
+        dx = (geo_index.lon[row_id] - params['lon']) * math.cos(math.radians(params['lat']))
+        expected.append(math.hypot(dy, dx) * KM_PER_DEGREE)
+    expected = sorted(expected)[:params['k']]
+
+    body = client.get('/nearby', params=params).json()
+    assert body['total'] == len(body['results']) == len(expected)
+    assert [result['distance_km'] for result in body['results']] == pytest.approx(expected, abs=1e-3)
+    for result in body['results']:
+        row_id = catalog.row_of(result['id'])
+        assert (result['lat'], result['lon']) == (geo_index.lat[row_id], geo_index.lon[row_id])
+        assert prefecture_name(codes[row_id]) not in blocked
+
+def test_nearby_status_in_diagnostics(client, postal_table):
+    nearby = client.get('/diagnostics').json()['catalog']['nearby']
+    assert nearby['enabled'] is True and nearby['postal_codes'] == len(postal_table)
+    assert 'reason' not in nearby
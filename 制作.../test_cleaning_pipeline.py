@@ -0,0 +1,163 @@
+"""
+cleaning_pipeline.py のテスト
+- ID形式保持版（slash_delete.py）の結果が、以前の1セルずつの実装と同じになること
+- 形式統一版（hyphen.py）のクリーニング数に、連番で置き換えるcode列の変化も入ること
+- チャンクの行数を変えても結果が変わらないこと（ID列の判定に使う先頭5件が複数のチャンクにまたがる場合）
+- ID形式保持版でも、ファイルは1回だけ読むこと（値の無い詰め物列があっても）
+使い方: python -m pytest test_cleaning_pipeline.py
+"""
+import csv
+import re
+import shutil
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+import cleaning_pipeline
+from cleaning_pipeline import KEEP_ID_FORMAT, UNIFY_FORMAT, clean_file, clean_frame
+
+CSV_DIR = Path(__file__).parent / 'csv'
+
+# --- 以前の slash_delete.py の実装 ---
+
+LEGACY_PATTERNS = [
+    r'/ 常　勤:.*', r'/ 非常勤:.*', r'/ \(医.*?\)', r'/ \(歯.*?\)', r'/ \(薬.*?\)',
+    r'/ 新規.*', r'/ 令\d+\..*', r'/ 平\d+\..*', r'/ 昭\d+\..*', r'/ 現存.*',
+]
+LEGACY_TARGETS = ['tel', 'name', 'address', 'corporation', 'director', 'established', 'bed_type_and_count', 'facility_type']
+
+def legacy_clean_text(text):
+    if pd.isna(text) or text == '':
+        return text
+    text = str(text)
+    for pattern in LEGACY_PATTERNS:
+        text = re.sub(pattern, '', text, flags=re.IGNORECASE)
+    return re.sub(r'/\s*$', '', text).strip()
+
+def legacy_preserve_id(text):
+    if pd.isna(text) or text == '':
+        return text
+    match = re.match(r'^(\d+(?:\.\d+)?,\d+\s*/\s*[^,]+,\d+,\d+,?)(.*)$', str(text))
+    if not match:
+        return legacy_clean_text(text)
+    remaining = legacy_clean_text(match.group(2))
+    return f"{match.group(1)}{remaining}" if remaining.strip() else match.group(1)
+
+def legacy_tel(text):
+    if pd.isna(text) or text == '':
+        return text
+    cleaned = legacy_clean_text(text)
+    if re.match(r'^\d{2,4}-\d{2,4}-\d{4}$', cleaned):
+        return cleaned + ','
+    if cleaned.endswith(','):
+        return cleaned
+    if re.match(r'^[\d\-]+$', cleaned) and '-' in cleaned:
+        return cleaned + ','
+    return cleaned
+
+def legacy_is_id(col, samples):
+    if not col or len(samples) == 0:
+        return False
+    if col.lower() in ['id', 'code', 'name']:
+        return True
+    return any(pd.notna(value) and re.search(r'\d+(?:\.\d+)?,\d+\s*/\s*[^,]+,\d+,\d+', str(value)) for value in samples[:5])
+
+def legacy_slash_delete(csv_path, out_path):
+    df = pd.read_csv(csv_path, dtype=str, encoding='utf-8-sig', on_bad_lines='skip')
+    for col in df.columns:
+        if col == 'tel':
+            df[col] = df[col].apply(legacy_tel)
+        elif legacy_is_id(col, df[col].dropna().head(10).tolist()):
+            df[col] = df[col].apply(legacy_preserve_id)
+        elif col in LEGACY_TARGETS:
+            df[col] = df[col].apply(legacy_clean_text)
+        else:
+            df[col] = df[col].apply(lambda x: legacy_clean_text(x) if isinstance(x, str) and ('常　勤:' in x or '非常勤:' in x) else x)
+    df.to_csv(out_path, index=False, encoding='utf-8-sig', quoting=csv.QUOTE_MINIMAL)
+
+
+def write_synthetic(path):
+    """address・corporationの一部がID形式で始まるCSV"""
+    rows = [["code", "name", "address", "tel", "corporation", "director", "prefecture", "note"]]
+    for i in range(12):
+        rows.append([
+            f"0{i} / 山医1,1001", f"病院{i} / (医 3)",
+            "4.0,01 / 現存0,1017,3,仙台市" if i % 2 == 0 else "仙台市 / 常　勤: 3",
+            "022-111-2222 / 常　勤: 2",
+            "4.0,02 / 内科0,1017,3,医療法人" if i % 3 == 0 else "医療法人 / 内科 外科",
+            "山田 / 新規 令5.1.1", "宮城県", "" if i < 8 else "x / 非常勤: 1",
+        ])
+    with open(path, 'w', encoding='utf-8-sig', newline='') as f:
+        csv.writer(f).writerows(rows)
+
+def write_sparse(path, padding=0):
+    """
+    address列の値がまばらで、5件目の値だけがID形式のCSV（先頭のチャンクだけではID列か決まらない）
+    padding: 末尾に足す値の無い列の数
+    """
+    rows = [["name", "address", "tel", *(f"pad{i}" for i in range(padding))]]
+    addresses = {0: "仙台市 / 現存 1", 3: "石巻市", 7: "塩竈市 / 新規", 12: "名取市", 20: "4.0,01 / 現存0,1017,3,仙台市 / 現存 2"}
+    for i in range(30):
+        rows.append([f"病院{i}", addresses.get(i, ""), "022-111-2222", *([""] * padding)])
+    with open(path, 'w', encoding='utf-8-sig', newline='') as f:
+        csv.writer(f).writerows(rows)
+
+def assert_same_as_legacy(source, tmp_path, chunksize=None):
+    expected, actual = tmp_path / 'legacy.csv', tmp_path / 'actual.csv'
+    legacy_slash_delete(source, expected)
+    shutil.copy(source, actual)
+    if chunksize is None:
+        assert clean_file(str(actual), KEEP_ID_FORMAT) is not None
+    else:
+        assert clean_file(str(actual), KEEP_ID_FORMAT, chunksize) is not None
+    assert actual.read_bytes() == expected.read_bytes()
+
+
+def test_keep_id_keeps_id_prefixed_address_and_corporation(tmp_path):
+    source = tmp_path / 'source.csv'
+    write_synthetic(source)
+    assert_same_as_legacy(source, tmp_path)
+
+    df = pd.read_csv(tmp_path / 'actual.csv', dtype=str, encoding='utf-8-sig')
+    assert df['address'][0] == "4.0,01 / 現存0,1017,3,仙台市"
+    assert df['corporation'][0] == "4.0,02 / 内科0,1017,3,医療法人"
+    assert df['address'][1] == "仙台市"
+
+@pytest.mark.parametrize('name', sorted(path.name for path in CSV_DIR.glob('*.csv')))
+def test_keep_id_matches_legacy_on_repo_csv(name, tmp_path):
+    assert_same_as_legacy(CSV_DIR / name, tmp_path)
+
+@pytest.mark.parametrize('chunksize', [1, 2, 3, 5, 8, 13, 100])
+def test_keep_id_output_does_not_depend_on_chunksize(chunksize, tmp_path):
+    source = tmp_path / 'source.csv'
+    write_sparse(source)
+    assert_same_as_legacy(source, tmp_path, chunksize)
+
+    df = pd.read_csv(tmp_path / 'actual.csv', dtype=str, encoding='utf-8-sig')
+    assert df['address'][20] == "4.0,01 / 現存0,1017,3,仙台市"
+
+@pytest.mark.parametrize('chunksize', [1, 7, 100])
+def test_keep_id_reads_file_once(chunksize, tmp_path, monkeypatch):
+    reads = []
+    read_csv_chunks = cleaning_pipeline.read_csv_chunks
+
+    def counting_read(*args, **kwargs):
+        reads.append(0)
+        for chunk in read_csv_chunks(*args, **kwargs):
+            reads[-1] += len(chunk)
+            yield chunk
+
+    monkeypatch.setattr(cleaning_pipeline, 'read_csv_chunks', counting_read)
+    source = tmp_path / 'source.csv'
+    write_sparse(source, padding=20)
+    assert_same_as_legacy(source, tmp_path, chunksize)
+    assert reads == [30]
+
+def test_unify_counts_code_column_changes():
+    df = pd.DataFrame({
+        'code': ["01 / (01 / 山医1,1001 / 3001,7 / 1)", "02 / 山医17,1017,3", "03"],
+        'name': ["病院A", "病院B", "病院C"],
+    }, dtype=object)
+    assert clean_frame(df, UNIFY_FORMAT, verbose=False) == 2
+    assert df['code'].tolist() == ["1234", "1235", "1236"]
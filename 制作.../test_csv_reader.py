@@ -0,0 +1,97 @@
+"""
+csv_reader.py のテスト
+- 列数の数え方（引用符の中の「,」や改行を区切りにしない）が csv.reader と同じになること
+- read_columns がCSVをパースするのはpandasの1回だけであること（引用符のあるCSVでも）
+- クリーニングで列数の多すぎる行を退避する時も、ファイルは1回だけ読むこと
+使い方: python -m pytest test_csv_reader.py
+"""
+import csv
+
+import pandas as pd
+import pytest
+
+from cleaning_pipeline import KEEP_ID_FORMAT, clean_file
+from csv_reader import field_counts, read_columns
+
+# 引用符付きの値（「,」・改行・「""」を含む）と、列数の多すぎる行（4行目と7行目）のあるCSV
+ROWS = [
+    ["name", "address", "tel"],
+    ["病院A", "仙台市, 青葉区", "022-111-2222"],
+    ["病院B", "石巻市\n（旧住所）", "0225-11-2222"],
+    ["病院C", "塩竈市", "022-333-4444", "余分な列"],
+    ["病院D", '名取市 "本院"', ""],
+    ["病院E", "多賀城市", "022-555-6666", "余分", "な列"],
+    ["病院F", "", "022-777-8888"],
+]
+
+
+class CountingReader:
+    """csv.reader の代わりに、作られた数と読んだ行数を数える"""
+    readers = []
+
+    def __init__(self, *args, **kwargs):
+        self._reader = REAL_READER(*args, **kwargs)
+        self.rows = 0
+        CountingReader.readers.append(self)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        row = next(self._reader)
+        self.rows += 1
+        return row
+
+    @property
+    def line_num(self):
+        return self._reader.line_num
+
+REAL_READER = csv.reader
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / 'source.csv'
+    with open(path, 'w', encoding='utf-8-sig', newline='') as f:
+        csv.writer(f).writerows(ROWS)
+    return path
+
+@pytest.fixture
+def counting(monkeypatch):
+    CountingReader.readers = []
+    monkeypatch.setattr(csv, 'reader', CountingReader)
+    return CountingReader.readers
+
+
+def test_field_counts_match_csv_reader(source):
+    with open(source, newline='', encoding='utf-8-sig') as f:
+        expected = [len(row) for row in list(csv.reader(f))[1:] if row]
+    assert field_counts(str(source)).tolist() == expected == [3, 3, 4, 3, 5, 3]
+
+def test_read_columns_parses_once(source, counting, monkeypatch):
+    parses = []
+    real_read_csv = pd.read_csv
+    monkeypatch.setattr(pd, 'read_csv', lambda *args, **kwargs: parses.append(args) or real_read_csv(*args, **kwargs))
+
+    df = read_columns(str(source), ["name", "address"], on_bad_lines="skip")
+    assert df["name"].tolist() == ["病院A", "病院B", "病院D", "病院F"]
+    assert df["address"].tolist()[:3] == ["仙台市, 青葉区", "石巻市\n（旧住所）", '名取市 "本院"']
+    assert len(parses) == 1
+    # csv.readerで読むのはヘッダー行だけ
+    assert sum(reader.rows for reader in counting) == 1
+
+def test_quarantine_reads_file_once(source, counting):
+    assert clean_file(str(source), KEEP_ID_FORMAT, chunksize=2) is not None
+    assert len(counting) == 1
+    assert counting[0].rows == len(ROWS)
+
+    with open(str(source) + '.quarantine', newline='', encoding='utf-8-sig') as f:
+        quarantined = list(REAL_READER(f))
+    # 行番号はファイルの物理行（病院Bの住所に改行があるので1行ずれる）
+    assert quarantined == [
+        ["line", "fields", "name", "address", "tel"],
+        ["5", "4", "病院C", "塩竈市", "022-333-4444", "余分な列"],
+        ["7", "5", "病院E", "多賀城市", "022-555-6666", "余分", "な列"],
+    ]
+    df = pd.read_csv(source, dtype=str, encoding='utf-8-sig')
+    assert df["name"].tolist() == ["病院A", "病院B", "病院D", "病院F"]
@@ -0,0 +1,59 @@
+"""
+hospital_ids.py のテスト
+- 列のずれたCSV（データ行が1列多い）でも、医療機関コードからIDを作ること
+- hyphen.py で住所などを書き換えても、IDが変わらないこと（口コミは病院IDで保存しているため）
+使い方: python -m pytest test_hospital_ids.py
+"""
+import shutil
+from pathlib import Path
+
+import pytest
+
+from catalog import extract_hospital_data
+from hospital_ids import assign_ids, institution_codes, is_row_number
+from hyphen import clean_medical_data
+
+CSV_DIR = Path(__file__).parent / 'csv'
+
+# データ行がヘッダーより1列多く、医療機関コードが「id」列に入るCSV
+SHIFTED_CSV = ['miyagi_hos.csv', 'fukushima_hos.csv', 'aomori_hos.csv', 'akita_dent.csv']
+
+
+def test_row_numbers_are_not_codes():
+    assert is_row_number(["1.0", "2.0", "4.0"])
+    assert is_row_number(["1234", "1235", "1236"])
+    assert not is_row_number(["0210017", "0210025", "0230177"])
+    assert not is_row_number(["01-1024-3 / 青医24", "01-1025-0 / 青医25"])
+
+def test_institution_codes_skips_names_and_row_numbers():
+    names = ["石巻赤十字病院", "仙台病院"]
+    codes = ["0210017 / (0231209)", "0110156"]
+    assert institution_codes({"code": names, "id": codes}) == codes
+    assert institution_codes({"code": ["1234", "1235"], "id": codes}) == codes
+    assert institution_codes({"code": ["1234", "1235"], "id": ["1.0", "2.0"]}) is None
+
+def test_rows_without_code_fall_back_to_hash():
+    ids = assign_ids("csv/miyagi_hos.csv", None, ["病院A", "病院A"], ["仙台市", "仙台市"])
+    assert ids[0].startswith("miyagi_hos-h") and ids[1] == ids[0] + "~2"
+
+@pytest.mark.parametrize('name', SHIFTED_CSV)
+def test_shifted_csv_ids_come_from_codes(name):
+    rows = extract_hospital_data([str(CSV_DIR / name)])
+    assert rows
+    assert not any(row["id"].startswith(f"{Path(name).stem}-h") for row in rows)
+
+@pytest.mark.parametrize('name', SHIFTED_CSV)
+def test_ids_survive_cleaning(name, tmp_path):
+    csv_path = tmp_path / name
+    shutil.copy(CSV_DIR / name, csv_path)
+    before = {row["id"]: row["address"] for row in extract_hospital_data([str(csv_path)])}
+
+    clean_medical_data([str(csv_path)])
+    after = {row["id"]: row["address"] for row in extract_hospital_data([str(csv_path)])}
+
+    # 住所が書き換わっても（addressとprefectureの入れ替えも含む）IDは医療機関コードのまま
+    # （入れ替えで住所などが埋まり、新しく載る行・外れる行は少しある）
+    kept = after.keys() & before.keys()
+    assert len(kept) >= min(len(before), len(after)) * 0.99
+    assert not any(hospital_id.startswith(f"{Path(name).stem}-h") for hospital_id in after)
+    assert any(after[hospital_id] != before[hospital_id] for hospital_id in kept)
@@ -0,0 +1,81 @@
+"""
+search_index.py のテスト
+- N-gramインデックスの部分一致検索が、全件を1件ずつ調べた結果と同じになること（1〜2文字・3文字以上、絞り込みあり）
+- 末尾に行を足した索引（extended）が、最初から作り直した索引と同じ結果になること
+使い方: python -m pytest test_search_index.py
+"""
+import random
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from catalog import CatalogSlice, HospitalCatalog
+from hospital_log import LogEntry
+from search_index import NgramIndex
+
+CSV_DIR = Path(__file__).parent / 'csv'
+
+# 同じ文字・2文字の組が何度も現れるよう、少ない文字から作る
+ALPHABET = '仙台市青葉区病院医科あ\n'
+
+
+def random_texts(rng, count):
+    return [''.join(rng.choice(ALPHABET) for _ in range(rng.randint(0, 12))) for _ in range(count)]
+
+def keywords(rng, texts, count):
+    """textsに含まれる部分文字列と、含まれないかもしれない文字列"""
+    found = []
+    for text in rng.sample([text for text in texts if text], count):
+        start = rng.randrange(len(text))
+        found.append(text[start:start + rng.randint(1, 5)])
+    return found + random_texts(rng, count)
+
+def brute_force(texts, keyword, within=None):
+    rows = range(len(texts)) if within is None else within
+    return [row_id for row_id in rows if keyword in texts[row_id]]
+
+
+def test_ngram_search_matches_brute_force():
+    rng = random.Random(6)
+    texts = random_texts(rng, 400)
+    index = NgramIndex(texts)
+    within = np.array(sorted(rng.sample(range(len(texts)), 150)), dtype=np.int32)
+    for keyword in keywords(rng, texts, 100):
+        if not keyword:
+            continue
+        assert index.search(keyword).tolist() == brute_force(texts, keyword), keyword
+        assert index.search(keyword, within).tolist() == brute_force(texts, keyword, within.tolist()), keyword
+
+def test_extended_ngram_index_matches_rebuilt():
+    rng = random.Random(7)
+    texts = random_texts(rng, 300)
+    index = NgramIndex(texts[:200]).extended(texts[200:], texts.__getitem__)
+    rebuilt = NgramIndex(texts)
+    for keyword in keywords(rng, texts, 100):
+        if keyword:
+            assert index.search(keyword).tolist() == rebuilt.search(keyword).tolist() == brute_force(texts, keyword), keyword
+    # 元の索引は変わらない
+    assert NgramIndex(texts[:200]).search('病院').tolist() == brute_force(texts[:200], '病院')
+
+@pytest.fixture(scope='module')
+def slices():
+    paths = [str(CSV_DIR / name) for name in ('miyagi_dent.csv', 'akita_hos.csv')]
+    return {path: CatalogSlice.from_csv(path) for path in paths}
+
+def test_appended_catalog_search_matches_rebuilt(slices):
+    path = next(iter(slices))
+    entries = [
+        LogEntry.create(path, f'青葉記念病院{i}', f'宮城県仙台市青葉区{i}', ['内科', '小児科'], '宮城県', f'test-{i}')
+        for i in range(5)
+    ]
+    catalog = HospitalCatalog(slices)
+    for entry in entries:
+        catalog = catalog.with_appended([entry])
+    rebuilt = HospitalCatalog(slices, appended=entries)
+    assert len(catalog) == len(rebuilt)
+    for keyword, region, department in [('青葉記念', '', ''), ('病院', '宮城県', ''), ('仙台市青葉区', '', '小児科'), ('', '宮城県', '内科')]:
+        found = catalog.search_index.search(keyword, region, department).tolist()
+        assert found == rebuilt.search_index.search(keyword, region, department).tolist()
+        assert found
+    assert catalog.search_index.search('青葉記念病院3').tolist() == [len(catalog) - 2]
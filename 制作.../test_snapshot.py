@@ -0,0 +1,71 @@
+"""
+snapshot.py のテスト
+- スナップショットから読んだカタログが、CSVから作ったカタログと同じレコード・配列・検索結果になること
+- 元のCSVが変わった断片・形式の違うスナップショットは使わず、CSVから読み直すこと
+使い方: python -m pytest test_snapshot.py
+"""
+import json
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+import snapshot
+from catalog import CatalogSlice, HospitalCatalog
+from records import MappedRecords
+from snapshot import load_slices, write_snapshot
+
+CSV_DIR = Path(__file__).parent / 'csv'
+CSV_NAMES = ('miyagi_hos.csv', 'akita_dent.csv', 'hokkaidou_dent.csv')
+
+
+@pytest.fixture
+def csv_paths(tmp_path):
+    """CSVは一時ディレクトリにコピーして使う（更新時刻を変えるテストがあるため）"""
+    (tmp_path / 'csv').mkdir()
+    paths = []
+    for name in CSV_NAMES:
+        shutil.copy(CSV_DIR / name, tmp_path / 'csv' / name)
+        paths.append(str(tmp_path / 'csv' / name))
+    return paths
+
+@pytest.fixture
+def snapshot_dir(tmp_path, csv_paths):
+    path = tmp_path / 'snapshot'
+    write_snapshot({p: CatalogSlice.from_csv(p) for p in csv_paths}, str(path))
+    return str(path)
+
+
+def test_snapshot_catalog_equals_csv_catalog(csv_paths, snapshot_dir):
+    slices, from_snapshot = load_slices(csv_paths, snapshot_dir)
+    assert from_snapshot == len(csv_paths)
+    assert all(isinstance(s.hospital_data, MappedRecords) for s in slices.values())
+
+    mapped = HospitalCatalog(slices)
+    built = HospitalCatalog.from_csv(csv_paths)
+    assert list(mapped.cards) == list(built.cards)
+    assert list(mapped.hospital_data) == list(built.hospital_data)
+    assert list(mapped.search_texts) == list(built.search_texts)
+    for kind in ('cards', 'hospital_data'):
+        np.testing.assert_array_equal(mapped.prefecture_codes[kind], built.prefecture_codes[kind])
+    np.testing.assert_array_equal(mapped.postal_codes, built.postal_codes)
+    assert dict(mapped.rows_by_id) == dict(built.rows_by_id)
+
+    for keyword, region, department in [('札幌市', '', ''), ('', '秋田県', '歯科'), ('病院', '宮城県', '内科'), ('区', '', '')]:
+        assert mapped.search_index.search(keyword, region, department).tolist() == built.search_index.search(keyword, region, department).tolist()
+
+def test_changed_csv_is_read_again(csv_paths, snapshot_dir):
+    with open(csv_paths[0], 'a', encoding='utf-8') as f:
+        f.write('\n')
+    slices, from_snapshot = load_slices(csv_paths, snapshot_dir)
+    assert from_snapshot == len(csv_paths) - 1
+    assert not isinstance(slices[csv_paths[0]].hospital_data, MappedRecords)
+    assert isinstance(slices[csv_paths[1]].hospital_data, MappedRecords)
+
+def test_other_format_is_not_used(csv_paths, snapshot_dir):
+    manifest_path = Path(snapshot_dir) / 'manifest.json'
+    manifest = json.loads(manifest_path.read_text(encoding='utf-8'))
+    manifest['format'] = snapshot.SNAPSHOT_FORMAT - 1
+    manifest_path.write_text(json.dumps(manifest), encoding='utf-8')
+    assert load_slices(csv_paths, snapshot_dir)[1] == 0
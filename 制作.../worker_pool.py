@@ -0,0 +1,51 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import HTTPException
+
+
+class BoundedExecutor:
+    """
+    カタログ処理（シリアライズ・圧縮・CSV読み書きなど）を実行するスレッドプール
+    - イベントループは振り分けだけを行い、重い処理でほかのリクエストを止めない
+    - 実行中＋待機中の件数に上限を設け、空きをqueue_timeout秒待っても無ければ503を返す（バックプレッシャー）
+    """
+
+    def __init__(self, max_workers: int = 4, max_pending: int = 64, queue_timeout: float = 5.0):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.queue_timeout = queue_timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="catalog")
+        self._slots = None
+        self._loop = None
+        self.pending = 0
+        self.rejected = 0
+
+    async def run(self, fn, *args, **kwargs):
+        """fn(*args, **kwargs) をプールで実行して結果を返す"""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # セマフォは実行中のイベントループの中で作る
+            self._loop = loop
+            self._slots = asyncio.Semaphore(self.max_pending)
+            self.pending = 0
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise HTTPException(status_code=503, detail="サーバーが混み合っています", headers={"Retry-After": "1"})
+        self.pending += 1
+        future = loop.run_in_executor(self._executor, functools.partial(fn, *args, **kwargs))
+        future.add_done_callback(functools.partial(self._release, self._slots))
+        # クライアントが切断しても実行中の処理は止められないので、枠は処理が終わった時に返す
+        return await asyncio.shield(future)
+
+    def _release(self, slots, future):
+        self.pending -= 1
+        slots.release()
+        if not future.cancelled():
+            # 待ち手がいなくなった結果の例外を「取得されなかった」と警告させない
+            future.exception()
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)